@@ -0,0 +1,227 @@
+"""Admission control of the /api/p3 routes.
+
+Requests are admitted or shed in the event loop, before FastAPI reads their
+body or hands them to the threadpool, so an overloaded worker answers at
+once instead of queueing without bound:
+
+- per-client token bucket (the client address, or the ``X-Client-Id``
+  header with ``RATE_LIMIT_TRUST_CLIENT_ID``): ``RATE_LIMIT_PER_SECOND``
+  requests per second with bursts of ``RATE_LIMIT_BURST``, 429 past it;
+- at most ``ADMISSION_MAX_CONCURRENCY`` requests in flight (by default the
+  size of the DB pool plus its overflow, so admitted requests never wait for
+  a connection); up to ``ADMISSION_MAX_QUEUE`` more wait at most
+  ``ADMISSION_QUEUE_TIMEOUT`` seconds for a slot, then get a 503.
+
+Both answers carry ``Retry-After``. Other routes (``/health*``,
+``/metrics``, ``/docs``) are never limited, and ``reserve_threads`` keeps
+threadpool threads free for them. Limits apply per worker process.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+import anyio.to_thread
+
+from app.core import config
+from app.core.metrics import ADMISSION_QUEUE_WAIT, ADMISSION_SHED
+from app.core.responses import ORJSONResponse
+
+LIMITED_PREFIX = "/api/p3/"
+# Threadpool threads kept for the routes outside admission control
+RESERVED_THREADS = 8
+
+
+class Shed(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """One token bucket per client, the least recently seen dropped past ``max_clients``."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    def take(self, client: str, now: Optional[float] = None) -> float:
+        """Spend a token: 0 if allowed, else the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """Slots handed over first come, first served, with a bounded queue.
+
+    A released slot belongs to the next waiter as soon as it is taken off
+    the queue. The lock and ``call_soon_threadsafe`` only matter when several
+    event loops share the limiter (the in-process test client).
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> float:
+        """Take a slot, returning the seconds waited for it (raises Shed)."""
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                raise Shed(503, "queue_full", timeout or 1.0)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            # Client gone: give back a slot handed over in the meantime
+            if not self._withdraw(waiter):
+                self.release()
+            raise
+        if self._withdraw(waiter):
+            raise Shed(503, "queue_timeout", timeout or 1.0)
+        return time.perf_counter() - start
+
+    def _withdraw(self, waiter) -> bool:
+        """Leave the queue; False if a slot was handed over already."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            return True
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            # The slot goes straight to the next waiter
+            waiter = self._waiters.popleft()
+        waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Admission:
+    def __init__(self):
+        self.buckets = None
+        if config.RATE_LIMIT_PER_SECOND > 0:
+            self.buckets = TokenBuckets(
+                config.RATE_LIMIT_PER_SECOND, config.RATE_LIMIT_BURST, config.RATE_LIMIT_MAX_CLIENTS
+            )
+        self.limiter = None
+        if config.ADMISSION_MAX_CONCURRENCY > 0:
+            self.limiter = ConcurrencyLimiter(config.ADMISSION_MAX_CONCURRENCY, config.ADMISSION_MAX_QUEUE)
+
+    async def admit(self, client: str):
+        """Raise Shed if the request must be rejected; release() once it is done otherwise."""
+        if self.buckets is not None:
+            wait = self.buckets.take(client)
+            if wait:
+                raise Shed(429, "rate_limited", wait)
+        if self.limiter is not None:
+            ADMISSION_QUEUE_WAIT.observe(await self.limiter.acquire(config.ADMISSION_QUEUE_TIMEOUT))
+
+    def release(self):
+        if self.limiter is not None:
+            self.limiter.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.limiter.in_flight if self.limiter else None,
+            "queued": self.limiter.queued if self.limiter else None,
+        }
+
+
+_admission = None
+
+
+def get_admission() -> Admission:
+    global _admission
+    if _admission is None:
+        # Only touched from the event loop: no lock needed
+        _admission = Admission()
+    return _admission
+
+
+def shutdown_admission():
+    global _admission
+    _admission = None
+
+
+def reserve_threads():
+    """Grow the threadpool so admitted requests cannot take every thread."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, config.ADMISSION_MAX_CONCURRENCY + RESERVED_THREADS)
+
+
+def _client(scope) -> str:
+    # A client could rotate its own X-Client-Id to dodge the limit and evict
+    # the buckets of others: only a proxy in front of the API can vouch for it
+    if config.RATE_LIMIT_TRUST_CLIENT_ID:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-client-id":
+                return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to /api/p3 requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(LIMITED_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        admission = get_admission()
+        try:
+            await admission.admit(_client(scope))
+        except Shed as e:
+            ADMISSION_SHED.inc(reason=e.reason)
+            detail = "Too many requests" if e.status == 429 else "Server overloaded"
+            response = ORJSONResponse(
+                {"detail": f"{detail}, retry later"},
+                status_code=e.status,
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
@@ -0,0 +1,129 @@
+"""Runtime settings read from environment variables."""
+
+import os
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool of the sync and async engines (PostgreSQL and SQLite files)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds after which a pooled connection is replaced (-1 = never)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# psycopg server-side prepared statements: executions before preparing a query,
+# "none" disables them (needed behind PgBouncer in transaction mode), empty = driver default
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "")
+# SQLite file databases: WAL journal and seconds a writer waits for the lock
+SQLITE_WAL = _env_bool("SQLITE_WAL", True)
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+
+# Layout of energy_dataset rows: "wide" (plain strings) or "compact"
+# (categories stored once in category_dictionary, see create_db.py compact)
+DATASET_SCHEMA = os.getenv("DATASET_SCHEMA", "wide")
+
+# In-memory spatial index behind /api/p3/dataset/nearby: built at startup,
+# tree rebuilt in the background once this many rows were inserted, and
+# reloaded from the database every SPATIAL_INDEX_REFRESH_SECONDS (0 = never)
+# to pick up rows written by other workers
+SPATIAL_INDEX_ON_STARTUP = _env_bool("SPATIAL_INDEX_ON_STARTUP", True)
+SPATIAL_INDEX_BUFFER_SIZE = int(os.getenv("SPATIAL_INDEX_BUFFER_SIZE", "4096"))
+SPATIAL_INDEX_REFRESH_SECONDS = float(os.getenv("SPATIAL_INDEX_REFRESH_SECONDS", "300"))
+SPATIAL_NEARBY_MAX_K = int(os.getenv("SPATIAL_NEARBY_MAX_K", "1000"))
+
+# Update the /api/p3/aggregates rollups in the transaction of each prediction write
+ROLLUPS_ENABLED = _env_bool("ROLLUPS_ENABLED", True)
+# Rows per rollup group and day that concurrent writers are spread over
+ROLLUPS_SHARDS = int(os.getenv("ROLLUPS_SHARDS", "16"))
+
+# Admission control of the /api/p3 routes (app/core/admission.py): requests in
+# flight per worker (0 = unlimited), requests waiting for a slot and for how
+# many seconds before a 503
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.5"))
+# Per-client token bucket keyed on the client address (0 = off); X-Client-Id
+# is only used when a trusted proxy or gateway sets it for every request
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+RATE_LIMIT_TRUST_CLIENT_ID = _env_bool("RATE_LIMIT_TRUST_CLIENT_ID")
+
+# Maximum number of buildings accepted by /api/p3/predict/batch
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "10000"))
+
+# Micro-batching of concurrent /api/p3/predict calls (off by default)
+PREDICT_MICROBATCH_ENABLED = _env_bool("PREDICT_MICROBATCH_ENABLED")
+PREDICT_MICROBATCH_WAIT_MS = float(os.getenv("PREDICT_MICROBATCH_WAIT_MS", "2"))
+PREDICT_MICROBATCH_MAX_SIZE = int(os.getenv("PREDICT_MICROBATCH_MAX_SIZE", "64"))
+# Seconds a /api/p3/predict call waits for its micro-batch before a 503
+PREDICT_MICROBATCH_TIMEOUT = float(os.getenv("PREDICT_MICROBATCH_TIMEOUT", "5"))
+
+# Dedicated executor for the async prediction path: "thread" or "process"
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Write-behind persistence: predictions return before the DB commit (off by default)
+WRITE_BEHIND_ENABLED = _env_bool("WRITE_BEHIND_ENABLED")
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_PUT_TIMEOUT = float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT", "1.0"))
+
+# Prediction cache keyed on the normalized payload and the model version
+PREDICT_CACHE_ENABLED = _env_bool("PREDICT_CACHE_ENABLED")
+PREDICT_CACHE_MAX_ENTRIES = int(os.getenv("PREDICT_CACHE_MAX_ENTRIES", "10000"))
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", "3600"))
+# Optional SQLite file shared by all workers of a host (empty = per-process only)
+PREDICT_CACHE_SHARED_PATH = os.getenv("PREDICT_CACHE_SHARED_PATH", "")
+PREDICT_CACHE_REUSE_DATASET = _env_bool("PREDICT_CACHE_REUSE_DATASET", True)
+
+# Explanations computed for ?explain=true, cached per model version and input
+EXPLAIN_CACHE_MAX_ENTRIES = int(os.getenv("EXPLAIN_CACHE_MAX_ENTRIES", "10000"))
+
+# Input/prediction drift against a reference profile built once from a CSV
+# (python -m app.services.p3_drift): checked every DRIFT_CHECK_SECONDS (0 = on
+# request only), counts halved every DRIFT_HALF_LIFE_SECONDS (0 = never)
+DRIFT_MONITOR_ENABLED = _env_bool("DRIFT_MONITOR_ENABLED", True)
+DRIFT_REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH", "data/drift_reference.json")
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+DRIFT_CHECK_SECONDS = float(os.getenv("DRIFT_CHECK_SECONDS", "60"))
+DRIFT_HALF_LIFE_SECONDS = float(os.getenv("DRIFT_HALF_LIFE_SECONDS", "3600"))
+DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+
+# Load the model and run a warm-up prediction before serving traffic
+MODEL_WARMUP_ON_STARTUP = _env_bool("MODEL_WARMUP_ON_STARTUP", True)
+
+# Memory-map the model arrays from an uncompressed copy of the artifact
+MODEL_MMAP = _env_bool("MODEL_MMAP")
+MODEL_MMAP_PATH = os.getenv("MODEL_MMAP_PATH", "models/model_p3.uncompressed.joblib")
+
+# Score payloads through precompiled NumPy preprocessing instead of pandas,
+# after checking it matches the sklearn pipeline within this relative tolerance
+MODEL_COMPILED = _env_bool("MODEL_COMPILED", True)
+MODEL_COMPILED_RTOL = float(os.getenv("MODEL_COMPILED_RTOL", "1e-6"))
+
+# Versioned model artifacts; each worker polls the ACTIVE pointer (0 = never)
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models/registry")
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "10"))
+
+# Candidate registry versions scored in the background for every prediction
+SHADOW_MODEL_VERSIONS = [v.strip() for v in os.getenv("SHADOW_MODEL_VERSIONS", "").split(",") if v.strip()]
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "1"))
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
+# Weighted A/B split between registry versions, e.g. "3f2a9c1d0b7e:90,2026-10:10" (empty = off)
+AB_SPLIT = os.getenv("AB_SPLIT", "")
+
+# Token expected in the X-Admin-Token header of /api/p3/admin routes (empty = disabled)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Largest page accepted by /api/p3/history
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "10000"))
+# Largest chunk_size accepted by /api/p3/export (rows buffered per chunk)
+EXPORT_MAX_CHUNK_SIZE = int(os.getenv("EXPORT_MAX_CHUNK_SIZE", "50000"))
+# Seconds a filtered /api/p3/history total is reused before being recounted
+HISTORY_COUNT_TTL = float(os.getenv("HISTORY_COUNT_TTL", "30"))
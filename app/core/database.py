@@ -1,10 +1,16 @@
 """Database configuration and session management."""
 
 import os
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app.core import config
+
 # Database URL from environment
 # Auto-detect: use SQLite if no DATABASE_URL or on HF Spaces, else PostgreSQL
 DATABASE_URL = os.getenv(
@@ -20,26 +26,142 @@ if not DATABASE_URL:
     if os.name == 'nt':
         DATABASE_URL = "sqlite:///./predictions.db"
 
+
+def _is_sqlite_memory(url) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def _prepare_threshold():
+    # psycopg: None never prepares, 0 prepares every statement
+    value = config.DB_PREPARE_THRESHOLD.strip().lower()
+    return None if value in ("none", "off") else int(value)
+
+
+def engine_options(url: str) -> dict:
+    """Pool and driver settings for ``url`` (sync or async driver)."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        connect_args = {"check_same_thread": False}
+        if _is_sqlite_memory(url):
+            # One in-memory database only exists for a single connection
+            return {"connect_args": connect_args, "poolclass": StaticPool}
+        # A connection per concurrent thread; WAL lets readers run alongside the writer
+        connect_args["timeout"] = config.SQLITE_BUSY_TIMEOUT
+        return {
+            "connect_args": connect_args,
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+        }
+
+    options = {
+        "pool_pre_ping": True,  # Verify connections before using
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+    }
+    if url.get_driver_name() == "psycopg" and config.DB_PREPARE_THRESHOLD.strip():
+        options["connect_args"] = {"prepare_threshold": _prepare_threshold()}
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, _record):
+    cursor = dbapi_connection.cursor()
+    if config.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT * 1000)}")
+    cursor.close()
+
+
+class PoolMonitor:
+    """Connection events of one engine, for /metrics and /api/p3/db/stats."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *_):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *_):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_invalidate(self, *_):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        stats = {"pool": type(pool).__name__}
+        # StaticPool/NullPool do not track these
+        for key, name in (("size", "size"), ("checked_in", "checkedin"),
+                          ("checked_out", "checkedout"), ("overflow", "overflow")):
+            method = getattr(pool, name, None)
+            stats[key] = method() if callable(method) else None
+        with self._lock:
+            stats.update(connects=self.connects, checkouts=self.checkouts, invalidations=self.invalidations)
+        return stats
+
+
+def build_engine(url: str):
+    """Sync engine for ``url`` with the configured pool and SQLite pragmas."""
+    engine = create_engine(url, echo=False, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    engine.pool_monitor = PoolMonitor(engine)
+    return engine
+
+
+def build_async_engine(url: str):
+    async_engine = create_async_engine(url, echo=False, **engine_options(url))
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    async_engine.sync_engine.pool_monitor = PoolMonitor(async_engine.sync_engine)
+    return async_engine
+
+
+def pool_stats(engine) -> dict:
+    """Size, usage and connection counters of an engine's pool."""
+    engine = getattr(engine, "sync_engine", engine)
+    if getattr(engine, "pool_monitor", None) is None:
+        engine.pool_monitor = PoolMonitor(engine)
+    return engine.pool_monitor.stats()
+
+
 # Create engine with appropriate settings for SQLite or PostgreSQL
-if "sqlite" in DATABASE_URL:
-    # SQLite-specific settings
-    engine = create_engine(
-        DATABASE_URL,
-        echo=False,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-else:
-    # PostgreSQL-specific settings
-    engine = create_engine(
-        DATABASE_URL,
-        echo=False,
-        pool_pre_ping=True,  # Verify connections before using
-    )
+engine = build_engine(DATABASE_URL)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver of a database URL for its asyncio counterpart."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme.startswith("postgres"):
+        return f"postgresql+psycopg{sep}{rest}"
+    return url
+
+
+# Async engine used by the non-blocking prediction path, alongside the sync one
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+async_engine = build_async_engine(ASYNC_DATABASE_URL)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -51,3 +173,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,240 @@
+"""Lightweight in-process metrics rendered in the Prometheus text format.
+
+Each observation is a dict update under a per-metric lock (well under a
+microsecond), so the instrumentation stays on in production. Values that
+already live elsewhere (pool sizes, queue depths, model load time) are
+read at scrape time through collectors instead of being tracked twice.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _render_samples(self, items) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, fn):
+        """Register ``fn()``, called at scrape time, returning gauge samples.
+
+        ``fn`` returns ``(name, documentation, [(labels_dict, value), ...])``
+        tuples; metrics with no sample are skipped.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, documentation, samples in collect():
+                samples = [(labels, value) for labels, value in samples if value is not None]
+                if not samples:
+                    continue
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "prediction_stage_duration_seconds",
+    "Time spent in each stage of the prediction hot path.",
+    ("stage",),
+)
+PREDICTIONS = REGISTRY.counter("predictions_total", "Predictions served.", ("endpoint",))
+PREDICTION_ERRORS = REGISTRY.counter(
+    "prediction_errors_total", "Prediction requests that failed with a server error.", ("endpoint",)
+)
+# Route of each prediction endpoint -> its ``endpoint`` label in both counters
+PREDICTION_ENDPOINTS = {
+    "/api/p3/predict": "predict",
+    "/api/p3/predict/batch": "predict_batch",
+    "/api/p3/predict/async": "predict_async",
+}
+CACHE_LOOKUPS = REGISTRY.counter("prediction_cache_lookups_total", "Prediction cache lookups.", ("result",))
+ADMISSION_SHED = REGISTRY.counter(
+    "admission_shed_total", "Requests rejected by admission control before any work.", ("reason",)
+)
+ADMISSION_QUEUE_WAIT = REGISTRY.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a concurrency slot."
+)
+
+
+_local = threading.local()
+
+
+def stage(name: str):
+    """Time a block of the prediction hot path: ``with stage("inference"): ...``"""
+    if getattr(_local, "untimed", False):
+        return nullcontext()
+    return STAGE_SECONDS.time(stage=name)
+
+
+@contextmanager
+def untimed():
+    """Skip stage timings in this thread, for background scoring off the hot path."""
+    previous = getattr(_local, "untimed", False)
+    _local.untimed = True
+    try:
+        yield
+    finally:
+        _local.untimed = previous
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        # Read by the endpoints to time request parsing and validation
+        scope.setdefault("state", {})["request_start"] = start
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"], route=path, status=status)
+            if status >= 500 and path in PREDICTION_ENDPOINTS:
+                PREDICTION_ERRORS.inc(endpoint=PREDICTION_ENDPOINTS[path])
@@ -0,0 +1,16 @@
+"""JSON responses serialized with orjson."""
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson.
+
+    Handles datetimes and NumPy arrays/scalars natively, so endpoints can
+    return plain dicts, column tuples and prediction arrays without a
+    ``jsonable_encoder`` pass.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
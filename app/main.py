@@ -1,12 +1,208 @@
-from fastapi import FastAPI, Depends, HTTPException
+import hmac
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Optional
+import time
+from fastapi import BackgroundTasks, FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import pandas as pd
-from app.schemas.p3_request import EnergyRequest, PredictionResponse, PredictionHistoryResponse, DatasetResponse
-from app.services.p3_model import EnergyModel
-from app.core.database import get_db
-from app.models import EnergyDataset, EnergyPrediction
+from app.schemas.p3_request import (
+    AggregatesResponse,
+    BatchPredictionResult,
+    DatasetResponse,
+    EnergyRequest,
+    NearbyResponse,
+    PredictionHistoryResponse,
+    PredictionResult,
+)
+from app.services.p3_model import EnergyModel, start_registry_watcher, shutdown_registry_watcher
+from app.services.p3_experiments import get_shadow, get_split, shutdown_shadow
+from app.services.p3_registry import ModelRegistry, RegistryError
+from app.services.p3_compiled import UnsupportedModel
+from app.services.p3_explain import explain, get_explainer, get_explanation_cache
+from app.services.p3_datasets import dataset_view
+from app.services.p3_drift import drift_monitor_error, get_drift_monitor, record_predictions, shutdown_drift_monitor
+from app.services.p3_features import derive_payloads
+from app.services.p3_spatial import get_spatial_index, shutdown_spatial_index
+from app.services.p3_storage import save_prediction_for_dataset, save_predictions
+from app.services.p3_cache import cache_key, get_cache
+from app.services.p3_history import count_predictions, list_predictions
+from app.services.p3_rollups import GROUPS, aggregates
+from app.services import p3_export
+from app.services.p3_batching import get_batcher, shutdown_batcher
+from app.services.p3_executor import get_executor, shutdown_executor
+from app.services.p3_writer import WriterQueueFull, get_writer, shutdown_writer
+from app.core import config
+from app.core.admission import AdmissionMiddleware, get_admission, reserve_threads, shutdown_admission
+from app.core.database import async_engine, engine, get_db, get_async_db, pool_stats
+from app.core.responses import ORJSONResponse
+from app.core.metrics import CACHE_LOOKUPS, PREDICTIONS, REGISTRY, STAGE_SECONDS, MetricsMiddleware, stage
+from app.models import EnergyPrediction
 
-app = FastAPI(title="Futurisys ML API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    reserve_threads()
+    if config.MODEL_WARMUP_ON_STARTUP:
+        try:
+            await run_in_threadpool(EnergyModel.warm_up)
+        except Exception as e:
+            # Keep serving liveness; readiness reports the error
+            print(f"⚠️  Model warm-up failed: {e}")
+    split = get_split()
+    if split is not None:
+        # Load the A/B versions now rather than in the first requests they get
+        for version in split.weights:
+            try:
+                await run_in_threadpool(EnergyModel.get_version, version)
+            except Exception as e:
+                print(f"⚠️  A/B model version {version} unavailable, serving the active model instead: {e}")
+    if config.SPATIAL_INDEX_ON_STARTUP:
+        try:
+            await run_in_threadpool(get_spatial_index().load, engine)
+        except Exception as e:
+            # /api/p3/dataset/nearby retries the load on first use
+            print(f"⚠️  Spatial index not loaded: {e}")
+    start_registry_watcher()
+    yield
+    shutdown_registry_watcher()
+    shutdown_shadow()
+    shutdown_batcher()
+    shutdown_executor()
+    shutdown_writer()
+    shutdown_spatial_index()
+    shutdown_drift_monitor()
+    shutdown_admission()
+
+
+# Hot endpoints return ORJSONResponse themselves, skipping response_model
+# validation; the models still document them in OpenAPI
+app = FastAPI(title="Futurisys ML API", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(AdmissionMiddleware)
+# Outermost, so that shed requests are timed too
+app.add_middleware(MetricsMiddleware)
+
+
+@REGISTRY.collector
+def _runtime_metrics():
+    """Gauges read at scrape time from the pool, the model and the queues."""
+    pools = {"sync": pool_stats(engine), "async": pool_stats(async_engine)}
+    for name, key, doc in (
+        ("db_pool_size", "size", "Connections kept in the pool."),
+        ("db_pool_checked_out", "checked_out", "Connections currently in use."),
+        ("db_pool_overflow", "overflow", "Connections opened beyond the pool size."),
+        ("db_pool_connects", "connects", "Connections opened since startup."),
+        ("db_pool_checkouts", "checkouts", "Connections handed out by the pool since startup."),
+        ("db_pool_invalidations", "invalidations", "Connections discarded after an error since startup."),
+    ):
+        yield name, doc, [({"engine": engine_name}, stats[key]) for engine_name, stats in pools.items()]
+
+    status = EnergyModel.status()
+    yield "model_loaded", "1 once the model is loaded.", [({}, int(status["model_loaded"]))]
+    yield "model_load_seconds", "Time spent loading the model.", [({}, status["load_seconds"])]
+    yield "model_warmup_seconds", "Time spent on the warm-up prediction.", [({}, status["warmup_seconds"])]
+    yield "model_size_bytes", "Size of the model artifact.", [({}, status["size_bytes"])]
+
+    admission = get_admission().stats()
+    yield "admission_in_flight", "/api/p3 requests being served.", [({}, admission["in_flight"])]
+    yield "admission_queued", "/api/p3 requests waiting for a concurrency slot.", [({}, admission["queued"])]
+    if config.PREDICT_MICROBATCH_ENABLED:
+        depth = get_batcher().stats()["queue_depth"]
+        yield "microbatch_queue_depth", "Requests waiting for the micro-batcher.", [({}, depth)]
+    if config.WRITE_BEHIND_ENABLED:
+        depth = get_writer().stats()["queue_depth"]
+        yield "write_behind_queue_depth", "Submissions waiting to be written.", [({}, depth)]
+    if config.PREDICT_CACHE_ENABLED:
+        size = get_cache().stats()["size"]
+        yield "prediction_cache_entries", "Entries in the local prediction cache.", [({}, size)]
+    explanations = get_explanation_cache().stats()["size"]
+    yield "explanation_cache_entries", "Entries in the explanation cache.", [({}, explanations)]
+    spatial = get_spatial_index().stats()
+    yield "spatial_index_points", "Buildings in the /api/p3/dataset/nearby index.", [({}, spatial["points"])]
+    monitor = get_drift_monitor()
+    if monitor is not None:
+        report = monitor.report(config.DRIFT_CHECK_SECONDS)
+        yield "drift_psi", "Population stability index of each field against the reference profile.", [
+            ({"feature": name}, feature["psi"])
+            for name, feature in report["features"].items()
+            if feature["psi"] is not None
+        ]
+    shadow = get_shadow()
+    if shadow is not None:
+        stats = shadow.stats()
+        yield "shadow_queue_depth", "Predictions waiting for shadow scoring.", [({}, stats["queue_depth"])]
+        yield "shadow_rows_dropped", "Shadow scorings dropped on a full queue.", [({}, stats["rows_dropped"])]
+
+
+def _observe_request_parse(request: Request):
+    """Record the time from receiving the request to entering the endpoint.
+
+    This covers reading the body, JSON decoding and Pydantic validation.
+    """
+    start = request.scope.get("state", {}).get("request_start")
+    if start is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="request_parse")
+
+
+def _prepare(payloads):
+    """Compute the derived features of the request payloads in place."""
+    with stage("features"):
+        derive_payloads(payloads)
+
+
+def _write_behind(payloads, predictions, model_version=None) -> list[int]:
+    try:
+        return get_writer().submit(payloads, predictions, model_version)
+    except WriterQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Prediction storage is saturated, retry later",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _explainable(variant):
+    """Reject explain=true before anything is scored or stored if the answering model cannot be explained."""
+    try:
+        get_explainer(variant if variant is not None else EnergyModel.current())
+    except UnsupportedModel as e:
+        raise HTTPException(status_code=501, detail=f"Explanations are not available for this model: {e}")
+
+
+def _explain(payloads, model_version: str) -> list[dict]:
+    """Feature contributions of the version that made the predictions."""
+    try:
+        return explain(EnergyModel.get_version(model_version), payloads)
+    except UnsupportedModel as e:
+        raise HTTPException(status_code=501, detail=f"Explanations are not available for this model: {e}")
+
+
+def _ab_variant(request: Request):
+    """Model assigned to this request by AB_SPLIT, or None for the serving model."""
+    split = get_split()
+    if split is None:
+        return None
+    try:
+        return EnergyModel.get_version(split.choose(request.headers.get("X-Client-Id")))
+    except Exception:
+        # Reported once at startup; the serving model answers instead
+        return None
+
+
+def _shadow(payloads, dataset_ids, predictions, model_version):
+    shadow = get_shadow()
+    if shadow is not None:
+        shadow.submit(payloads, dataset_ids, predictions, model_version)
+
+
+def persist(db: Session, payloads, predictions, model_version=None) -> list[int]:
+    """Store predictions inline or through the write-behind queue."""
+    if config.WRITE_BEHIND_ENABLED:
+        return _write_behind(payloads, predictions, model_version)
+    return save_predictions(db, payloads, predictions, model_version)
 
 
 @app.get("/")
@@ -21,92 +217,412 @@ def root():
 
 @app.get("/health")
 def health_check():
+    status = EnergyModel.status()
+    if status["model_loaded"]:
+        return {"status": "ok", "message": "API en ligne 🚀", **status}
+    return {"status": "error", "message": f"Modèle non chargé: {status['error']}", **status}
+
+
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """The model is loaded and warmed up; only reads cached state.
+
+    With MODEL_WARMUP_ON_STARTUP=0 the first request loads the model, so the
+    worker is ready unless that load failed.
+    """
+    status = EnergyModel.status()
+    if config.MODEL_WARMUP_ON_STARTUP:
+        ready = status["model_loaded"] and status["warmed_up"]
+    else:
+        ready = status["error"] is None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ok" if ready else "unavailable", **status},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/api/p3/predict", response_model=PredictionResult)
+def predict_energy(
+    request: Request, payload: EnergyRequest, explain: bool = False, db: Session = Depends(get_db)
+):
+    """Predict the energy use of a building; ``explain=true`` adds the feature contributions."""
+    _observe_request_parse(request)
+    _prepare([payload])
+    variant = _ab_variant(request)
+    if explain:
+        _explainable(variant)
+    key = cached = None
+    if config.PREDICT_CACHE_ENABLED:
+        key_version = version = variant.version if variant else EnergyModel.version()
+        key = cache_key(payload, version)
+        cached = get_cache().get(key)
+        CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+
+    if cached is not None:
+        y = cached.prediction
+    else:
+        if variant is not None:
+            scored = variant.score([payload])
+        elif config.PREDICT_MICROBATCH_ENABLED:
+            try:
+                scored = get_batcher().predict([payload])
+            except TimeoutError:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Prediction queue is saturated, retry later",
+                    headers={"Retry-After": "1"},
+                )
+        else:
+            scored = EnergyModel.score([payload])
+        y, version = float(scored.predictions[0]), scored.model_version
+
+    # Reuse the EnergyDataset row of an identical payload instead of a duplicate
+    if (
+        cached is not None
+        and cached.dataset_id is not None
+        and config.PREDICT_CACHE_REUSE_DATASET
+        and not config.WRITE_BEHIND_ENABLED
+        and save_prediction_for_dataset(db, cached.dataset_id, y, version)
+    ):
+        dataset_id = cached.dataset_id
+    else:
+        dataset_id = persist(db, [payload], [y], version)[0]
+        # Only cache what the version in the key produced (not a freshly swapped model)
+        if key is not None and version == key_version:
+            get_cache().set(key, y, dataset_id)
+
+    _shadow([payload], [dataset_id], [y], version)
+    record_predictions([payload], [y], version)
+    PREDICTIONS.inc(endpoint="predict")
+    body = {"prediction": y, "dataset_id": dataset_id, "model_version": version}
+    if explain:
+        body["explanation"] = _explain([payload], version)[0]
+    return ORJSONResponse(body)
+
+
+async def _limit_batch_size(request: Request):
+    """Reject an oversized batch before Pydantic validates each of its items."""
+    try:
+        # Already decoded by FastAPI and cached on the request
+        body = await request.json()
+    except ValueError:
+        return  # Left to the body validation
+    if isinstance(body, list) and len(body) > config.PREDICT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(body)} > {config.PREDICT_BATCH_MAX_SIZE}",
+        )
+
+
+@app.post(
+    "/api/p3/predict/batch",
+    response_model=BatchPredictionResult,
+    dependencies=[Depends(_limit_batch_size)],
+)
+def predict_energy_batch(
+    request: Request, payloads: list[EnergyRequest], explain: bool = False, db: Session = Depends(get_db)
+):
+    """Score many buildings with one model call and one bulk insert.
+
+    ``explain=true`` adds the feature contributions, computed for the whole batch at once.
+    """
+    _observe_request_parse(request)
+    if not payloads:
+        return {"predictions": [], "dataset_ids": []}
+
+    _prepare(payloads)
+    variant = _ab_variant(request)
+    if explain:
+        _explainable(variant)
+    scored = variant.score(payloads) if variant is not None else EnergyModel.score(payloads)
+    y = scored.predictions.tolist()
+
+    dataset_ids = persist(db, payloads, y, scored.model_version)
+    _shadow(payloads, dataset_ids, y, scored.model_version)
+    record_predictions(payloads, y, scored.model_version)
+
+    PREDICTIONS.inc(len(y), endpoint="predict_batch")
+    body = {"predictions": y, "dataset_ids": dataset_ids, "model_version": scored.model_version}
+    if explain:
+        body["explanations"] = _explain(payloads, scored.model_version)
+    return ORJSONResponse(body)
+
+
+@app.post("/api/p3/predict/async", response_model=PredictionResult)
+async def predict_energy_async(
+    request: Request, payload: EnergyRequest, explain: bool = False, db: AsyncSession = Depends(get_async_db)
+):
+    """Same contract as /api/p3/predict without blocking the event loop.
+
+    Inference runs in the dedicated executor (INFERENCE_EXECUTOR /
+    INFERENCE_WORKERS) and persistence goes through the async engine.
+    """
+    _observe_request_parse(request)
+    _prepare([payload])
+    variant = _ab_variant(request)
+    if explain:
+        await run_in_threadpool(_explainable, variant)
+    if variant is not None:
+        scored = await run_in_threadpool(variant.score, [payload])
+    else:
+        scored = await get_executor().predict([payload])
+    y, version = float(scored.predictions[0]), scored.model_version
+
+    if config.WRITE_BEHIND_ENABLED:
+        dataset_ids = await run_in_threadpool(_write_behind, [payload], [y], version)
+    else:
+        dataset_ids = await db.run_sync(save_predictions, [payload], [y], version)
+
+    _shadow([payload], dataset_ids, [y], version)
+    record_predictions([payload], [y], version)
+    PREDICTIONS.inc(endpoint="predict_async")
+    body = {"prediction": y, "dataset_id": dataset_ids[0], "model_version": version}
+    if explain:
+        body["explanation"] = (await run_in_threadpool(_explain, [payload], version))[0]
+    return ORJSONResponse(body)
+
+
+@app.get("/api/p3/batching/stats")
+def get_batching_stats():
+    """Queue depth and batch size metrics of the micro-batcher."""
+    if not config.PREDICT_MICROBATCH_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_batcher().stats()}
+
+
+@app.get("/api/p3/writer/stats")
+def get_writer_stats():
+    """Queue depth and throughput of the write-behind writer."""
+    if not config.WRITE_BEHIND_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_writer().stats()}
+
+
+@app.get("/api/p3/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters and size of the prediction cache."""
+    if not config.PREDICT_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_cache().stats()}
+
+
+@app.get("/api/p3/drift")
+def get_drift():
+    """PSI/KS of the recent inputs and predictions against the reference profile."""
+    monitor = get_drift_monitor()
+    if monitor is None:
+        return {"enabled": False, "error": drift_monitor_error()}
+    return {"enabled": True, **monitor.report(config.DRIFT_CHECK_SECONDS)}
+
+
+@app.get("/api/p3/db/stats")
+def get_db_stats():
+    """Connection pool usage of the sync and async engines."""
+    return {"sync": pool_stats(engine), "async": pool_stats(async_engine)}
+
+
+@app.get("/api/p3/experiments/stats")
+def get_experiment_stats():
+    """Shadow scoring queue/throughput and the A/B traffic split."""
+    shadow = get_shadow()
+    split = get_split()
+    return {
+        "shadow": {"enabled": True, **shadow.stats()} if shadow else {"enabled": False},
+        "ab_split": split.weights if split else None,
+    }
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not hmac.compare_digest(x_admin_token or "", config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _swap_model(version: str):
     try:
-        # Validate model can be loaded
-        EnergyModel.load()
-        return {"status": "ok", "message": "API en ligne 🚀", "model_loaded": True}
+        # Other workers follow through their registry watcher
+        EnergyModel.activate(version)
     except Exception as e:
-        return {"status": "error", "message": f"Impossible de charger le modèle: {str(e)}", "model_loaded": False}
+        print(f"⚠️  Model version {version} could not be activated: {e}")
 
 
-@app.post("/api/p3/predict")
-def predict_energy(payload: EnergyRequest, db: Session = Depends(get_db)):
-    data = payload.model_dump()
+@app.get("/api/p3/admin/models", dependencies=[Depends(require_admin)])
+def list_model_versions():
+    """Registered model versions, the one served by this worker and the last reload."""
+    registry = ModelRegistry()
+    return {
+        "active": registry.active(),
+        "serving": EnergyModel.status()["model_version"],
+        "reload": EnergyModel.reload_status(),
+        "versions": registry.versions(),
+    }
 
-    # Renommage pour correspondre au modèle sklearn
-    data["PropertyGFABuilding(s)"] = data.pop("PropertyGFABuildings")
 
-    df = pd.DataFrame([data])
-    y = EnergyModel.predict(df)
-    
-    # 1. First, add the data to EnergyDataset
-    dataset_record = EnergyDataset(
-        building_type=payload.BuildingType,
-        primary_property_type=payload.PrimaryPropertyType,
-        zip_code=payload.ZipCode,
-        council_district_code=payload.CouncilDistrictCode,
-        neighborhood=payload.Neighborhood,
-        latitude=payload.Latitude,
-        longitude=payload.Longitude,
-        year_built=payload.YearBuilt,
-        number_of_buildings=payload.NumberofBuildings,
-        number_of_floors=payload.NumberofFloors,
-        property_gfa_total=payload.PropertyGFATotal,
-        property_gfa_parking=payload.PropertyGFAParking,
-        property_gfa_buildings=payload.PropertyGFABuildings,
-        list_of_all_property_use_types=payload.ListOfAllPropertyUseTypes,
-        largest_property_use_type=payload.LargestPropertyUseType,
-        largest_property_use_type_gfa=payload.LargestPropertyUseTypeGFA,
-        second_largest_property_use_type=payload.SecondLargestPropertyUseType,
-        second_largest_property_use_type_gfa=payload.SecondLargestPropertyUseTypeGFA,
-        third_largest_property_use_type=payload.ThirdLargestPropertyUseType,
-        third_largest_property_use_type_gfa=payload.ThirdLargestPropertyUseTypeGFA,
-        years_energystar_certified=payload.YearsENERGYSTARCertified,
-        outlier=payload.Outlier,
-        building_age=payload.BuildingAge,
-        surface_per_floor=payload.SurfacePerFloor,
-        is_multi_use=int(payload.IsMultiUse),
-        lat_zone=payload.LatZone,
-        lon_zone=payload.LonZone,
-    )
-    db.add(dataset_record)
-    db.flush()  # Get the ID without committing
-    dataset_id = dataset_record.id
-    
-    # 2. Then, add the prediction with the dataset_id
-    prediction_record = EnergyPrediction(
-        dataset_id=dataset_id,
-        prediction=float(y)
-    )
-    db.add(prediction_record)
-    db.commit()
-    db.refresh(prediction_record)
-    
-    return {"prediction": y, "dataset_id": dataset_id}
+@app.post("/api/p3/admin/models/{version}/activate", status_code=202, dependencies=[Depends(require_admin)])
+def activate_model_version(version: str, background_tasks: BackgroundTasks):
+    """Load, warm up and swap in a registered version without downtime.
+
+    The current model keeps serving while the new one loads; poll
+    ``GET /api/p3/admin/models`` for the outcome.
+    """
+    try:
+        ModelRegistry().metadata(version)
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not EnergyModel.begin_swap(version):
+        raise HTTPException(status_code=409, detail="A model reload is already in progress")
+    background_tasks.add_task(_swap_model, version)
+    return {"status": "loading", "version": version}
 
 
 @app.get("/api/p3/history", response_model=PredictionHistoryResponse)
 def get_prediction_history(
-    skip: int = 0, 
-    limit: int = 100, 
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=config.HISTORY_MAX_LIMIT),
+    cursor: Optional[int] = None,
+    dataset_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     db: Session = Depends(get_db)
 ):
-    """Get prediction history from database."""
-    predictions = db.query(EnergyPrediction).offset(skip).limit(limit).all()
-    total = db.query(EnergyPrediction).count()
+    """Get prediction history from database.
+
+    Pass the returned ``next_cursor`` as ``cursor`` to fetch the next page.
+    """
+    predictions = list_predictions(db, limit, cursor=cursor, skip=skip, dataset_id=dataset_id, start=start, end=end)
+    total = count_predictions(db, dataset_id=dataset_id, start=start, end=end)
     
-    return {
+    return ORJSONResponse({
         "total": total,
-        "predictions": predictions
+        "predictions": predictions,
+        "next_cursor": predictions[-1]["id"] if predictions and len(predictions) == limit else None,
+    })
+
+
+@app.get("/api/p3/aggregates", response_model=AggregatesResponse)
+def get_aggregates(
+    group_by: str = "all",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    by_day: bool = False,
+    quantiles: str = "0.5,0.9,0.99",
+    db: Session = Depends(get_db)
+):
+    """Prediction statistics per zip_code, neighborhood, primary_property_type or day.
+
+    Served from the rollup tables updated on every prediction write, never
+    from energy_predictions. ``by_day`` splits each group per day and
+    ``quantiles`` (comma-separated, empty for none) are approximate. The
+    period is ``start <= day < end``, like /api/p3/history.
+    """
+    if group_by not in GROUPS:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by, expected one of {GROUPS}")
+    try:
+        qs = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        qs = None
+    if qs is None or not all(0 <= q <= 1 for q in qs):
+        raise HTTPException(status_code=400, detail="quantiles must be comma-separated numbers between 0 and 1")
+
+    with stage("aggregates"):
+        groups = aggregates(db, group_by, start=start, end=end, by_day=by_day, quantiles=qs)
+    return ORJSONResponse({"group_by": group_by, "groups": groups})
+
+
+@app.get("/api/p3/export")
+def export_predictions(
+    format: str = "ndjson",
+    since_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    chunk_size: int = Query(5000, ge=1, le=config.EXPORT_MAX_CHUNK_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Stream every prediction joined with its input features.
+
+    Rows are read from a server-side cursor and encoded chunk by chunk, so
+    memory stays constant. Use ``since_id`` (last exported id) or ``since``
+    (timestamp) for incremental exports.
+    """
+    if format not in p3_export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, expected one of {sorted(p3_export.FORMATS)}")
+    if format in ("arrow", "parquet") and not p3_export.arrow_available():
+        raise HTTPException(status_code=501, detail="Arrow/Parquet export requires the 'parquet' extra (pyarrow)")
+
+    # The stream outlives the request-scoped session: read from its engine directly
+    query = p3_export.export_query(since_id=since_id, since=since)
+    chunks = p3_export.iter_chunks(db.get_bind(), query, chunk_size)
+    return StreamingResponse(
+        p3_export.encode(chunks, format),
+        media_type=p3_export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="predictions.{format}"'},
+    )
+
+
+@app.get("/api/p3/dataset/nearby", response_model=NearbyResponse)
+def get_nearby_datasets(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    radius: Optional[float] = Query(default=None, gt=0, description="Search radius in meters"),
+    k: int = Query(default=10, ge=1),
+    db: Session = Depends(get_db),
+):
+    """Stored buildings nearest to a point, with their latest prediction.
+
+    Returns the ``k`` nearest buildings, or the nearest ones within
+    ``radius`` meters when it is given.
+    """
+    if k > config.SPATIAL_NEARBY_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k too large: {k} > {config.SPATIAL_NEARBY_MAX_K}")
+    index = get_spatial_index()
+    index.ensure_loaded(db.get_bind())
+    with stage("spatial_query"):
+        neighbours = index.nearby(lat, lon, k=k, radius_m=radius)
+    if not neighbours:
+        return ORJSONResponse({"count": 0, "results": []})
+
+    ids = [dataset_id for dataset_id, _ in neighbours]
+    datasets = dataset_view()
+    rows = {row["id"]: dict(row) for row in db.execute(select(datasets).where(datasets.c.id.in_(ids))).mappings()}
+    # One row per building: its latest prediction, not its whole history
+    latest_ids = (
+        select(func.max(EnergyPrediction.id))
+        .where(EnergyPrediction.dataset_id.in_(ids))
+        .group_by(EnergyPrediction.dataset_id)
+    )
+    latest = {
+        dataset_id: {"prediction": prediction, "model_version": version}
+        for dataset_id, prediction, version in db.execute(
+            select(EnergyPrediction.dataset_id, EnergyPrediction.prediction, EnergyPrediction.model_version)
+            .where(EnergyPrediction.id.in_(latest_ids))
+        )
     }
 
+    results = [
+        {**rows[dataset_id], "distance_m": distance, **latest.get(dataset_id, {})}
+        for dataset_id, distance in neighbours
+        if dataset_id in rows
+    ]
+    return ORJSONResponse({"count": len(results), "results": results})
+
 
 @app.get("/api/p3/dataset/{dataset_id}", response_model=DatasetResponse)
 def get_dataset(dataset_id: int, db: Session = Depends(get_db)):
     """Get a specific dataset record by ID."""
-    dataset = db.query(EnergyDataset).filter(
-        EnergyDataset.id == dataset_id
-    ).first()
+    datasets = dataset_view()
+    dataset = db.execute(select(datasets).where(datasets.c.id == dataset_id)).mappings().first()
     
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset record not found")
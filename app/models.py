@@ -1,7 +1,7 @@
 """SQLAlchemy models for database tables."""
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, Float, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, JSON, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -16,7 +16,7 @@ class EnergyDataset(Base):
     # All input features
     building_type = Column(String, nullable=False)
     primary_property_type = Column(String, nullable=False)
-    zip_code = Column(Integer, nullable=False)
+    zip_code = Column(Integer, nullable=False, index=True)
     council_district_code = Column(Integer, nullable=False)
     neighborhood = Column(String, nullable=True)
     latitude = Column(Float, nullable=False)
@@ -45,12 +45,67 @@ class EnergyDataset(Base):
     # Relationship
     predictions = relationship("EnergyPrediction", back_populates="dataset")
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     def __repr__(self):
         return f"<EnergyDataset(id={self.id}, created_at={self.created_at})>"
 
 
+class CategoryDictionary(Base):
+    """Distinct values of the categorical energy_dataset fields."""
+
+    __tablename__ = "category_dictionary"
+    __table_args__ = (UniqueConstraint("field", "value", name="uq_category_dictionary_field_value"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    field = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+
+    def __repr__(self):
+        return f"<CategoryDictionary(id={self.id}, field={self.field}, value={self.value})>"
+
+
+class EnergyDatasetCompact(Base):
+    """energy_dataset with categorical fields as category_dictionary ids (DATASET_SCHEMA=compact)."""
+
+    __tablename__ = "energy_dataset_compact"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    building_type_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=False)
+    primary_property_type_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=False)
+    zip_code = Column(Integer, nullable=False, index=True)
+    council_district_code = Column(Integer, nullable=False)
+    neighborhood_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    year_built = Column(Integer, nullable=False)
+    number_of_buildings = Column(Integer, nullable=False)
+    number_of_floors = Column(Integer, nullable=False)
+    property_gfa_total = Column(Float, nullable=False)
+    property_gfa_parking = Column(Float, nullable=False)
+    property_gfa_buildings = Column(Float, nullable=False)
+    list_of_all_property_use_types_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=True)
+    largest_property_use_type_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=False)
+    largest_property_use_type_gfa = Column(Float, nullable=False)
+    second_largest_property_use_type_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=True)
+    second_largest_property_use_type_gfa = Column(Float, nullable=True)
+    third_largest_property_use_type_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=True)
+    third_largest_property_use_type_gfa = Column(Float, nullable=True)
+    years_energystar_certified = Column(Integer, nullable=False)
+    outlier_id = Column(Integer, ForeignKey("category_dictionary.id"), nullable=False)
+    building_age = Column(Float, nullable=False)
+    surface_per_floor = Column(Float, nullable=False)
+    is_multi_use = Column(Integer, nullable=False)
+    lat_zone = Column(Integer, nullable=False)
+    lon_zone = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<EnergyDatasetCompact(id={self.id}, created_at={self.created_at})>"
+
+
 class EnergyPrediction(Base):
     """Model for storing energy consumption predictions."""
     
@@ -59,16 +114,96 @@ class EnergyPrediction(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
     # Foreign key to dataset
-    dataset_id = Column(Integer, ForeignKey("energy_dataset.id"), nullable=False)
+    dataset_id = Column(Integer, ForeignKey("energy_dataset.id"), nullable=False, index=True)
     
     # Prediction output
     prediction = Column(Float, nullable=False)
+    model_version = Column(String, nullable=True, index=True)
     
     # Relationship
     dataset = relationship("EnergyDataset", back_populates="predictions")
     
     # Metadata
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     def __repr__(self):
         return f"<EnergyPrediction(id={self.id}, dataset_id={self.dataset_id}, prediction={self.prediction}, created_at={self.created_at})>"
+
+
+class ShadowPrediction(Base):
+    """Candidate model outputs scored in the background for the same inputs."""
+
+    __tablename__ = "shadow_predictions"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    # No foreign key: with write-behind the dataset row may not be committed yet
+    dataset_id = Column(Integer, nullable=False, index=True)
+    model_version = Column(String, nullable=False, index=True)
+    prediction = Column(Float, nullable=False)
+    primary_version = Column(String, nullable=True)
+    primary_prediction = Column(Float, nullable=True)
+    latency_ms = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ShadowPrediction(id={self.id}, dataset_id={self.dataset_id}, model_version={self.model_version})>"
+
+
+class PredictionRollup(Base):
+    """Running totals of predictions per day and dimension value (see p3_rollups)."""
+
+    __tablename__ = "prediction_rollups"
+
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    # Writers spread over ROLLUPS_SHARDS rows per group; reads add them up
+    shard = Column(Integer, primary_key=True, default=0)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    minimum = Column(Float, nullable=False)
+    maximum = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<PredictionRollup(dimension={self.dimension}, key={self.key}, day={self.day}, count={self.count})>"
+
+
+class PredictionRollupBin(Base):
+    """Log-scale histogram of the predictions of a rollup, for approximate quantiles."""
+
+    __tablename__ = "prediction_rollup_bins"
+
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<PredictionRollupBin(dimension={self.dimension}, key={self.key}, day={self.day}, bin={self.bin})>"
+
+
+class DatasetImport(Base):
+    """Progress of bulk CSV imports, used to resume interrupted loads."""
+
+    __tablename__ = "dataset_imports"
+
+    source = Column(String, primary_key=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<DatasetImport(source={self.source}, rows_done={self.rows_done})>"
+
+
+class IdReservation(Base):
+    """Next free primary key of a table, shared by the write-behind workers on SQLite."""
+
+    __tablename__ = "id_reservations"
+
+    table_name = Column(String, primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<IdReservation(table_name={self.table_name}, next_id={self.next_id})>"
@@ -1,8 +1,12 @@
 from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 class EnergyRequest(BaseModel):
+    # Padded categories would be unknown to the one-hot encoder; stripping them
+    # here means scoring, storage and the prediction cache see the same values
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     BuildingType: str = Field(json_schema_extra={"example": "NonResidential"})
     PrimaryPropertyType: str = Field(json_schema_extra={"example": "Mixed Use Property"})
     ZipCode: int = Field(json_schema_extra={"example": 98119})
@@ -25,11 +29,18 @@ class EnergyRequest(BaseModel):
     ThirdLargestPropertyUseTypeGFA: Optional[float] = Field(default=None, json_schema_extra={"example": 3000.0})
     YearsENERGYSTARCertified: Optional[int] = Field(default=None, json_schema_extra={"example": 5})
     Outlier: str = Field(json_schema_extra={"example": "No"})
-    BuildingAge: float = Field(json_schema_extra={"example": 55.0})
-    SurfacePerFloor: float = Field(json_schema_extra={"example": 18800.0})
-    IsMultiUse: bool = Field(json_schema_extra={"example": True})
-    LatZone: int = Field(json_schema_extra={"example": 3})
-    LonZone: int = Field(json_schema_extra={"example": 1})
+    # Derived server-side from the fields above (app/services/p3_features.py);
+    # values sent by the client are ignored
+    BuildingAge: Optional[float] = Field(default=None, json_schema_extra={"example": 55.0})
+    SurfacePerFloor: Optional[float] = Field(default=None, json_schema_extra={"example": 18800.0})
+    IsMultiUse: Optional[bool] = Field(default=None, json_schema_extra={"example": True})
+    LatZone: Optional[int] = Field(default=None, json_schema_extra={"example": 3})
+    LonZone: Optional[int] = Field(default=None, json_schema_extra={"example": 1})
+
+    @classmethod
+    def example(cls) -> "EnergyRequest":
+        """Request built from the field examples (used for warm-up)."""
+        return cls(**{name: field.json_schema_extra["example"] for name, field in cls.model_fields.items()})
 
 
 class DatasetResponse(BaseModel):
@@ -67,17 +78,73 @@ class DatasetResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class NearbyDataset(DatasetResponse):
+    """Dataset record with its distance and latest prediction."""
+    distance_m: float
+    prediction: Optional[float] = None
+    model_version: Optional[str] = None
+
+
+class NearbyResponse(BaseModel):
+    """Response model for /api/p3/dataset/nearby."""
+    count: int
+    results: list[NearbyDataset]
+
+
 class PredictionResponse(BaseModel):
     """Response model for a single prediction."""
     id: int
     dataset_id: int
     prediction: float
+    model_version: Optional[str] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
 
 
+class Explanation(BaseModel):
+    """prediction = bias + sum(contributions), one contribution per input field."""
+    bias: float
+    contributions: dict[str, float]
+
+
+class PredictionResult(BaseModel):
+    """Response of /api/p3/predict and /api/p3/predict/async."""
+    prediction: float
+    dataset_id: int
+    model_version: Optional[str] = None
+    # Only with ?explain=true
+    explanation: Optional[Explanation] = None
+
+
+class BatchPredictionResult(BaseModel):
+    """Response of /api/p3/predict/batch."""
+    predictions: list[float]
+    dataset_ids: list[int]
+    model_version: Optional[str] = None
+    explanations: Optional[list[Explanation]] = None
+
+
+class AggregateGroup(BaseModel):
+    """Statistics of the predictions of one group (and day)."""
+    key: Optional[str] = None
+    day: Optional[date] = None
+    count: int
+    sum: float
+    mean: float
+    min: float
+    max: float
+    quantiles: dict[str, float] = {}
+
+
+class AggregatesResponse(BaseModel):
+    """Response model for /api/p3/aggregates."""
+    group_by: str
+    groups: list[AggregateGroup]
+
+
 class PredictionHistoryResponse(BaseModel):
     """Response model for prediction history."""
     total: int
     predictions: list[PredictionResponse]
+    next_cursor: Optional[int] = None
@@ -0,0 +1,181 @@
+"""Dynamic micro-batching of concurrent single predictions."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Optional
+
+import numpy as np
+
+from app.core import config
+from app.services.p3_model import EnergyModel, ScoredBatch
+
+_STOP = object()
+
+
+def _predict_payloads(payloads) -> ScoredBatch:
+    return EnergyModel.score(payloads)
+
+
+def _slice(result, start: int, end: int):
+    if isinstance(result, ScoredBatch):
+        return result._replace(predictions=result.predictions[start:end])
+    return result[start:end]
+
+
+class MicroBatcher:
+    """Merge requests arriving within a short window into one model call.
+
+    Callers submit a list of items from any thread and get back a Future
+    holding one prediction per item. A single worker thread waits for the
+    first item, then keeps collecting until ``max_wait_ms`` elapsed or
+    ``max_batch_size`` items are queued, and scores them with one call to
+    ``predict_fn``. A ``ScoredBatch`` result is split with its model version.
+    Requests still queued when the batcher is closed fail with ``RuntimeError``.
+    """
+
+    def __init__(
+        self,
+        predict_fn=_predict_payloads,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        timeout: Optional[float] = None,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._largest_batch_size = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, items) -> Future:
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                future.set_exception(RuntimeError("The micro-batcher is closed"))
+            else:
+                self._queue.put((list(items), future))
+        return future
+
+    def predict(self, items, timeout: Optional[float] = None):
+        """Score ``items``, raising ``TimeoutError`` after ``timeout`` seconds (default: the batcher's)."""
+        future = self.submit(items)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        # Nothing is submitted after _STOP, so the queue is final
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                entry[1].set_exception(RuntimeError("The micro-batcher is closed"))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "last_batch_size": self._last_batch_size,
+                "largest_batch_size": self._largest_batch_size,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            pending = [first]
+            size = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                pending.append(entry)
+                size += len(entry[0])
+            self._score(pending, size)
+
+    def _score(self, pending, size: int):
+        # Callers that timed out cancelled their future: skip their items
+        pending = [(batch, future) for batch, future in pending if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        size = sum(len(batch) for batch, _ in pending)
+        items = [item for batch, _ in pending for item in batch]
+        try:
+            result = self.predict_fn(items)
+            if not isinstance(result, ScoredBatch):
+                result = np.asarray(result, dtype=float)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+        else:
+            start = 0
+            for batch, future in pending:
+                future.set_result(_slice(result, start, start + len(batch)))
+                start += len(batch)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._last_batch_size = size
+            self._largest_batch_size = max(self._largest_batch_size, size)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> MicroBatcher:
+    """Return the process-wide batcher, starting it on first use."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    max_batch_size=config.PREDICT_MICROBATCH_MAX_SIZE,
+                    max_wait_ms=config.PREDICT_MICROBATCH_WAIT_MS,
+                    timeout=config.PREDICT_MICROBATCH_TIMEOUT,
+                )
+    return _batcher
+
+
+def shutdown_batcher():
+    global _batcher
+    with _batcher_lock:
+        if _batcher is not None:
+            _batcher.close()
+            _batcher = None
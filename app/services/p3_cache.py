@@ -0,0 +1,164 @@
+"""Content-addressed cache of predictions for repeated payloads."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from app.core import config
+
+
+class CachedPrediction(NamedTuple):
+    prediction: float
+    dataset_id: Optional[int]
+
+
+def cache_key(payload, model_version: str) -> str:
+    """Hash the validated feature vector together with the model version.
+
+    Values are hashed as the model scores them: EnergyRequest already strips
+    strings and coerces types.
+    """
+    canonical = json.dumps(payload.model_dump(), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{model_version}:{canonical}".encode()).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """Cache table in a local SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS prediction_cache ("
+            "key TEXT PRIMARY KEY, prediction REAL NOT NULL, "
+            "dataset_id INTEGER, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CachedPrediction]:
+        row = self._conn().execute(
+            "SELECT prediction, dataset_id FROM prediction_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return CachedPrediction(*row) if row else None
+
+    def set(self, key: str, entry: CachedPrediction):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?)",
+            (key, entry.prediction, entry.dataset_id, time.time() + self.ttl),
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._trim(conn)
+
+    def _trim(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM prediction_cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM prediction_cache WHERE key IN ("
+            "SELECT key FROM prediction_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class PredictionCache:
+    """In-process LRU with TTL, optionally backed by a shared SQLite file.
+
+    Memory is bounded by ``max_entries`` (a few hundred bytes each). Local
+    misses fall through to the shared backend so that workers benefit from
+    each other's predictions.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600, shared: Optional[SQLiteCacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CachedPrediction]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                entry, expires_at = item
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+
+        entry = self.shared.get(key) if self.shared else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, entry, now)
+        return entry
+
+    def set(self, key: str, prediction: float, dataset_id: Optional[int] = None):
+        entry = CachedPrediction(float(prediction), dataset_id)
+        with self._lock:
+            self._store(key, entry, time.monotonic())
+        if self.shared:
+            self.shared.set(key, entry)
+
+    def _store(self, key: str, entry: CachedPrediction, now: float):
+        self._entries[key] = (entry, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "shared": self.shared is not None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> PredictionCache:
+    """Return the process-wide prediction cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared = None
+                if config.PREDICT_CACHE_SHARED_PATH:
+                    shared = SQLiteCacheBackend(
+                        config.PREDICT_CACHE_SHARED_PATH,
+                        config.PREDICT_CACHE_MAX_ENTRIES,
+                        config.PREDICT_CACHE_TTL,
+                    )
+                _cache = PredictionCache(config.PREDICT_CACHE_MAX_ENTRIES, config.PREDICT_CACHE_TTL, shared)
+    return _cache
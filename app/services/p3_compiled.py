@@ -0,0 +1,201 @@
+"""Array-native scoring path that bypasses pandas and the ColumnTransformer.
+
+At load time the fitted preprocessing (imputers, scalers, one-hot
+vocabularies) is turned into plain NumPy arrays and dict lookups, one
+encoder per input column. Payloads are then encoded straight into the
+dense matrix the final estimator was trained on, which removes the
+DataFrame construction and per-transformer dispatch that dominate the
+latency of a single-row prediction.
+
+Only the transformers listed in ``_compile_step`` are supported; anything
+else raises ``UnsupportedModel`` and the caller keeps the sklearn path.
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+from sklearn.compose import ColumnTransformer, TransformedTargetRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, StandardScaler
+
+
+class UnsupportedModel(Exception):
+    """The pipeline contains a step the compiled path cannot reproduce."""
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class _ColumnEncoder:
+    """Encode one input column into ``width`` output columns."""
+
+    def __init__(self, field: str, numeric_steps: list, fill: Optional[object], vocabulary: Optional[dict], strict: bool):
+        self.field = field
+        self.numeric_steps = numeric_steps
+        self.fill = fill
+        self.vocabulary = vocabulary
+        self.strict = strict
+        self.width = len(vocabulary) if vocabulary is not None else 1
+
+    def encode(self, values: list, out: np.ndarray):
+        if self.vocabulary is None:
+            column = np.array(values, dtype=float)
+            for step in self.numeric_steps:
+                column = step(column)
+            out[:, 0] = column
+            return
+
+        out[:] = 0.0
+        for row, value in enumerate(values):
+            if self.fill is not None and _is_missing(value):
+                value = self.fill
+            index = self.vocabulary.get(value)
+            if index is not None:
+                out[row, index] = 1.0
+            elif self.strict:
+                raise ValueError(f"Found unknown category {value!r} in column {self.field}")
+
+
+def _imputer_step(imputer: SimpleImputer, j: int, categorical: bool):
+    if imputer.add_indicator or not _is_missing(imputer.missing_values):
+        raise UnsupportedModel("SimpleImputer with indicators or custom missing values")
+    statistic = imputer.statistics_[j]
+    if categorical:
+        return statistic
+    statistic = float(statistic)
+    if math.isnan(statistic):
+        # sklearn drops columns that were empty at fit time
+        raise UnsupportedModel("SimpleImputer dropped an all-missing column")
+    return lambda column: np.where(np.isnan(column), statistic, column)
+
+
+def _compile_step(transformer, j: int, categorical: bool):
+    """Per-column equivalent of ``transformer`` for its ``j``-th input column."""
+    if isinstance(transformer, SimpleImputer):
+        return _imputer_step(transformer, j, categorical)
+    if categorical:
+        raise UnsupportedModel(f"{type(transformer).__name__} before a OneHotEncoder")
+    if isinstance(transformer, StandardScaler):
+        mean = float(transformer.mean_[j]) if transformer.with_mean else 0.0
+        scale = float(transformer.scale_[j]) if transformer.with_std else 1.0
+        return lambda column: (column - mean) / scale
+    if isinstance(transformer, MinMaxScaler):
+        scale, offset = float(transformer.scale_[j]), float(transformer.min_[j])
+        low, high = transformer.feature_range
+        if transformer.clip:
+            return lambda column: np.clip(column * scale + offset, low, high)
+        return lambda column: column * scale + offset
+    raise UnsupportedModel(f"Unsupported transformer {type(transformer).__name__}")
+
+
+def _one_hot_vocabulary(encoder: OneHotEncoder, j: int) -> dict:
+    if encoder.drop_idx_ is not None or getattr(encoder, "_infrequent_enabled", False):
+        raise UnsupportedModel("OneHotEncoder with drop or infrequent categories")
+    return {category: index for index, category in enumerate(encoder.categories_[j])}
+
+
+def _compile_transformer(transformer, columns: list, fields: dict) -> list:
+    steps = [] if transformer == "passthrough" else (
+        [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+    )
+    steps = [step for step in steps if step not in (None, "passthrough")]
+    encoder = steps[-1] if steps and isinstance(steps[-1], OneHotEncoder) else None
+    if encoder is not None:
+        steps = steps[:-1]
+        if encoder.handle_unknown not in ("ignore", "error", "infrequent_if_exist"):
+            raise UnsupportedModel(f"OneHotEncoder(handle_unknown={encoder.handle_unknown!r})")
+
+    encoders = []
+    for j, column in enumerate(columns):
+        compiled = [_compile_step(step, j, categorical=encoder is not None) for step in steps]
+        field = fields.get(column, column)
+        if encoder is None:
+            encoders.append(_ColumnEncoder(field, compiled, None, None, strict=False))
+        else:
+            fill = compiled[-1] if compiled else None
+            strict = encoder.handle_unknown == "error"
+            encoders.append(_ColumnEncoder(field, [], fill, _one_hot_vocabulary(encoder, j), strict))
+    return encoders
+
+
+def _compile_column_transformer(ct: ColumnTransformer, fields: dict) -> list:
+    names = list(getattr(ct, "feature_names_in_", []))
+    encoders = []
+    for _, transformer, columns in ct.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        columns = [names[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        if not all(isinstance(c, str) for c in columns):
+            raise UnsupportedModel("ColumnTransformer columns must be selected by name")
+        encoders.extend(_compile_transformer(transformer, columns, fields))
+    return encoders
+
+
+class CompiledModel:
+    """Score payload objects with precompiled preprocessing and the fitted estimator."""
+
+    def __init__(self, encoders: list, estimator, target_transformer=None):
+        self.encoders = encoders
+        self.estimator = estimator
+        self.target_transformer = target_transformer
+        self.width = sum(encoder.width for encoder in encoders)
+        expected = getattr(estimator, "n_features_in_", self.width)
+        if expected != self.width:
+            raise UnsupportedModel(f"Compiled width {self.width} != estimator input {expected}")
+
+    @classmethod
+    def compile(cls, model, fields: Optional[dict] = None) -> "CompiledModel":
+        """Build the compiled form of ``model``.
+
+        ``model`` is a ``Pipeline(ColumnTransformer, estimator)``, optionally
+        wrapped in a ``TransformedTargetRegressor``. ``fields`` maps training
+        column names to payload attribute names when they differ.
+        """
+        fields = fields or {}
+        target_transformer = None
+        if isinstance(model, TransformedTargetRegressor):
+            target_transformer = model.transformer_
+            model = model.regressor_
+        if not isinstance(model, Pipeline) or len(model.steps) != 2:
+            raise UnsupportedModel("Expected Pipeline(preprocessor, estimator)")
+        preprocessor, estimator = model.steps[0][1], model.steps[-1][1]
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise UnsupportedModel(f"Unsupported preprocessor {type(preprocessor).__name__}")
+        return cls(_compile_column_transformer(preprocessor, fields), estimator, target_transformer)
+
+    def transform(self, payloads) -> np.ndarray:
+        """Encode payloads into the estimator's dense input matrix."""
+        X = np.empty((len(payloads), self.width), dtype=float)
+        offset = 0
+        for encoder in self.encoders:
+            values = [getattr(payload, encoder.field) for payload in payloads]
+            encoder.encode(values, X[:, offset:offset + encoder.width])
+            offset += encoder.width
+        return X
+
+    def predict_encoded(self, X: np.ndarray) -> np.ndarray:
+        """Score a matrix returned by ``transform``."""
+        y = np.asarray(self.estimator.predict(X), dtype=float)
+        if self.target_transformer is not None:
+            y = self.target_transformer.inverse_transform(y.reshape(-1, 1)).reshape(-1)
+        return y
+
+    def predict(self, payloads) -> np.ndarray:
+        return self.predict_encoded(self.transform(payloads))
+
+
+def verify(compiled: CompiledModel, reference_fn, payloads, rtol: float = 1e-6) -> float:
+    """Compare the compiled path with ``reference_fn(payloads)``.
+
+    Returns the largest relative difference; raises ``UnsupportedModel`` if
+    it exceeds ``rtol``.
+    """
+    expected = np.asarray(reference_fn(payloads), dtype=float)
+    actual = compiled.predict(payloads)
+    error = float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-12)))
+    if not error <= rtol:
+        raise UnsupportedModel(f"Compiled predictions differ from the pipeline (relative error {error:.2e})")
+    return error
@@ -0,0 +1,177 @@
+"""Storage layout of the prediction inputs (energy_dataset rows).
+
+``DATASET_SCHEMA=wide`` (default) stores every field in ``energy_dataset``.
+``DATASET_SCHEMA=compact`` stores rows in ``energy_dataset_compact`` where
+the categorical fields are integer ids into ``category_dictionary``; each
+distinct value is stored once instead of on every row.
+
+Writers go through ``dataset_table`` / ``insert_datasets`` and readers
+through ``dataset_view``, which exposes the ``energy_dataset`` column names
+whatever the layout. Filters and counts on the non-categorical columns can
+use ``dataset_table`` directly (same names) and skip the dictionary joins.
+Existing databases are converted with
+``uv run python create_db.py compact``.
+"""
+
+import threading
+import weakref
+from functools import lru_cache
+
+from sqlalchemy import insert, select
+
+from app.core import config
+from app.models import CategoryDictionary, EnergyDataset, EnergyDatasetCompact
+
+# energy_dataset columns stored as category_dictionary ids in the compact layout
+CATEGORICAL = [
+    "building_type",
+    "primary_property_type",
+    "neighborhood",
+    "list_of_all_property_use_types",
+    "largest_property_use_type",
+    "second_largest_property_use_type",
+    "third_largest_property_use_type",
+    "outlier",
+]
+LAYOUTS = ("wide", "compact")
+
+
+def layout() -> str:
+    if config.DATASET_SCHEMA not in LAYOUTS:
+        raise ValueError(f"Invalid DATASET_SCHEMA {config.DATASET_SCHEMA!r}, expected one of {LAYOUTS}")
+    return config.DATASET_SCHEMA
+
+
+def dataset_table():
+    """Table the dataset rows are written to."""
+    return EnergyDatasetCompact.__table__ if layout() == "compact" else EnergyDataset.__table__
+
+
+def _engine(db):
+    # Session or Connection
+    return db.get_bind() if hasattr(db, "get_bind") else db.engine
+
+
+class CategoryCodes:
+    """category_dictionary ids, cached per database.
+
+    Unknown values are inserted (ignoring concurrent inserts of the same
+    value) in the caller's transaction. They are only cached once seen
+    committed, so a rolled back transaction never leaves a stale id behind.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = weakref.WeakKeyDictionary()
+
+    def lookup(self, db, pairs) -> dict:
+        """``{(field, value): id}`` for every pair, adding the missing ones."""
+        engine = _engine(db)
+        with self._lock:
+            codes = self._codes.setdefault(engine, {})
+            known = {pair: codes[pair] for pair in pairs if pair in codes}
+        missing = set(pairs) - known.keys()
+        if not missing:
+            return known
+
+        found = self._select(db, missing)
+        with self._lock:
+            codes.update(found)
+        new = missing - found.keys()
+        if new:
+            db.execute(self._insert_ignore(engine), [{"field": field, "value": value} for field, value in new])
+            found.update(self._select(db, new))
+        return {**known, **found}
+
+    def clear(self):
+        with self._lock:
+            self._codes.clear()
+
+    @staticmethod
+    def _select(db, pairs) -> dict:
+        table = CategoryDictionary.__table__
+        by_field = {}
+        for field, value in pairs:
+            by_field.setdefault(field, []).append(value)
+        found = {}
+        for field, values in by_field.items():
+            rows = db.execute(
+                select(table.c.id, table.c.value).where(table.c.field == field, table.c.value.in_(values))
+            )
+            found.update(((field, value), id_) for id_, value in rows)
+        return found
+
+    @staticmethod
+    def _insert_ignore(engine):
+        table = CategoryDictionary.__table__
+        if engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            return insert(table)
+        return dialect_insert(table).on_conflict_do_nothing()
+
+
+CODES = CategoryCodes()
+
+
+def encode_rows(db, rows: list[dict]) -> list[dict]:
+    """energy_dataset column values -> energy_dataset_compact column values."""
+    pairs = {(field, row[field]) for row in rows for field in CATEGORICAL if row.get(field) is not None}
+    codes = CODES.lookup(db, pairs)
+    encoded = []
+    for row in rows:
+        out = {key: value for key, value in row.items() if key not in CATEGORICAL}
+        for field in CATEGORICAL:
+            value = row.get(field)
+            out[f"{field}_id"] = None if value is None else codes[(field, value)]
+        encoded.append(out)
+    return encoded
+
+
+def encode_frame(db, df):
+    """Vectorized ``encode_rows`` for a DataFrame of energy_dataset columns."""
+    df = df.copy()
+    for field in CATEGORICAL:
+        if field not in df:
+            continue
+        values = df.pop(field)
+        distinct = values.dropna().unique()
+        codes = CODES.lookup(db, {(field, value) for value in distinct})
+        df[f"{field}_id"] = values.map({value: codes[(field, value)] for value in distinct}).astype("Int64")
+    return df
+
+
+def insert_datasets(db, rows: list[dict]) -> list[int]:
+    """Insert energy_dataset column values in the configured layout, return their ids."""
+    table = dataset_table()
+    if table is EnergyDatasetCompact.__table__:
+        rows = encode_rows(db, rows)
+    if rows and all("id" in row for row in rows):
+        db.execute(insert(table), rows)
+        return [row["id"] for row in rows]
+    result = db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+    return [row[0] for row in result]
+
+
+@lru_cache(maxsize=None)
+def _view(name: str):
+    if name == "wide":
+        return EnergyDataset.__table__
+    table = EnergyDatasetCompact.__table__
+    joined = table
+    columns = []
+    for column in EnergyDataset.__table__.columns:
+        if column.name not in CATEGORICAL:
+            columns.append(table.c[column.name])
+            continue
+        values = CategoryDictionary.__table__.alias(f"{column.name}_dictionary")
+        joined = joined.outerjoin(values, table.c[f"{column.name}_id"] == values.c.id)
+        columns.append(values.c.value.label(column.name))
+    return select(*columns).select_from(joined).subquery("energy_dataset")
+
+
+def dataset_view():
+    """Selectable with the energy_dataset columns in the configured layout."""
+    return _view(layout())
@@ -0,0 +1,407 @@
+"""Drift of the prediction traffic against a reference profile.
+
+The reference profile is computed once from a CSV of model inputs (the test
+set by default) and stored as JSON:
+
+    uv run python -m app.services.p3_drift data/X_test.csv data/drift_reference.json
+
+- numeric fields: ``DRIFT_BINS`` bins between the reference quantiles, plus
+  one bin for missing values;
+- categorical fields: the ``MAX_CATEGORIES`` most frequent reference values,
+  plus one bin for every other value;
+- predictions of the current model on the CSV, binned like a numeric field;
+  only predictions of that model version are compared with them, so a
+  swapped or A/B model leaves the prediction PSI at null instead of
+  reporting the model change as drift.
+
+Each worker keeps one count per bin (constant memory) and a Space-Saving
+top-k of the categorical values absent from the reference. Requests only
+queue references to their payloads (~1 µs); the background checker folds
+the queue into the counts (~10 µs per row) every ``DRIFT_CHECK_SECONDS``
+or as soon as it holds ``MAX_PENDING`` rows. Counts decay with a half-life of
+``DRIFT_HALF_LIFE_SECONDS`` so the report describes recent traffic.
+
+Each check compares the counts with the reference: population stability
+index (PSI) for every field, and for numeric fields the Kolmogorov-Smirnov
+distance between the two binned distributions (the largest CDF gap at the
+reference quantiles, a lower bound of the exact statistic).
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.services.p3_features import derive_frame
+from app.services.p3_model import FEATURE_RENAMES, EnergyModel
+
+# EnergyRequest fields monitored as categories and as numbers. Not
+# YearsENERGYSTARCertified: the CSV holds the concatenated certification
+# years ("20162015") where requests send a count
+CATEGORICAL = [
+    "BuildingType",
+    "PrimaryPropertyType",
+    "ZipCode",
+    "CouncilDistrictCode",
+    "Neighborhood",
+    "ListOfAllPropertyUseTypes",
+    "LargestPropertyUseType",
+    "SecondLargestPropertyUseType",
+    "ThirdLargestPropertyUseType",
+    "Outlier",
+    "IsMultiUse",
+]
+NUMERIC = [
+    "Latitude",
+    "Longitude",
+    "YearBuilt",
+    "NumberofBuildings",
+    "NumberofFloors",
+    "PropertyGFATotal",
+    "PropertyGFAParking",
+    "PropertyGFABuildings",
+    "LargestPropertyUseTypeGFA",
+    "SecondLargestPropertyUseTypeGFA",
+    "ThirdLargestPropertyUseTypeGFA",
+    "BuildingAge",
+    "SurfacePerFloor",
+    "LatZone",
+    "LonZone",
+]
+PREDICTION = "prediction"
+
+MAX_CATEGORIES = 50
+TOP_K = 10
+MAX_PENDING = 4096
+# Floor of the bin proportions in the PSI, so that empty bins stay finite
+PSI_EPSILON = 1e-4
+
+
+def _category(value) -> Optional[str]:
+    """Category label shared by CSV cells and request fields (98119.0 and 98119 match)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _numbers(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+
+def _numeric_profile(values, bins: int) -> dict:
+    values = _numbers(values)
+    present = values[~np.isnan(values)]
+    edges = np.unique(np.quantile(present, np.linspace(0, 1, bins + 1)[1:-1])) if len(present) else np.array([])
+    counts = _numeric_counts(edges, values)
+    return {"edges": edges.tolist(), "proportions": (counts / counts.sum()).tolist()}
+
+
+def _numeric_counts(edges, values: np.ndarray) -> np.ndarray:
+    """Counts per bin, the last bin holding missing values."""
+    index = np.where(np.isnan(values), len(edges) + 1, np.searchsorted(edges, values, side="right"))
+    return np.bincount(index, minlength=len(edges) + 2).astype(float)
+
+
+def _categorical_profile(values) -> dict:
+    counts = pd.Series([_category(v) for v in values], dtype=object).value_counts(dropna=False)
+    kept = counts.iloc[:MAX_CATEGORIES]
+    proportions = [*kept.tolist(), counts.iloc[MAX_CATEGORIES:].sum()]
+    return {
+        "categories": [None if pd.isna(c) else c for c in kept.index],
+        "proportions": (np.array(proportions, dtype=float) / counts.sum()).tolist(),
+    }
+
+
+def build_reference(path, bins: int = 10) -> dict:
+    """Reference profile of a CSV of model inputs (training column names accepted)."""
+    df = derive_frame(pd.read_csv(path).rename(columns={v: k for k, v in FEATURE_RENAMES.items()}))
+    loaded = EnergyModel.current()
+    predictions = loaded.predict_frame(df.rename(columns=FEATURE_RENAMES))
+    return {
+        "source": str(path),
+        "rows": len(df),
+        "model_version": loaded.version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "numeric": {
+            **{name: _numeric_profile(df[name], bins) for name in NUMERIC if name in df},
+            PREDICTION: _numeric_profile(predictions, bins),
+        },
+        "categorical": {name: _categorical_profile(df[name]) for name in CATEGORICAL if name in df},
+    }
+
+
+def psi(expected, actual) -> float:
+    """Population stability index between two distributions over the same bins."""
+    expected = np.maximum(np.asarray(expected, dtype=float), PSI_EPSILON)
+    actual = np.maximum(np.asarray(actual, dtype=float), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks(expected, actual) -> float:
+    """Largest gap between the CDFs of two binned distributions (missing bin excluded)."""
+    expected, actual = np.asarray(expected[:-1], dtype=float), np.asarray(actual[:-1], dtype=float)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return 0.0
+    return float(np.abs(np.cumsum(expected / expected.sum()) - np.cumsum(actual / actual.sum())).max())
+
+
+class TopK:
+    """Space-Saving sketch: the ``k`` most frequent values and an overestimate of their counts."""
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.counts = {}
+
+    def add(self, value: str, count: float = 1.0):
+        if value in self.counts or len(self.counts) < self.k:
+            self.counts[value] = self.counts.get(value, 0.0) + count
+            return
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[value] = self.counts.pop(smallest) + count
+
+    def scale(self, factor: float):
+        for value in self.counts:
+            self.counts[value] *= factor
+
+    def top(self) -> list:
+        return sorted(self.counts.items(), key=lambda item: -item[1])
+
+
+class DriftMonitor:
+    """Binned counts of the traffic of this worker, compared with a reference profile."""
+
+    def __init__(self, reference: dict, half_life: float = 0.0):
+        self.reference = reference
+        self.half_life = half_life
+        self._edges = {name: np.array(p["edges"]) for name, p in reference["numeric"].items()}
+        self._vocabulary = {
+            name: {category: i for i, category in enumerate(p["categories"])}
+            for name, p in reference["categorical"].items()
+        }
+        self._numeric = {name: np.zeros(len(edges) + 2) for name, edges in self._edges.items()}
+        self._categorical = {name: np.zeros(len(v) + 1) for name, v in self._vocabulary.items()}
+        self._unseen = {name: TopK() for name in self._vocabulary}
+        self._pending = []
+        self._pending_rows = 0
+        # Set when the queue is full, for the background checker to fold it
+        self.wakeup = threading.Event()
+        self.background = False
+        self._lock = threading.Lock()
+        self._fold_lock = threading.Lock()
+        self._folded_at = time.monotonic()
+        self.rows_seen = 0
+        self._report = None
+        self._report_at = 0.0
+
+    @classmethod
+    def from_file(cls, path, half_life: float = 0.0) -> "DriftMonitor":
+        return cls(json.loads(Path(path).read_text()), half_life)
+
+    def record(self, payloads, predictions, model_version: Optional[str]):
+        """Queue a batch of requests and their predictions (hot path: no per-field work)."""
+        if model_version != self.reference["model_version"]:
+            predictions = ()
+        with self._lock:
+            self._pending.append((payloads, predictions))
+            self._pending_rows += len(payloads)
+            pending = self._pending_rows
+        if pending >= MAX_PENDING:
+            # Folded inline only without a checker, or if it falls far behind
+            if self.background and pending < 4 * MAX_PENDING:
+                self.wakeup.set()
+            else:
+                self.fold()
+
+    def fold(self):
+        """Add the queued requests to the counts."""
+        with self._fold_lock:
+            with self._lock:
+                pending, self._pending, self._pending_rows = self._pending, [], 0
+            now = time.monotonic()
+            if self.half_life > 0:
+                self._decay(0.5 ** ((now - self._folded_at) / self.half_life))
+            self._folded_at = now
+            if not pending:
+                return
+            payloads = [p for batch, _ in pending for p in batch]
+            for name, edges in self._edges.items():
+                if name == PREDICTION:
+                    values = np.concatenate([np.asarray(y, dtype=float) for _, y in pending])
+                else:
+                    values = np.array([getattr(p, name) for p in payloads], dtype=float)
+                self._numeric[name] += _numeric_counts(edges, values)
+            for name, vocabulary in self._vocabulary.items():
+                counts = self._categorical[name]
+                other = len(vocabulary)
+                for value in map(_category, (getattr(p, name) for p in payloads)):
+                    index = vocabulary.get(value, other)
+                    counts[index] += 1
+                    if index == other:
+                        self._unseen[name].add(value)
+            self.rows_seen += len(payloads)
+
+    def _decay(self, factor: float):
+        for counts in (*self._numeric.values(), *self._categorical.values()):
+            counts *= factor
+        for sketch in self._unseen.values():
+            sketch.scale(factor)
+
+    def check(self) -> dict:
+        """Fold the queue and compare the current counts with the reference."""
+        self.fold()
+        with self._fold_lock:
+            numeric = {name: counts.copy() for name, counts in self._numeric.items()}
+            categorical = {name: counts.copy() for name, counts in self._categorical.items()}
+            unseen = {name: sketch.top() for name, sketch in self._unseen.items()}
+        weight = float(next(iter(numeric.values())).sum()) if numeric else 0.0
+        features = {}
+        for name, counts in numeric.items():
+            expected = self.reference["numeric"][name]["proportions"]
+            actual = counts / counts.sum() if counts.sum() else counts
+            features[name] = {"type": "numeric", "psi": psi(expected, actual), "ks": binned_ks(expected, actual)}
+        for name, counts in categorical.items():
+            expected = self.reference["categorical"][name]["proportions"]
+            actual = counts / counts.sum() if counts.sum() else counts
+            features[name] = {
+                "type": "categorical",
+                "psi": psi(expected, actual),
+                "unseen_share": float(actual[-1]) if counts.sum() else 0.0,
+                "top_unseen": [{"value": v, "count": c} for v, c in unseen[name]],
+            }
+        for name, feature in features.items():
+            # No traffic yet, or (predictions) none from the reference model version
+            counts = numeric[name] if name in numeric else categorical[name]
+            if not counts.sum():
+                feature["psi"] = None
+                feature.pop("ks", None)
+        report = {
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "rows_seen": self.rows_seen,
+            "effective_rows": weight,
+            "reference": {k: self.reference[k] for k in ("source", "rows", "model_version", "created_at")},
+            "psi_threshold": config.DRIFT_PSI_THRESHOLD,
+            "drifted": sorted(
+                name for name, f in features.items()
+                if f["psi"] is not None and f["psi"] >= config.DRIFT_PSI_THRESHOLD
+            ),
+            "features": features,
+        }
+        self._report, self._report_at = report, time.monotonic()
+        return report
+
+    def report(self, max_age: float) -> dict:
+        """Last check if younger than ``max_age`` seconds, else a new one."""
+        if self._report is None or time.monotonic() - self._report_at >= max_age:
+            return self.check()
+        return self._report
+
+
+class DriftChecker:
+    """Periodic check in the background, logging the fields that start drifting."""
+
+    def __init__(self, monitor: DriftMonitor, interval: float):
+        self.monitor = monitor
+        self.interval = interval
+        self._drifted = set()
+        self._stop = threading.Event()
+        monitor.background = True
+        self._thread = threading.Thread(target=self._run, name="drift-checker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_check = time.monotonic() + self.interval
+        while True:
+            self.monitor.wakeup.wait(max(0.0, next_check - time.monotonic()))
+            if self._stop.is_set():
+                return
+            if self.monitor.wakeup.is_set():
+                self.monitor.wakeup.clear()
+                self.monitor.fold()
+            if time.monotonic() < next_check:
+                continue
+            next_check = time.monotonic() + self.interval
+            try:
+                drifted = set(self.monitor.check()["drifted"])
+            except Exception as e:
+                print(f"⚠️  Drift check failed: {e}")
+                continue
+            if drifted - self._drifted:
+                print(f"⚠️  Input drift (PSI >= {config.DRIFT_PSI_THRESHOLD}): {', '.join(sorted(drifted))}")
+            self._drifted = drifted
+
+    def close(self):
+        self._stop.set()
+        self.monitor.wakeup.set()
+        self._thread.join()
+        self.monitor.background = False
+
+
+_monitor = None
+_checker = None
+_monitor_lock = threading.Lock()
+_monitor_error = None
+
+
+def get_drift_monitor() -> Optional[DriftMonitor]:
+    """Process-wide monitor, or None when disabled or without a reference profile."""
+    global _monitor, _checker, _monitor_error
+    if not config.DRIFT_MONITOR_ENABLED:
+        return None
+    if _monitor is None and _monitor_error is None:
+        with _monitor_lock:
+            if _monitor is None and _monitor_error is None:
+                try:
+                    _monitor = DriftMonitor.from_file(config.DRIFT_REFERENCE_PATH, config.DRIFT_HALF_LIFE_SECONDS)
+                except (OSError, ValueError, KeyError) as e:
+                    # Reported once; predictions are served without monitoring
+                    _monitor_error = str(e)
+                    print(f"⚠️  Drift monitor disabled, reference profile unreadable: {e}")
+                    return None
+                if config.DRIFT_CHECK_SECONDS > 0:
+                    _checker = DriftChecker(_monitor, config.DRIFT_CHECK_SECONDS)
+    return _monitor
+
+
+def drift_monitor_error() -> Optional[str]:
+    return _monitor_error
+
+
+def record_predictions(payloads, predictions, model_version: Optional[str]):
+    """Feed the monitor from the prediction endpoints."""
+    monitor = get_drift_monitor()
+    if monitor is not None:
+        monitor.record(payloads, predictions, model_version)
+
+
+def shutdown_drift_monitor():
+    global _monitor, _checker, _monitor_error
+    with _monitor_lock:
+        if _checker is not None:
+            _checker.close()
+        _monitor = _checker = _monitor_error = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the drift reference profile from a CSV of model inputs.")
+    parser.add_argument("input", nargs="?", default="data/X_test.csv", help="CSV with the model input columns")
+    parser.add_argument("output", nargs="?", default="data/drift_reference.json", help="Destination JSON file")
+    parser.add_argument("--bins", type=int, default=config.DRIFT_BINS, help="Quantile bins per numeric field")
+    args = parser.parse_args(argv)
+
+    reference = build_reference(args.input, bins=args.bins)
+    Path(args.output).write_text(json.dumps(reference, indent=1))
+    print(f"✅ Reference profile of {reference['rows']} rows ({args.input}) → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
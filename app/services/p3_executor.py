@@ -0,0 +1,75 @@
+"""Dedicated executor running model inference off the event loop."""
+
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.core import config
+from app.services.p3_model import EnergyModel, ScoredBatch
+
+
+def _init_worker():
+    # Load the model once per worker process instead of on the first request
+    EnergyModel.load()
+
+
+def _predict_payloads(payloads) -> ScoredBatch:
+    return EnergyModel.score(payloads)
+
+
+def _predict_version(version: str, payloads) -> ScoredBatch:
+    # Worker processes have no registry watcher: follow the parent's hot swaps
+    if EnergyModel.current().version != version:
+        EnergyModel.swap(version)
+    return EnergyModel.score(payloads)
+
+
+class InferenceExecutor:
+    """Thread or process pool sized per deployment.
+
+    Threads are enough when the pipeline releases the GIL (most of the
+    sklearn/NumPy work does); a process pool isolates GIL-heavy pipelines
+    at the cost of pickling payloads and results. Each process task carries
+    the version served by the parent, which the worker swaps to if needed.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4):
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        elif kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        else:
+            raise ValueError(f"Unknown executor type: {kind!r} (expected 'thread' or 'process')")
+        self.kind = kind
+        self.workers = workers
+
+    async def predict(self, payloads) -> ScoredBatch:
+        loop = asyncio.get_running_loop()
+        if self.kind == "process":
+            return await loop.run_in_executor(self._pool, _predict_version, EnergyModel.version(), list(payloads))
+        return await loop.run_in_executor(self._pool, _predict_payloads, list(payloads))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> InferenceExecutor:
+    """Return the process-wide inference executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor(config.INFERENCE_EXECUTOR, config.INFERENCE_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
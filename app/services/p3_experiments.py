@@ -0,0 +1,310 @@
+"""Shadow scoring and A/B traffic splitting between registry model versions.
+
+Shadow mode: the serving model answers the request, then the same payloads
+are queued for the candidate versions (SHADOW_MODEL_VERSIONS), scored by a
+background pool and stored in ``shadow_predictions``. The queue is bounded
+and never blocks: when it is full the shadow work is dropped and counted.
+
+A/B mode: AB_SPLIT assigns each request to one version by weight, sticky per
+``X-Client-Id`` when the header is sent. The version that answered is stored
+in ``energy_predictions.model_version``.
+
+Compare every version against ground truth offline::
+
+    uv run python -m app.services.p3_experiments report data/y_test.csv
+"""
+
+import argparse
+import hashlib
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+
+from app.core import config
+from app.core.database import SessionLocal
+from app.core.metrics import REGISTRY, untimed
+from app.models import EnergyPrediction, ShadowPrediction
+from app.services.p3_model import EnergyModel
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+SHADOW_SECONDS = REGISTRY.histogram(
+    "shadow_inference_duration_seconds", "Candidate model scoring time.", ("model_version",)
+)
+
+
+class ShadowScorer:
+    """Score payloads with candidate versions off the request path."""
+
+    def __init__(
+        self,
+        versions: list[str],
+        workers: int = 1,
+        max_queue: int = 1000,
+        session_factory=SessionLocal,
+        model_loader=EnergyModel.get_version,
+    ):
+        self.versions = list(versions)
+        self.session_factory = session_factory
+        self.model_loader = model_loader
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._scored = 0
+        self._dropped = 0
+        self._failed = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"shadow-scorer-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, payloads, dataset_ids, predictions, primary_version: Optional[str]) -> bool:
+        """Queue shadow scoring; returns False (and drops it) if the queue is full."""
+        try:
+            self._queue.put_nowait((list(payloads), list(dataset_ids), list(predictions), primary_version))
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += len(payloads)
+            return False
+        return True
+
+    def flush(self):
+        """Block until everything queued so far is scored."""
+        self._queue.join()
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "versions": self.versions,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "rows_scored": self._scored,
+                "rows_dropped": self._dropped,
+                "rows_failed": self._failed,
+            }
+
+    def _run(self):
+        with untimed():
+            while True:
+                entry = self._queue.get()
+                try:
+                    if entry is _STOP:
+                        return
+                    self._score(*entry)
+                finally:
+                    self._queue.task_done()
+
+    def _score(self, payloads, dataset_ids, predictions, primary_version):
+        rows = []
+        for version in self.versions:
+            if version == primary_version:
+                continue
+            try:
+                start = time.perf_counter()
+                y = self.model_loader(version).predict_payloads(payloads)
+                elapsed = time.perf_counter() - start
+            except Exception:
+                logger.exception("Shadow scoring with model version %s failed", version)
+                with self._stats_lock:
+                    self._failed += len(payloads)
+                continue
+            SHADOW_SECONDS.observe(elapsed, model_version=version)
+            rows.extend(
+                {
+                    "dataset_id": dataset_id,
+                    "model_version": version,
+                    "prediction": float(value),
+                    "primary_version": primary_version,
+                    "primary_prediction": float(primary),
+                    "latency_ms": elapsed * 1000.0,
+                }
+                for dataset_id, value, primary in zip(dataset_ids, y, predictions)
+            )
+        if not rows:
+            return
+        try:
+            with self.session_factory() as db:
+                db.execute(insert(ShadowPrediction.__table__), rows)
+                db.commit()
+        except Exception:
+            logger.exception("Storing %d shadow predictions failed", len(rows))
+            with self._stats_lock:
+                self._failed += len(rows)
+        else:
+            with self._stats_lock:
+                self._scored += len(rows)
+
+
+def parse_split(spec: str) -> dict:
+    """``"v1:90,v2:10"`` -> ``{"v1": 0.9, "v2": 0.1}``."""
+    weights = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        version, _, weight = part.strip().rpartition(":")
+        if not version:
+            raise ValueError(f"Invalid AB_SPLIT entry {part!r}, expected version:weight")
+        weights[version] = float(weight)
+    total = sum(weights.values())
+    if not weights or total <= 0 or any(w < 0 for w in weights.values()):
+        raise ValueError(f"Invalid AB_SPLIT {spec!r}: weights must be positive")
+    return {version: weight / total for version, weight in weights.items()}
+
+
+class TrafficSplit:
+    """Weighted assignment of requests to model versions."""
+
+    def __init__(self, weights: dict):
+        self.weights = dict(weights)
+        self._versions = list(self.weights)
+        self._bounds = np.cumsum([self.weights[v] for v in self._versions])
+
+    def choose(self, unit: Optional[str] = None) -> str:
+        """Pick a version; the same ``unit`` (client id) always gets the same one."""
+        if unit:
+            point = int(hashlib.sha256(unit.encode()).hexdigest()[:15], 16) / 16**15
+        else:
+            point = random.random()
+        index = int(np.searchsorted(self._bounds, point, side="right"))
+        return self._versions[min(index, len(self._versions) - 1)]
+
+
+_shadow = None
+_shadow_lock = threading.Lock()
+_split = None
+_split_spec = None
+
+
+def get_shadow() -> Optional[ShadowScorer]:
+    """Process-wide shadow scorer, or None when no candidate is configured."""
+    global _shadow
+    if not config.SHADOW_MODEL_VERSIONS:
+        return None
+    if _shadow is None:
+        with _shadow_lock:
+            if _shadow is None:
+                _shadow = ShadowScorer(
+                    config.SHADOW_MODEL_VERSIONS,
+                    workers=config.SHADOW_WORKERS,
+                    max_queue=config.SHADOW_QUEUE_SIZE,
+                )
+    return _shadow
+
+
+def shutdown_shadow():
+    global _shadow
+    with _shadow_lock:
+        if _shadow is not None:
+            _shadow.close()
+            _shadow = None
+
+
+def get_split() -> Optional[TrafficSplit]:
+    """Traffic split parsed from AB_SPLIT, or None when A/B testing is off."""
+    global _split, _split_spec
+    if not config.AB_SPLIT:
+        return None
+    if _split_spec != config.AB_SPLIT:
+        _split, _split_spec = TrafficSplit(parse_split(config.AB_SPLIT)), config.AB_SPLIT
+    return _split
+
+
+def _metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
+    error = y_pred - y_true
+    nonzero = y_true != 0
+    total = np.sum((y_true - y_true.mean()) ** 2)
+    return {
+        "n": int(len(y_true)),
+        "mae": float(np.mean(np.abs(error))),
+        "rmse": float(np.sqrt(np.mean(error ** 2))),
+        "mape": float(np.mean(np.abs(error[nonzero] / y_true[nonzero]))) if nonzero.any() else None,
+        "bias": float(np.mean(error)),
+        "r2": float(1 - np.sum(error ** 2) / total) if total else None,
+    }
+
+
+def report(truth_path, first_dataset_id: int = 1, target: Optional[str] = None, session_factory=SessionLocal) -> list[dict]:
+    """Error metrics of every stored model version against ground truth.
+
+    ``truth_path`` is a CSV like ``data/y_test.csv``. With a ``dataset_id``
+    column rows are matched on it; otherwise row ``i`` is dataset
+    ``first_dataset_id + i`` (the order ``create_db.py`` imports X_test.csv).
+    """
+    truth = pd.read_csv(truth_path)
+    if "dataset_id" in truth.columns:
+        target = target or next(c for c in truth.columns if c != "dataset_id")
+        truth = truth[["dataset_id", target]]
+    else:
+        target = target or truth.columns[0]
+        truth = pd.DataFrame({
+            "dataset_id": np.arange(first_dataset_id, first_dataset_id + len(truth)),
+            target: truth[target].to_numpy(),
+        })
+    truth = truth.rename(columns={target: "y_true"})
+    low, high = int(truth["dataset_id"].min()), int(truth["dataset_id"].max())
+
+    frames = []
+    with session_factory() as db:
+        for source, table in (("primary", EnergyPrediction), ("shadow", ShadowPrediction)):
+            query = select(table.dataset_id, table.model_version, table.prediction).where(
+                table.dataset_id.between(low, high)
+            )
+            frame = pd.DataFrame(db.execute(query).all(), columns=["dataset_id", "model_version", "prediction"])
+            frame["source"] = source
+            frames.append(frame)
+    predictions = pd.concat(frames, ignore_index=True)
+    predictions["model_version"] = predictions["model_version"].fillna("unknown")
+    # Repeated predictions of the same row by the same version count once
+    predictions = predictions.groupby(["source", "model_version", "dataset_id"], as_index=False)["prediction"].mean()
+    joined = predictions.merge(truth, on="dataset_id")
+
+    results = []
+    for (source, version), group in joined.groupby(["source", "model_version"]):
+        results.append({
+            "source": source,
+            "model_version": version,
+            **_metrics(group["y_true"].to_numpy(dtype=float), group["prediction"].to_numpy(dtype=float)),
+        })
+    return sorted(results, key=lambda row: row["rmse"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shadow/A-B model evaluation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="Compare stored predictions with ground truth")
+    report_parser.add_argument("truth", help="CSV of true values, e.g. data/y_test.csv")
+    report_parser.add_argument("--first-dataset-id", type=int, default=1, help="Dataset id of the first CSV row")
+    report_parser.add_argument("--target", help="Ground truth column (default: first column)")
+    args = parser.parse_args(argv)
+
+    rows = report(args.truth, args.first_dataset_id, args.target)
+    if not rows:
+        print("⚠️  No stored prediction matches the ground truth rows")
+        return
+    print(f"{'source':8s} {'model_version':20s} {'n':>6s} {'mae':>14s} {'rmse':>14s} {'mape':>8s} {'r2':>8s}")
+    for row in rows:
+        mape = f"{row['mape']:.3f}" if row["mape"] is not None else "-"
+        r2 = f"{row['r2']:.3f}" if row["r2"] is not None else "-"
+        print(
+            f"{row['source']:8s} {row['model_version']:20s} {row['n']:6d} "
+            f"{row['mae']:14,.1f} {row['rmse']:14,.1f} {mape:>8s} {r2:>8s}"
+        )
+
+
+if __name__ == "__main__":
+    main()
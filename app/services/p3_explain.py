@@ -0,0 +1,236 @@
+"""Per-feature contributions to a prediction (opt-in ``explain`` flag).
+
+Each prediction is split into ``bias + sum(contributions)``, one
+contribution per input field (the one-hot columns of a categorical field
+are summed together):
+
+- tree models (decision tree, random forest, extra trees): the change in
+  node value along each decision path is credited to the feature of the
+  split, averaged over the trees (Saabas / treeinterpreter). The path
+  contributions of every leaf are precomputed on first use (leaves x fields
+  floats, ~2 MB for the bundled 50-tree forest), so a batch is explained
+  with one ``apply`` and one table lookup per tree;
+- linear models: ``coef * transformed feature``, the bias being the intercept.
+
+Explanations are cached per model version and hash of the encoded input row.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.compose import ColumnTransformer, TransformedTargetRegressor
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.tree import DecisionTreeRegressor
+
+from app.core import config
+from app.core.metrics import stage
+from app.services.p3_compiled import UnsupportedModel
+from app.services.p3_model import FEATURE_RENAMES, build_features
+
+
+def input_fields(preprocessor: ColumnTransformer, renames: dict) -> list[str]:
+    """Input field of every column of the transformed matrix."""
+    names = list(getattr(preprocessor, "feature_names_in_", []))
+    fields = []
+    for _, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        columns = [names[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        last = transformer.steps[-1][1] if isinstance(transformer, Pipeline) else transformer
+        if isinstance(last, OneHotEncoder):
+            if last.drop_idx_ is not None or getattr(last, "_infrequent_enabled", False):
+                raise UnsupportedModel("OneHotEncoder with drop or infrequent categories")
+            for column, categories in zip(columns, last.categories_):
+                fields.extend([renames.get(column, column)] * len(categories))
+        else:
+            fields.extend(renames.get(column, column) for column in columns)
+    return fields
+
+
+def _leaf_contributions(tree, columns: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """Contributions of the path to every leaf, and the row of each node in that table.
+
+    Each change of node value along the path is credited to the field of the
+    parent's split; the rows sum to ``leaf value - root value``.
+    """
+    left, right, values = tree.children_left, tree.children_right, tree.value[:, 0, 0]
+    paths = np.zeros((tree.node_count, width))
+    # Breadth-first, one level at a time: children start from their parent's path
+    level = np.array([0])
+    while len(level):
+        level = level[left[level] >= 0]
+        fields = columns[tree.feature[level]]
+        for children in (left[level], right[level]):
+            paths[children] = paths[level]
+            paths[children, fields] += values[children] - values[level]
+        level = np.concatenate([left[level], right[level]])
+    leaves = np.flatnonzero(left < 0)
+    rows = np.full(tree.node_count, -1)
+    rows[leaves] = np.arange(len(leaves))
+    return paths[leaves], rows
+
+
+class Explainer:
+    """Contributions of each input field for an estimator fed the transformed matrix."""
+
+    def __init__(self, estimator, fields: list[str]):
+        self.fields = list(dict.fromkeys(fields))
+        columns = np.array([self.fields.index(field) for field in fields])
+        expected = getattr(estimator, "n_features_in_", len(fields))
+        if expected != len(fields):
+            raise UnsupportedModel(f"{len(fields)} transformed columns != estimator input {expected}")
+
+        if isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor, DecisionTreeRegressor)):
+            trees = estimator.estimators_ if hasattr(estimator, "estimators_") else [estimator]
+            if trees[0].tree_.value.shape[1] != 1:
+                raise UnsupportedModel("Multi-output trees")
+            self.method = "tree_path"
+            self._trees = [tree.tree_ for tree in trees]
+            self._leaves = [_leaf_contributions(tree, columns, len(self.fields)) for tree in self._trees]
+            self._bias = float(np.mean([tree.value[0, 0, 0] for tree in self._trees]))
+        elif np.ndim(getattr(estimator, "coef_", None)) == 1:
+            self.method = "linear"
+            # Sums the coefficients of the one-hot columns of a field
+            self._fold = sparse.csr_matrix(
+                (np.ones(len(fields)), (np.arange(len(fields)), columns)), shape=(len(fields), len(self.fields))
+            )
+            self._coef = np.asarray(estimator.coef_, dtype=float)
+            self._bias = float(np.ravel(getattr(estimator, "intercept_", 0.0))[0])
+        else:
+            raise UnsupportedModel(f"No explanation method for {type(estimator).__name__}")
+
+    @classmethod
+    def build(cls, model, renames: Optional[dict] = None) -> "Explainer":
+        """Explainer of a ``Pipeline(ColumnTransformer, estimator)``."""
+        if isinstance(model, TransformedTargetRegressor):
+            # Contributions would not add up to the inverse-transformed prediction
+            raise UnsupportedModel("TransformedTargetRegressor")
+        if not isinstance(model, Pipeline) or not isinstance(model.steps[0][1], ColumnTransformer):
+            raise UnsupportedModel("Expected Pipeline(ColumnTransformer, estimator)")
+        return cls(model.steps[-1][1], input_fields(model.steps[0][1], renames or {}))
+
+    def explain_encoded(self, X) -> np.ndarray:
+        """(rows x fields) contributions for a transformed matrix."""
+        if self.method == "linear":
+            X = X.toarray() if sparse.issparse(X) else np.asarray(X, dtype=float)
+            return (X * self._coef) @ self._fold
+        # sklearn trees split on float32 features
+        X = np.ascontiguousarray(X.toarray() if sparse.issparse(X) else X, dtype=np.float32)
+        total = np.zeros((X.shape[0], len(self.fields)))
+        for tree, (paths, rows) in zip(self._trees, self._leaves):
+            total += paths[rows[tree.apply(X)]]
+        return total / len(self._trees)
+
+    def explanations(self, X) -> list[dict]:
+        return [
+            {"bias": self._bias, "contributions": dict(zip(self.fields, row))}
+            for row in self.explain_encoded(X).tolist()
+        ]
+
+
+class ExplanationCache:
+    """In-process LRU of explanations."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list) -> list[Optional[dict]]:
+        with self._lock:
+            found = []
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                found.append(entry)
+            misses = found.count(None)
+            self.misses += misses
+            self.hits += len(keys) - misses
+            return found
+
+    def set_many(self, items):
+        with self._lock:
+            for key, entry in items:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_explainers = {}
+_explainers_lock = threading.Lock()
+_cache = None
+
+
+def get_explainer(loaded) -> Explainer:
+    """Explainer of a LoadedModel, built on first use (raises UnsupportedModel)."""
+    explainer = _explainers.get(loaded.version)
+    if explainer is None:
+        with _explainers_lock:
+            explainer = _explainers.get(loaded.version)
+            if explainer is None:
+                explainer = Explainer.build(loaded.model, {v: k for k, v in FEATURE_RENAMES.items()})
+                # Only the versions in use: the serving one and A/B or shadow candidates
+                while len(_explainers) >= 4:
+                    _explainers.pop(next(iter(_explainers)))
+                _explainers[loaded.version] = explainer
+    return explainer
+
+
+def get_explanation_cache() -> ExplanationCache:
+    global _cache
+    if _cache is None:
+        with _explainers_lock:
+            if _cache is None:
+                _cache = ExplanationCache(config.EXPLAIN_CACHE_MAX_ENTRIES)
+    return _cache
+
+
+def _encode(loaded, payloads) -> np.ndarray:
+    if loaded.compiled is not None:
+        return loaded.compiled.transform(payloads)
+    X = loaded.model.steps[0][1].transform(build_features(payloads))
+    return X.toarray() if sparse.issparse(X) else np.asarray(X, dtype=float)
+
+
+def explain(loaded, payloads) -> list[dict]:
+    """Explanations of ``loaded``'s predictions for EnergyRequest payloads."""
+    explainer = get_explainer(loaded)
+    cache = get_explanation_cache()
+    with stage("explain"):
+        X = _encode(loaded, payloads)
+        # Hash of the encoded row: cheaper than hashing the payload, and shared
+        # by payloads that only differ in fields the model does not use
+        keys = [(loaded.version, hashlib.blake2b(row.tobytes(), digest_size=16).digest()) for row in X]
+        explanations = cache.get_many(keys)
+        missing = [i for i, entry in enumerate(explanations) if entry is None]
+        if missing:
+            computed = explainer.explanations(X[missing])
+            cache.set_many(zip((keys[i] for i in missing), computed))
+            for i, entry in zip(missing, computed):
+                explanations[i] = entry
+    return explanations
@@ -0,0 +1,149 @@
+"""Streaming export of predictions joined with their input features."""
+
+import csv
+import io
+from datetime import datetime
+from typing import Iterator, Optional
+
+import orjson
+from sqlalchemy import DateTime, Float, Integer, String, select
+
+from app.models import EnergyDataset, EnergyPrediction
+from app.services.p3_datasets import dataset_view
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Features of the dataset row, without its own id/created_at
+_FEATURES = [column for column in EnergyDataset.__table__.columns if column.name not in ("id", "created_at")]
+COLUMNS = ["id", "dataset_id", "prediction", "model_version", "created_at", *(column.name for column in _FEATURES)]
+
+
+def export_query(since_id: Optional[int] = None, since: Optional[datetime] = None):
+    datasets = dataset_view()
+    query = (
+        select(
+            EnergyPrediction.id,
+            EnergyPrediction.dataset_id,
+            EnergyPrediction.prediction,
+            EnergyPrediction.model_version,
+            EnergyPrediction.created_at,
+            *(datasets.c[column.name] for column in _FEATURES),
+        )
+        .join(datasets, EnergyPrediction.dataset_id == datasets.c.id)
+        .order_by(EnergyPrediction.id)
+    )
+    if since_id is not None:
+        query = query.where(EnergyPrediction.id > since_id)
+    if since is not None:
+        query = query.where(EnergyPrediction.created_at >= since)
+    return query
+
+
+def iter_chunks(bind, query, chunk_size: int) -> Iterator[list[tuple]]:
+    """Yield lists of rows from a server-side cursor (named cursor on PostgreSQL)."""
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(query)
+        for partition in result.partitions(chunk_size):
+            yield [tuple(row) for row in partition]
+
+
+def _ndjson(chunks) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join(orjson.dumps(dict(zip(COLUMNS, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def _csv(chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _DrainableSink:
+    """Write-only file object whose content is handed out chunk by chunk."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    types = {Integer: pa.int64(), Float: pa.float64(), String: pa.string(), DateTime: pa.timestamp("us")}
+    fields = [
+        pa.field("id", pa.int64()),
+        pa.field("dataset_id", pa.int64()),
+        pa.field("prediction", pa.float64()),
+        pa.field("model_version", pa.string()),
+        pa.field("created_at", pa.timestamp("us")),
+    ]
+    for column in _FEATURES:
+        fields.append(pa.field(column.name, types[type(column.type)]))
+    return pa.schema(fields)
+
+
+def _arrow(chunks, parquet: bool) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    for rows in chunks:
+        columns = list(zip(*rows))
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+        batch = pa.record_batch(arrays, schema=schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def encode(chunks, fmt: str) -> Iterator[bytes]:
+    if fmt == "ndjson":
+        return _ndjson(chunks)
+    if fmt == "csv":
+        return _csv(chunks)
+    return _arrow(chunks, parquet=fmt == "parquet")
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
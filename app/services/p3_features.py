@@ -0,0 +1,101 @@
+"""Derived model features, computed server-side from the raw building columns.
+
+    BuildingAge      DATA_YEAR - YearBuilt
+    SurfacePerFloor  PropertyGFATotal / NumberofFloors (missing for 0 floors)
+    IsMultiUse       a SecondLargestPropertyUseType is given
+    LatZone/LonZone  Latitude/Longitude bin (0-4) between ZONE_EDGES
+
+These are the definitions the training set was built with (checked against
+data/X_test.csv). Everything goes through ``derive``, which works on whole
+columns at once: ``derive_frame`` for CSV/Parquet chunks (create_db.py, the
+offline scorer) and ``derive_payloads`` for API requests, so every path
+computes exactly the same values.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Year of the Seattle building energy benchmarking data the model was trained on
+DATA_YEAR = 2016
+
+# Inner bin edges of the 5 training zones, midway between the extreme
+# coordinates of neighbouring zones in data/X_test.csv (see infer_zone_edges)
+ZONE_EDGES = {
+    "LatZone": np.array([47.55333, 47.599255, 47.64593, 47.68927]),
+    "LonZone": np.array([-122.380625, -122.351885, -122.321915, -122.29115]),
+}
+
+DERIVED = ["BuildingAge", "SurfacePerFloor", "IsMultiUse", "LatZone", "LonZone"]
+
+
+def _floats(values) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        # Text columns of a CSV: unparsable values become missing
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+
+def _zone(values, edges: np.ndarray) -> np.ndarray:
+    values = _floats(values)
+    return np.where(np.isnan(values), np.nan, np.searchsorted(edges, values, side="right"))
+
+
+def derive(year_built, gfa_total, floors, second_use_type, latitude, longitude) -> dict:
+    """Derived columns as NumPy arrays, from equal-length raw columns."""
+    floors = _floats(floors)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        surface = np.where(floors > 0, _floats(gfa_total) / floors, np.nan)
+    return {
+        "BuildingAge": DATA_YEAR - _floats(year_built),
+        "SurfacePerFloor": surface,
+        "IsMultiUse": pd.notna(np.asarray(second_use_type, dtype=object)),
+        # Float so that a missing coordinate stays NaN
+        "LatZone": _zone(latitude, ZONE_EDGES["LatZone"]),
+        "LonZone": _zone(longitude, ZONE_EDGES["LonZone"]),
+    }
+
+
+def derive_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of a raw CSV frame with the derived columns (re)computed."""
+    df = df.copy()
+    second = df["SecondLargestPropertyUseType"] if "SecondLargestPropertyUseType" in df else [None] * len(df)
+    derived = derive(
+        df["YearBuilt"], df["PropertyGFATotal"], df["NumberofFloors"], second, df["Latitude"], df["Longitude"]
+    )
+    for name, values in derived.items():
+        df[name] = values
+    return df
+
+
+def derive_payloads(payloads):
+    """Set the derived fields of EnergyRequest payloads in place."""
+    if not payloads:
+        return payloads
+    derived = derive(
+        [p.YearBuilt for p in payloads],
+        [p.PropertyGFATotal for p in payloads],
+        [p.NumberofFloors for p in payloads],
+        [p.SecondLargestPropertyUseType for p in payloads],
+        [p.Latitude for p in payloads],
+        [p.Longitude for p in payloads],
+    )
+    columns = {
+        "BuildingAge": derived["BuildingAge"].tolist(),
+        # NaN for 0 floors is sent to the model as a missing value
+        "SurfacePerFloor": [None if np.isnan(v) else v for v in derived["SurfacePerFloor"].tolist()],
+        "IsMultiUse": derived["IsMultiUse"].tolist(),
+        "LatZone": derived["LatZone"].astype(int).tolist(),
+        "LonZone": derived["LonZone"].astype(int).tolist(),
+    }
+    for i, payload in enumerate(payloads):
+        for name, values in columns.items():
+            setattr(payload, name, values[i])
+    return payloads
+
+
+def infer_zone_edges(values, zones) -> np.ndarray:
+    """Inner edges between consecutive zones, from coordinates labelled with their zone."""
+    frame = pd.DataFrame({"value": values, "zone": zones}).dropna()
+    bounds = frame.groupby("zone")["value"].agg(["min", "max"]).sort_index()
+    return (bounds["max"].to_numpy()[:-1] + bounds["min"].to_numpy()[1:]) / 2
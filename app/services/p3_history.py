@@ -0,0 +1,113 @@
+"""Queries behind /api/p3/history."""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.models import EnergyPrediction
+
+
+def _filters(dataset_id: Optional[int], start: Optional[datetime], end: Optional[datetime]) -> list:
+    conditions = []
+    if dataset_id is not None:
+        conditions.append(EnergyPrediction.dataset_id == dataset_id)
+    if start is not None:
+        conditions.append(EnergyPrediction.created_at >= start)
+    if end is not None:
+        conditions.append(EnergyPrediction.created_at < end)
+    return conditions
+
+
+# Fields of PredictionResponse, selected as plain columns
+_COLUMNS = (
+    EnergyPrediction.id,
+    EnergyPrediction.dataset_id,
+    EnergyPrediction.prediction,
+    EnergyPrediction.model_version,
+    EnergyPrediction.created_at,
+)
+_NAMES = tuple(column.key for column in _COLUMNS)
+
+
+def list_predictions(
+    db: Session,
+    limit: int,
+    cursor: Optional[int] = None,
+    skip: int = 0,
+    dataset_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[dict]:
+    """Page through predictions in id order, as PredictionResponse dicts.
+
+    ``cursor`` is the last id of the previous page: the query seeks straight
+    to it through the primary key instead of skipping rows with OFFSET.
+    ``skip`` is kept for existing clients and only used without a cursor.
+    Rows are fetched as column tuples, without building ORM entities.
+    """
+    query = select(*_COLUMNS).where(*_filters(dataset_id, start, end)).order_by(EnergyPrediction.id)
+    if cursor is not None:
+        query = query.where(EnergyPrediction.id > cursor)
+    elif skip:
+        query = query.offset(skip)
+    return [dict(zip(_NAMES, row)) for row in db.execute(query.limit(limit))]
+
+
+# Filters come from the query string: bounded, least recently used dropped first
+_COUNTS_MAX_ENTRIES = 1024
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def count_predictions(
+    db: Session,
+    dataset_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> int:
+    """Total for the history listing without scanning energy_predictions.
+
+    The unfiltered total is read from planner statistics on PostgreSQL and
+    from ``max(id)`` elsewhere (rows are never deleted by the API), both
+    O(1) lookups. Filtered totals are counted through the dataset_id /
+    created_at indexes and reused for HISTORY_COUNT_TTL seconds.
+    """
+    if dataset_id is None and start is None and end is None:
+        return _estimate_total(db)
+
+    key = (db.get_bind(), dataset_id, start, end)
+    now = time.monotonic()
+    with _counts_lock:
+        cached = _counts.get(key)
+        if cached is not None and cached[1] > now:
+            _counts.move_to_end(key)
+            return cached[0]
+
+    total = db.execute(
+        select(func.count(EnergyPrediction.id)).where(*_filters(dataset_id, start, end))
+    ).scalar()
+    with _counts_lock:
+        _counts[key] = (total, now + config.HISTORY_COUNT_TTL)
+        _counts.move_to_end(key)
+        for stale in [k for k, (_, expires) in _counts.items() if expires <= now]:
+            del _counts[stale]
+        while len(_counts) > _COUNTS_MAX_ENTRIES:
+            _counts.popitem(last=False)
+    return total
+
+
+def _estimate_total(db: Session) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'energy_predictions'")
+        ).scalar()
+        # -1 (or 0) until the table has been analyzed
+        if estimate and estimate > 0:
+            return estimate
+    return db.execute(select(func.max(EnergyPrediction.id))).scalar() or 0
@@ -1,39 +1,392 @@
 import joblib
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import urllib.request
 import os
 import threading
+import time
+from typing import NamedTuple, Optional
+from app.core import config
+from app.core.metrics import stage
+from app.services.p3_compiled import CompiledModel, UnsupportedModel, verify
+from app.services.p3_registry import ModelRegistry, file_digest
+from app.schemas.p3_request import EnergyRequest
 
 MODEL_PATH = Path("models/model_p3.joblib")
 MODEL_URL = "https://github.com/DagueG/Model_Machine_Learning/releases/download/v1.0.0-model/model_p3.joblib"
+# Memory-mappable copy written next to registry artifacts when MODEL_MMAP is on
+UNCOMPRESSED_ARTIFACT = "model.uncompressed.joblib"
+
+def export_uncompressed(source: Path, target: Path):
+    """Rewrite a joblib artifact without compression so it can be memory-mapped."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    joblib.dump(joblib.load(source), tmp, compress=0)
+    os.replace(tmp, target)
+
+
+def process_memory() -> dict:
+    """Resident memory of the current worker.
+
+    ``pss_bytes`` splits shared pages between the processes mapping them, so
+    it is the figure to compare when checking memory sharing across workers.
+    """
+    memory = {"pid": os.getpid(), "rss_bytes": None, "pss_bytes": None}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    memory[f"{key.lower()}_bytes"] = int(value.split()[0]) * 1024
+    except OSError:
+        try:
+            import resource
+            # Peak RSS; kilobytes on Linux, bytes on macOS
+            memory["rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            pass
+    return memory
+
+# API field names that differ from the training column names
+FEATURE_RENAMES = {"PropertyGFABuildings": "PropertyGFABuilding(s)"}
+
+
+def verification_payloads() -> list:
+    """Requests covering optional fields and unseen categories."""
+    example = EnergyRequest.example()
+    return [
+        example,
+        example.model_copy(update={
+            "SecondLargestPropertyUseType": None,
+            "SecondLargestPropertyUseTypeGFA": None,
+            "ThirdLargestPropertyUseType": None,
+            "ThirdLargestPropertyUseTypeGFA": None,
+            "YearsENERGYSTARCertified": None,
+            "IsMultiUse": False,
+        }),
+        example.model_copy(update={
+            "BuildingType": "Unknown type",
+            "Neighborhood": "Unknown neighborhood",
+            "NumberofFloors": 40,
+            "PropertyGFATotal": 1_500_000.0,
+        }),
+    ]
+
+
+class ScoredBatch(NamedTuple):
+    predictions: np.ndarray
+    model_version: str
+
+
+class LoadedModel(NamedTuple):
+    """A loaded artifact. Swapped as a whole, so requests in flight keep theirs."""
+
+    version: str
+    model: object
+    compiled: Optional[CompiledModel]
+    compile_error: Optional[str]
+    load_seconds: float
+    size_bytes: int
+
+    def predict_frame(self, df: pd.DataFrame) -> np.ndarray:
+        with stage("inference"):
+            return np.asarray(self.model.predict(df), dtype=float)
+
+    def predict_payloads(self, payloads) -> np.ndarray:
+        if self.compiled is None:
+            return self.predict_frame(build_features(payloads))
+        with stage("encode"):
+            X = self.compiled.transform(payloads)
+        with stage("inference"):
+            return self.compiled.predict_encoded(X)
+
+    def score(self, payloads) -> ScoredBatch:
+        return ScoredBatch(self.predict_payloads(payloads), self.version)
+
+
+def _read_artifact(path: Path, mmap_path: Path):
+    if not config.MODEL_MMAP:
+        return joblib.load(path)
+    # Arrays of an uncompressed artifact are mapped read-only from the page
+    # cache, so every worker on the host shares the same physical pages.
+    if not mmap_path.exists() or mmap_path.stat().st_mtime < path.stat().st_mtime:
+        export_uncompressed(path, mmap_path)
+    return joblib.load(mmap_path, mmap_mode="r")
+
+
+def _compile(model):
+    """Compiled scoring path and the reason it is unavailable, if any."""
+    if not config.MODEL_COMPILED:
+        return None, None
+    try:
+        compiled = CompiledModel.compile(model, {v: k for k, v in FEATURE_RENAMES.items()})
+        payloads = verification_payloads()
+        verify(compiled, lambda p: model.predict(build_features(p)), payloads, config.MODEL_COMPILED_RTOL)
+    except (UnsupportedModel, ValueError, AttributeError, TypeError) as e:
+        print(f"⚠️  Compiled inference disabled, using the sklearn pipeline: {e}")
+        return None, str(e)
+    return compiled, None
+
+
+def load_artifact(path: Path, version: str, mmap_path: Path) -> LoadedModel:
+    start = time.perf_counter()
+    model = _read_artifact(path, mmap_path)
+    compiled, compile_error = _compile(model)
+    return LoadedModel(version, model, compiled, compile_error, time.perf_counter() - start, path.stat().st_size)
+
 
 class EnergyModel:
-    _model = None
+    _active = None
     _lock = threading.Lock()
+    # Reentrant: activate() and the registry watcher hold it around swap()
+    _swap_lock = threading.RLock()
+    # Other registry versions kept in memory for shadow scoring and A/B tests
+    _versions = {}
+    _versions_lock = threading.Lock()
+
+    # Cached state read by the health probes (never touches disk or network)
+    _warmup_seconds = None
+    _load_error = None
+    _reload = {"state": "idle", "version": None, "error": None}
 
     @classmethod
-    def load(cls):
-        if cls._model is None:
+    def current(cls) -> LoadedModel:
+        """The model serving new requests, loaded on first use."""
+        active = cls._active
+        if active is None:
             with cls._lock:
                 # Double-check pattern: verify again inside lock
-                if cls._model is None:
-                    # Try local path first
-                    if MODEL_PATH.exists():
-                        cls._model = joblib.load(MODEL_PATH)
-                    else:
-                        # Download from GitHub if not found locally
-                        try:
-                            print("Downloading model from GitHub...")
-                            os.makedirs("models", exist_ok=True)
-                            urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
-                            cls._model = joblib.load(MODEL_PATH)
-                        except Exception as e:
-                            raise RuntimeError(f"Failed to load model: {e}")
-        return cls._model
+                if cls._active is None:
+                    try:
+                        cls._active = cls._load_initial()
+                    except Exception as e:
+                        cls._load_error = str(e)
+                        raise
+                    cls._load_error = None
+                active = cls._active
+        return active
+
+    @classmethod
+    def _load_initial(cls) -> LoadedModel:
+        version = ModelRegistry().active()
+        if version is not None:
+            return cls._load_version(version)
+
+        # No registry yet: the bundled artifact, downloaded from GitHub if missing
+        if not MODEL_PATH.exists():
+            try:
+                print("Downloading model from GitHub...")
+                os.makedirs("models", exist_ok=True)
+                urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
+            except Exception as e:
+                raise RuntimeError(f"Failed to load model: {e}")
+        return load_artifact(MODEL_PATH, file_digest(MODEL_PATH)[:12], Path(config.MODEL_MMAP_PATH))
+
+    @classmethod
+    def load(cls):
+        return cls.current().model
+
+    @classmethod
+    def warm_up(cls):
+        """Load the model and push one synthetic row through the full pipeline."""
+        loaded = cls.current()
+        start = time.perf_counter()
+        loaded.predict_payloads([EnergyRequest.example()])
+        cls._warmup_seconds = time.perf_counter() - start
+
+    @classmethod
+    def begin_swap(cls, version: str) -> bool:
+        """Mark a swap to ``version`` as started; False if one is already running."""
+        with cls._lock:
+            if cls._reload["state"] == "loading":
+                return False
+            cls._reload = {"state": "loading", "version": version, "error": None}
+            return True
+
+    @classmethod
+    def swap(cls, version: str) -> LoadedModel:
+        """Load and warm up a registry version, then make it serve new requests.
+
+        The previous model keeps serving until the new one is ready, and
+        requests already holding it finish on it.
+        """
+        with cls._swap_lock:
+            active = cls._active
+            if active is not None and active.version == version:
+                cls._reload = {"state": "done", "version": version, "error": None}
+                return active
+            cls._reload = {"state": "loading", "version": version, "error": None}
+            try:
+                with cls._versions_lock:
+                    loaded = cls._versions.pop(version, None)
+                loaded = loaded or cls._load_version(version)
+                start = time.perf_counter()
+                loaded.predict_payloads([EnergyRequest.example()])
+                warmup_seconds = time.perf_counter() - start
+            except Exception as e:
+                cls._reload = {"state": "failed", "version": version, "error": str(e)}
+                raise
+            cls._active = loaded
+            cls._warmup_seconds = warmup_seconds
+            cls._load_error = None
+            cls._reload = {"state": "done", "version": version, "error": None}
+            return loaded
+
+    @classmethod
+    def activate(cls, version: str) -> LoadedModel:
+        """Point the registry ``ACTIVE`` at ``version``, then swap to it.
+
+        Both happen under the swap lock, as do the watcher's read of
+        ``ACTIVE`` and its swap, so the watcher cannot see the old pointer
+        and swap this worker back in between. ``ACTIVE`` is restored if the
+        version fails to load.
+        """
+        registry = ModelRegistry()
+        with cls._swap_lock:
+            previous = registry.active()
+            registry.activate(version)
+            try:
+                return cls.swap(version)
+            except Exception:
+                if previous is not None and previous != version:
+                    registry.activate(previous)
+                raise
+
+    @staticmethod
+    def _load_version(version: str) -> LoadedModel:
+        path = ModelRegistry().artifact(version)
+        return load_artifact(path, version, path.with_name(UNCOMPRESSED_ARTIFACT))
+
+    @classmethod
+    def get_version(cls, version: str) -> LoadedModel:
+        """A registry version: the serving model, or one loaded next to it."""
+        active = cls.current()
+        if active.version == version:
+            return active
+        loaded = cls._versions.get(version)
+        if loaded is None:
+            with cls._versions_lock:
+                loaded = cls._versions.get(version)
+                if loaded is None:
+                    loaded = cls._versions[version] = cls._load_version(version)
+        return loaded
+
+    @classmethod
+    def reload_status(cls) -> dict:
+        return dict(cls._reload)
+
+    @classmethod
+    def is_loaded(cls) -> bool:
+        return cls._active is not None
+
+    @classmethod
+    def status(cls) -> dict:
+        """Load metadata, without triggering a load."""
+        active = cls._active
+        return {
+            "model_loaded": active is not None,
+            "model_version": active.version if active else None,
+            "load_seconds": active.load_seconds if active else None,
+            "size_bytes": active.size_bytes if active else None,
+            "warmed_up": cls._warmup_seconds is not None,
+            "warmup_seconds": cls._warmup_seconds,
+            "error": cls._load_error,
+            "mmap": config.MODEL_MMAP,
+            "compiled": active is not None and active.compiled is not None,
+            "compile_error": active.compile_error if active else None,
+            "memory": process_memory(),
+        }
+
+    @classmethod
+    def version(cls) -> str:
+        """Registry version, or short content hash of the bundled artifact."""
+        return cls.current().version
 
     @classmethod
     def predict(cls, df: pd.DataFrame) -> float:
-        model = cls.load()
-        prediction = model.predict(df)
-        return float(prediction[0])
+        return float(cls.predict_batch(df)[0])
+
+    @classmethod
+    def predict_batch(cls, df: pd.DataFrame) -> np.ndarray:
+        """Score every row of ``df`` with a single pipeline call."""
+        return cls.current().predict_frame(df)
+
+    @classmethod
+    def score(cls, payloads) -> ScoredBatch:
+        """Score EnergyRequest payloads and report which model version did it."""
+        return cls.current().score(payloads)
+
+    @classmethod
+    def predict_payloads(cls, payloads) -> np.ndarray:
+        """Score EnergyRequest payloads, through the compiled path when available."""
+        return cls.current().predict_payloads(payloads)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+class RegistryWatcher:
+    """Poll the registry ``ACTIVE`` pointer and swap when it changes.
+
+    Each worker process runs its own watcher, so activating a version with
+    the CLI or the admin endpoint reaches every worker within one interval.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._failed = None
+        self._thread = threading.Thread(target=self._run, name="model-registry-watcher", daemon=True)
+        self._thread.start()
+
+    def check(self):
+        # Under the swap lock so that an activate() in progress finishes first
+        with EnergyModel._swap_lock:
+            version = ModelRegistry().active()
+            current = EnergyModel._active
+            if version is None or version == self._failed or (current is not None and current.version == version):
+                return
+            try:
+                EnergyModel.swap(version)
+            except Exception as e:
+                # Do not retry a broken version on every poll
+                self._failed = version
+                print(f"⚠️  Model version {version} could not be activated: {e}")
+            else:
+                self._failed = None
+                print(f"✅ Now serving model version {version}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_registry_watcher():
+    """Start polling the registry if MODEL_REGISTRY_POLL_SECONDS > 0."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None and config.MODEL_REGISTRY_POLL_SECONDS > 0:
+            _watcher = RegistryWatcher(config.MODEL_REGISTRY_POLL_SECONDS)
+
+
+def shutdown_registry_watcher():
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            _watcher.close()
+            _watcher = None
+
+
+def build_features(payloads) -> pd.DataFrame:
+    """Build the model input frame from a list of EnergyRequest payloads."""
+    with stage("dataframe"):
+        rows = [payload.model_dump() for payload in payloads]
+        df = pd.DataFrame(rows)
+        # Renommage pour correspondre au modèle sklearn
+        return df.rename(columns=FEATURE_RENAMES)
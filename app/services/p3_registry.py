@@ -0,0 +1,162 @@
+"""Local registry of versioned model artifacts.
+
+    uv run python -m app.services.p3_registry register models/model_p3.joblib --activate
+    uv run python -m app.services.p3_registry list
+    uv run python -m app.services.p3_registry activate 3f2a9c1d0b7e
+
+Layout::
+
+    models/registry/
+        ACTIVE                      # name of the version to serve
+        <version>/model.joblib
+        <version>/metadata.json     # sha256, size, creation date, source
+
+Every write goes through a temporary file and ``os.replace`` so that workers
+polling ``ACTIVE`` never see a partial artifact or pointer.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.core import config
+
+ARTIFACT = "model.joblib"
+METADATA = "metadata.json"
+ACTIVE = "ACTIVE"
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class RegistryError(Exception):
+    """Unknown version, invalid name or checksum mismatch."""
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _atomic_write(path: Path, text: str):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=None):
+        self.root = Path(root or config.MODEL_REGISTRY_DIR)
+
+    def _dir(self, version: str) -> Path:
+        if not _VERSION_RE.match(version):
+            raise RegistryError(f"Invalid version name: {version!r}")
+        return self.root / version
+
+    def register(self, source, version: Optional[str] = None, description: str = "") -> dict:
+        """Copy ``source`` into the registry and return its metadata."""
+        source = Path(source)
+        sha256 = file_digest(source)
+        version = version or sha256[:12]
+        target = self._dir(version)
+        if target.exists():
+            raise RegistryError(f"Version {version} already registered")
+
+        staging = self.root / f".{version}.{os.getpid()}.tmp"
+        staging.mkdir(parents=True)
+        try:
+            shutil.copyfile(source, staging / ARTIFACT)
+            metadata = {
+                "version": version,
+                "sha256": sha256,
+                "size_bytes": source.stat().st_size,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "source": str(source),
+                "description": description,
+            }
+            (staging / METADATA).write_text(json.dumps(metadata, indent=2))
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return metadata
+
+    def metadata(self, version: str) -> dict:
+        path = self._dir(version) / METADATA
+        if not path.exists():
+            raise RegistryError(f"Unknown model version: {version}")
+        return json.loads(path.read_text())
+
+    def versions(self) -> list[dict]:
+        if not self.root.exists():
+            return []
+        entries = [
+            json.loads((path / METADATA).read_text())
+            for path in self.root.iterdir()
+            if (path / METADATA).exists() and not path.name.startswith(".")
+        ]
+        return sorted(entries, key=lambda entry: entry["created_at"])
+
+    def artifact(self, version: str, verify: bool = True) -> Path:
+        """Path of a version's artifact, checked against its recorded sha256."""
+        metadata = self.metadata(version)
+        path = self._dir(version) / ARTIFACT
+        if verify and file_digest(path) != metadata["sha256"]:
+            raise RegistryError(f"Checksum mismatch for model version {version}")
+        return path
+
+    def active(self) -> Optional[str]:
+        path = self.root / ACTIVE
+        if not path.exists():
+            return None
+        return path.read_text().strip() or None
+
+    def activate(self, version: str):
+        """Point ``ACTIVE`` at ``version``; running workers pick it up on their next poll."""
+        self.metadata(version)
+        _atomic_write(self.root / ACTIVE, f"{version}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local model registry.")
+    parser.add_argument("--root", help=f"Registry directory (default: {config.MODEL_REGISTRY_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="Add an artifact as a new version")
+    register.add_argument("path")
+    register.add_argument("--version", help="Version name (default: first 12 chars of the sha256)")
+    register.add_argument("--description", default="")
+    register.add_argument("--activate", action="store_true", help="Serve this version")
+    commands.add_parser("list", help="List registered versions")
+    activate = commands.add_parser("activate", help="Serve an already registered version")
+    activate.add_argument("version")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == "register":
+            metadata = registry.register(args.path, args.version, args.description)
+            print(f"✅ Registered model version {metadata['version']} (sha256 {metadata['sha256'][:12]})")
+            if args.activate:
+                registry.activate(metadata["version"])
+                print(f"✅ Active model version: {metadata['version']}")
+        elif args.command == "activate":
+            registry.activate(args.version)
+            print(f"✅ Active model version: {args.version}")
+        else:
+            active = registry.active()
+            for entry in registry.versions():
+                marker = "*" if entry["version"] == active else " "
+                print(f"{marker} {entry['version']:20s} {entry['created_at']}  {entry['size_bytes']:>12,d} B  {entry['description']}")
+    except RegistryError as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Prediction aggregates kept up to date as predictions are written.
+
+For every day and every value of the ``DIMENSIONS`` (``all`` is the whole
+day), ``prediction_rollups`` holds the count, sum, min and max of the
+predictions and ``prediction_rollup_bins`` a log-scale histogram of them.
+Writers add to both in the transaction that inserts the predictions, with
+one upsert per table, so ``aggregates`` reads a few rows per group instead
+of scanning ``energy_predictions``. Each transaction writes to one of
+``ROLLUPS_SHARDS`` rows per group, picked at random: on PostgreSQL the
+upserted rows stay locked until commit, and a single ``all`` row per day
+would make every concurrent prediction commit wait in line.
+
+Quantiles come from the histogram: bin ``i`` holds values in
+``(GAMMA ** (i - 1), GAMMA ** i]`` and is reported as the midpoint, within
+``RELATIVE_ACCURACY`` of any value in it (predictions <= 0 count as 0).
+
+Rebuild the rollups of an existing database (or after changing the bins)
+with ``uv run python create_db.py rollups``.
+"""
+
+import math
+import random
+from collections import defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import MetaData, Table, delete, func, insert, select, text
+
+from app.core import config
+from app.models import EnergyPrediction, PredictionRollup, PredictionRollupBin
+from app.services.p3_datasets import dataset_view
+
+# energy_dataset columns predictions are grouped by, besides "all"
+DIMENSIONS = ["zip_code", "neighborhood", "primary_property_type"]
+GROUPS = ["all", "day", *DIMENSIONS]
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+# Bin of predictions <= 0
+ZERO_BIN = -(2 ** 31)
+
+
+def bins(values) -> np.ndarray:
+    """Histogram bin of each prediction."""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        index = np.ceil(np.log(values) / _LOG_GAMMA)
+    return np.where(values > 0, index, ZERO_BIN).astype(np.int64)
+
+
+def bin_value(index: int) -> float:
+    """Value reported for a bin."""
+    if index == ZERO_BIN:
+        return 0.0
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def _key(value) -> str:
+    return "" if value is None else str(value)
+
+
+def rollup_rows(datasets: list[dict], predictions, day: date, shard: int = 0) -> tuple[list[dict], list[dict]]:
+    """Rollup and bin increments for predictions of the given energy_dataset values."""
+    predictions = np.asarray(predictions, dtype=float)
+    indexes = bins(predictions).tolist()
+    stats = {}
+    counts = defaultdict(int)
+    for row, y, index in zip(datasets, predictions.tolist(), indexes):
+        for dimension, key in [("all", ""), *((d, _key(row.get(d))) for d in DIMENSIONS)]:
+            group = (dimension, key)
+            current = stats.get(group)
+            if current is None:
+                stats[group] = [1, y, y, y]
+            else:
+                current[0] += 1
+                current[1] += y
+                current[2] = min(current[2], y)
+                current[3] = max(current[3], y)
+            counts[(dimension, key, index)] += 1
+    # Sorted so that concurrent writers lock the rows in the same order
+    rollups = [
+        {"dimension": d, "key": k, "day": day, "shard": shard, "count": n, "total": total, "minimum": lo, "maximum": hi}
+        for (d, k), (n, total, lo, hi) in sorted(stats.items())
+    ]
+    histogram = [
+        {"dimension": d, "key": k, "day": day, "shard": shard, "bin": index, "count": n}
+        for (d, k, index), n in sorted(counts.items())
+    ]
+    return rollups, histogram
+
+
+@lru_cache(maxsize=None)
+def _upsert_statement(dialect: str, table, add=(), least=(), greatest=()):
+    # Built once: constructing ON CONFLICT statements costs more than running them
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        lowest, highest = func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        # Multi-argument min()/max() are scalar functions in SQLite
+        lowest, highest = func.min, func.max
+    else:
+        raise ValueError(f"Prediction rollups need PostgreSQL or SQLite, not {dialect}")
+    stmt = insert(table)
+    excluded = stmt.excluded
+    set_ = {name: table.c[name] + excluded[name] for name in add}
+    set_.update({name: lowest(table.c[name], excluded[name]) for name in least})
+    set_.update({name: highest(table.c[name], excluded[name]) for name in greatest})
+    return stmt.on_conflict_do_update(index_elements=list(table.primary_key.columns), set_=set_)
+
+
+def update_rollups(
+    db, datasets: list[dict], predictions, day: Optional[date] = None, shard: Optional[int] = None, tables=None
+):
+    """Add predictions (of the given energy_dataset values) to the rollups in the caller's transaction."""
+    if not len(predictions):
+        return
+    if shard is None:
+        shard = random.randrange(max(1, config.ROLLUPS_SHARDS))
+    rollup_table, bin_table = tables or (PredictionRollup.__table__, PredictionRollupBin.__table__)
+    rollups, histogram = rollup_rows(datasets, predictions, day or datetime.utcnow().date(), shard)
+    dialect = db.get_bind().dialect.name
+    db.execute(
+        _upsert_statement(dialect, rollup_table, add=("count", "total"), least=("minimum",), greatest=("maximum",)),
+        rollups,
+    )
+    db.execute(_upsert_statement(dialect, bin_table, add=("count",)), histogram)
+
+
+def quantiles_from_bins(histogram: list[tuple[int, int]], qs, minimum: float, maximum: float) -> dict:
+    """``{"p50": value, ...}`` from ``(bin, count)`` pairs."""
+    if not histogram:
+        return {}
+    histogram = sorted(histogram)
+    cumulative = np.cumsum([count for _, count in histogram])
+    out = {}
+    for q in qs:
+        rank = q * (cumulative[-1] - 1)
+        index = histogram[int(np.searchsorted(cumulative, rank, side="right"))][0]
+        # The extreme bins are better described by the exact min/max
+        out[f"p{q * 100:g}"] = min(max(bin_value(index), minimum), maximum)
+    return out
+
+
+def aggregates(
+    db,
+    group_by: str = "all",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    by_day: bool = False,
+    quantiles=(0.5, 0.9, 0.99),
+) -> list[dict]:
+    """Count, sum, mean, min, max and quantiles of the predictions per group.
+
+    ``start`` is inclusive and ``end`` exclusive, as in /api/p3/history.
+    """
+    if group_by not in GROUPS:
+        raise ValueError(f"Unknown group_by {group_by!r}, expected one of {GROUPS}")
+    by_day = by_day or group_by == "day"
+    dimension = "all" if group_by == "day" else group_by
+
+    def grouped(table, *columns, extra=()):
+        group = [table.c.key, *([table.c.day] if by_day else []), *extra]
+        query = select(*group, *columns).where(table.c.dimension == dimension).group_by(*group).order_by(*group)
+        if start is not None:
+            query = query.where(table.c.day >= start)
+        if end is not None:
+            query = query.where(table.c.day < end)
+        width = 2 if by_day else 1
+        return ((tuple(row[:width]), row[width:]) for row in db.execute(query))
+
+    rollups = PredictionRollup.__table__
+    groups = {}
+    for name, (count, total, lo, hi) in grouped(
+        rollups, func.sum(rollups.c.count), func.sum(rollups.c.total), func.min(rollups.c.minimum),
+        func.max(rollups.c.maximum),
+    ):
+        group = {"key": None if group_by == "day" else (name[0] or None)}
+        if by_day:
+            group["day"] = name[1]
+        group.update(count=count, sum=total, mean=total / count, min=lo, max=hi)
+        groups[name] = group
+
+    if quantiles:
+        histogram = PredictionRollupBin.__table__
+        bins_by_group = defaultdict(list)
+        for name, (index, count) in grouped(histogram, func.sum(histogram.c.count), extra=[histogram.c.bin]):
+            bins_by_group[name].append((index, count))
+        for name, group in groups.items():
+            group["quantiles"] = quantiles_from_bins(bins_by_group[name], quantiles, group["min"], group["max"])
+    return list(groups.values())
+
+
+# Filled by rebuild_rollups next to the live tables, then copied over them
+_STAGING_METADATA = MetaData()
+_STAGING = tuple(
+    Table(f"{table.name}_rebuild", _STAGING_METADATA, *(column._copy() for column in table.columns))
+    for table in (PredictionRollup.__table__, PredictionRollupBin.__table__)
+)
+
+
+def _roll_up(db, after: int, last: Optional[int], chunksize: int, tables=None):
+    """Add the predictions with ``after < id <= last`` to the rollups, a chunk at a time.
+
+    Yields after each chunk with the number of rows read, for the caller to commit.
+    """
+    predictions = EnergyPrediction.__table__
+    datasets = dataset_view()
+    while True:
+        query = (
+            select(
+                predictions.c.id, predictions.c.prediction, predictions.c.created_at,
+                *(datasets.c[d] for d in DIMENSIONS),
+            )
+            .join(datasets, datasets.c.id == predictions.c.dataset_id)
+            .where(predictions.c.id > after)
+            .order_by(predictions.c.id)
+            .limit(chunksize)
+        )
+        if last is not None:
+            query = query.where(predictions.c.id <= last)
+        rows = db.execute(query).mappings().all()
+        if not rows:
+            return
+        by_day = defaultdict(list)
+        for row in rows:
+            by_day[row["created_at"].date()].append(row)
+        for day, day_rows in sorted(by_day.items()):
+            update_rollups(db, day_rows, [row["prediction"] for row in day_rows], day, shard=0, tables=tables)
+        after = rows[-1]["id"]
+        yield len(rows)
+
+
+def rebuild_rollups(session_factory, chunksize: int = 50_000) -> int:
+    """Recompute the rollups from energy_predictions.
+
+    The predictions up to the current max id are rolled up into staging
+    tables, committing each chunk, so prediction writers (which update the
+    live rollups) never wait on the rebuild's row locks, and at most for one
+    chunk commit on SQLite. One short transaction then
+    locks the live tables, replaces them with the staging ones and adds the
+    predictions written in the meantime. /api/p3/aggregates answers from the
+    old rollups until that commit.
+    """
+    live = (PredictionRollup.__table__, PredictionRollupBin.__table__)
+    done = 0
+    with session_factory() as db:
+        bind = db.get_bind()
+        _STAGING_METADATA.drop_all(bind=bind)
+        _STAGING_METADATA.create_all(bind=bind)
+        try:
+            last = db.execute(select(func.max(EnergyPrediction.id))).scalar() or 0
+            db.commit()
+            for rows in _roll_up(db, 0, last, chunksize, tables=_STAGING):
+                db.commit()
+                done += rows
+
+            if bind.dialect.name == "postgresql":
+                # Writers committing between the copy and the catch-up would be lost or double counted
+                db.execute(text(f"LOCK TABLE {', '.join(table.name for table in live)} IN EXCLUSIVE MODE"))
+            for table in live:
+                db.execute(delete(table))
+            for table, staging in zip(live, _STAGING):
+                db.execute(insert(table).from_select(list(staging.c.keys()), select(staging)))
+            for rows in _roll_up(db, last, None, chunksize):
+                done += rows
+            db.commit()
+        finally:
+            db.rollback()
+            _STAGING_METADATA.drop_all(bind=bind)
+    return done
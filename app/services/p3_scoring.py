@@ -0,0 +1,211 @@
+"""Offline bulk scoring of CSV/Parquet files.
+
+    uv run python -m app.services.p3_scoring data/X_test.csv predictions.csv
+    uv run python -m app.services.p3_scoring buildings.parquet scored.parquet --workers 4
+
+The input is read in chunks, the derived features are recomputed from the
+raw columns, and each chunk is scored with one vectorized model call and
+written out with a ``prediction`` column next to the input columns, so
+memory stays bounded whatever the file size. Parquet support requires the
+optional ``parquet`` extra (pyarrow).
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Union, get_args, get_origin
+
+import pandas as pd
+
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_features import derive_frame
+from app.services.p3_model import FEATURE_RENAMES, EnergyModel
+
+
+def _is_parquet(path: Path) -> bool:
+    return path.suffix.lower() in (".parquet", ".pq")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise SystemExit("Parquet files require pyarrow: uv sync --extra parquet")
+
+
+def read_chunks(path: Path, chunksize: int):
+    """Yield DataFrames of at most ``chunksize`` rows."""
+    if _is_parquet(path):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    # Accept both the API field name and the training column name
+    features = derive_frame(chunk.rename(columns={"PropertyGFABuildings": "PropertyGFABuilding(s)"}))
+    scored = chunk.copy()
+    scored["prediction"] = EnergyModel.predict_batch(features)
+    return scored
+
+
+class _CsvSink:
+    def __init__(self, path: Path):
+        self.path = path
+        self.header = True
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+
+def _spec_types() -> dict:
+    """Python type of each model input column, by file column name."""
+    types = {}
+    for name, field in EnergyRequest.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) is Union:
+            (annotation,) = [arg for arg in get_args(annotation) if arg is not type(None)]
+        types[FEATURE_RENAMES.get(name, name)] = types[name] = annotation
+    return types
+
+
+class _ParquetSink:
+    def __init__(self, path: Path):
+        _require_pyarrow()
+        self.path = path
+        self.writer = None
+
+    def _schema(self, df: pd.DataFrame):
+        """File schema, fixed before the first chunk is written.
+
+        Model inputs take the type of their EnergyRequest field, so a chunk
+        that happens to hold only whole numbers or only missing values does
+        not decide it: float fields are float64, integer fields int64 when the
+        first chunk has them as integers (float64 if numeric, text otherwise)
+        and string fields text. Other columns are float64 if numeric, bool if
+        boolean, text otherwise.
+        """
+        import pyarrow as pa
+
+        spec = _spec_types()
+        fields = []
+        for name, dtype in df.dtypes.items():
+            kind = spec.get(name)
+            numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+            if kind is int and pd.api.types.is_integer_dtype(dtype):
+                fields.append(pa.field(name, pa.int64()))
+            elif pd.api.types.is_bool_dtype(dtype) and kind in (None, bool):
+                fields.append(pa.field(name, pa.bool_()))
+            elif kind is float or (numeric and (kind is int or (kind is None and df[name].notna().any()))):
+                fields.append(pa.field(name, pa.float64()))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        return pa.schema(fields)
+
+    def write(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, self._schema(df))
+
+        columns = {}
+        for field in self.writer.schema:
+            values = df[field.name]
+            if pa.types.is_integer(field.type):
+                values = pd.to_numeric(values, errors="coerce")
+                present = values.dropna()
+                invalid = present[(present != present.round()) | (present.abs() >= 2**63)]
+                if len(invalid):
+                    # Rejected by the API as well; nothing is left on disk (see score_file)
+                    raise ValueError(f"{field.name} is an integer field, got {invalid.iloc[0]}")
+                values = values.astype(pd.ArrowDtype(field.type))
+            elif pa.types.is_float64(field.type):
+                values = pd.to_numeric(values, errors="coerce").astype("float64")
+            elif pa.types.is_boolean(field.type):
+                values = values.astype("boolean")
+            else:
+                values = values.astype("string")
+            columns[field.name] = values
+        table = pa.Table.from_pandas(pd.DataFrame(columns), schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_file(input_path, output_path, chunksize: int = 50_000, workers: int = 1) -> dict:
+    """Score ``input_path`` into ``output_path`` and return throughput figures."""
+    input_path, output_path = Path(input_path), Path(output_path)
+    # Written next to the destination and renamed at the end: a failed run
+    # leaves no partial output behind
+    partial = output_path.with_name(output_path.name + ".partial")
+    sink = _ParquetSink(partial) if _is_parquet(output_path) else _CsvSink(partial)
+    start = time.perf_counter()
+    rows = 0
+
+    def write(scored: pd.DataFrame):
+        nonlocal rows
+        sink.write(scored)
+        rows += len(scored)
+
+    try:
+        if workers <= 1:
+            for chunk in read_chunks(input_path, chunksize):
+                write(score_chunk(chunk))
+        else:
+            # Keep at most two chunks per worker in flight, written in input order
+            with ProcessPoolExecutor(max_workers=workers, initializer=EnergyModel.load) as pool:
+                pending = deque()
+                for chunk in read_chunks(input_path, chunksize):
+                    pending.append(pool.submit(score_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+    except BaseException:
+        sink.close()
+        partial.unlink(missing_ok=True)
+        raise
+    sink.close()
+    if partial.exists():
+        os.replace(partial, output_path)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of buildings.")
+    parser.add_argument("input", help="CSV or Parquet file with the model input columns")
+    parser.add_argument("output", help="Destination .csv or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Processes scoring chunks in parallel")
+    args = parser.parse_args(argv)
+
+    result = score_file(args.input, args.output, chunksize=args.chunksize, workers=args.workers)
+    print(
+        f"✅ Scored {result['rows']} rows in {result['seconds']:.2f}s "
+        f"({result['rows_per_second']:,.0f} rows/s) → {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
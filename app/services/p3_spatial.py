@@ -0,0 +1,267 @@
+"""In-memory spatial index of the stored buildings (energy_dataset coordinates).
+
+Points live in a scikit-learn BallTree with the haversine metric, plus a
+small append buffer for rows inserted since the tree was built. Queries
+search both: the tree in O(log n) and the buffer by brute force. When the
+buffer reaches ``SPATIAL_INDEX_BUFFER_SIZE`` points a background thread
+rebuilds the tree with them, so inserts never wait on a rebuild.
+
+The index is loaded from the database at startup (or on the first query)
+and fed by ``record_datasets`` after each committed insert of this process.
+Rows written by other workers or by create_db.py are picked up by the
+periodic reload (``SPATIAL_INDEX_REFRESH_SECONDS``).
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from sklearn.neighbors import BallTree
+from sqlalchemy import select
+
+from app.core import config
+from app.services.p3_datasets import dataset_table
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius, for haversine distances in meters
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def _radians(latitudes, longitudes) -> tuple[np.ndarray, np.ndarray]:
+    """(n, 2) array of [lat, lon] in radians and the mask of finite rows."""
+    points = np.radians(np.column_stack([np.asarray(latitudes, dtype=float), np.asarray(longitudes, dtype=float)]))
+    return points, np.isfinite(points).all(axis=1)
+
+
+def _haversine(point: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Great-circle distances in radians from one [lat, lon] to many."""
+    dlat = points[:, 0] - point[0]
+    dlon = points[:, 1] - point[1]
+    a = np.sin(dlat / 2) ** 2 + np.cos(point[0]) * np.cos(points[:, 0]) * np.sin(dlon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialIndex:
+    """Nearest-neighbour and radius search over (dataset id, latitude, longitude)."""
+
+    def __init__(self, buffer_size: int = 4096, refresh_seconds: float = 0.0, leaf_size: int = 40):
+        self.buffer_size = buffer_size
+        self.refresh_seconds = refresh_seconds
+        self.leaf_size = leaf_size
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._tree = None
+        self._tree_ids = np.empty(0, dtype=np.int64)
+        # Append buffer: rows [0, _count) of preallocated arrays
+        self._buffer_ids = np.empty(buffer_size, dtype=np.int64)
+        self._buffer_points = np.empty((buffer_size, 2))
+        self._count = 0
+        self._bind = None
+        self._loaded_at = None
+        self._rebuilding = False
+        self._rebuilds = 0
+        self._build_seconds = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def active(self) -> bool:
+        """Loaded or loading: inserts must be recorded."""
+        return self.loaded or self._load_lock.locked()
+
+    def load(self, bind):
+        """(Re)build the tree from every dataset row of ``bind`` (engine or connection)."""
+        with self._load_lock:
+            start = time.perf_counter()
+            table = dataset_table()
+            query = select(table.c.id, table.c.latitude, table.c.longitude).where(
+                table.c.latitude.is_not(None), table.c.longitude.is_not(None)
+            )
+            with bind.connect() as conn:
+                rows = conn.execute(query).all()
+            ids, latitudes, longitudes = zip(*rows) if rows else ((), (), ())
+            self._reset(ids, latitudes, longitudes, start)
+            self._bind = getattr(bind, "engine", bind)
+
+    def load_points(self, ids, latitudes, longitudes):
+        """(Re)build the tree from in-memory columns instead of the database."""
+        with self._load_lock:
+            self._reset(ids, latitudes, longitudes, time.perf_counter())
+
+    def _reset(self, ids, latitudes, longitudes, start: float):
+        ids = np.asarray(ids, dtype=np.int64)
+        points, valid = _radians(latitudes, longitudes)
+        tree = self._build(points[valid])
+        with self._lock:
+            # Rows recorded while reading: keep those the snapshot did not see
+            pending = ~np.isin(self._buffer_ids[:self._count], ids)
+            self._swap(tree, ids[valid], pending)
+            self._loaded_at = time.monotonic()
+            self._build_seconds = time.perf_counter() - start
+
+    def ensure_loaded(self, bind):
+        if not self.loaded:
+            self.load(bind)
+
+    def add(self, ids, latitudes, longitudes):
+        """Record newly committed rows."""
+        points, valid = _radians(latitudes, longitudes)
+        ids = np.asarray(ids, dtype=np.int64)[valid]
+        points = points[valid]
+        with self._lock:
+            end = self._count + len(ids)
+            if end > len(self._buffer_ids):
+                # A rebuild is catching up: grow instead of blocking the writer
+                capacity = max(end, 2 * len(self._buffer_ids))
+                self._buffer_ids = np.resize(self._buffer_ids, capacity)
+                self._buffer_points = np.resize(self._buffer_points, (capacity, 2))
+            self._buffer_ids[self._count:end] = ids
+            self._buffer_points[self._count:end] = points
+            self._count = end
+            # Merges wait for the initial load, which reconciles the buffer itself
+            merge = self.loaded and self._count >= self.buffer_size and self._start_rebuild()
+        if merge:
+            threading.Thread(target=self._merge, name="spatial-index-merge", daemon=True).start()
+
+    def nearby(self, latitude: float, longitude: float, k: int = 10, radius_m: Optional[float] = None):
+        """Up to ``k`` (dataset id, distance in meters), nearest first.
+
+        Without ``radius_m`` these are the ``k`` nearest rows, otherwise the
+        nearest rows within ``radius_m`` meters.
+        """
+        self._maybe_refresh()
+        point = np.radians([[latitude, longitude]])
+        with self._lock:
+            tree, tree_ids = self._tree, self._tree_ids
+            buffer_ids, buffer_points = self._buffer_ids[:self._count], self._buffer_points[:self._count]
+
+        ids, distances = [], []
+        if tree is not None and len(tree_ids):
+            dist, ind = tree.query(point, k=min(k, len(tree_ids)))
+            ids.append(tree_ids[ind[0]])
+            distances.append(dist[0])
+        if len(buffer_ids):
+            ids.append(buffer_ids)
+            distances.append(_haversine(point[0], buffer_points))
+        if not ids:
+            return []
+
+        ids, distances = np.concatenate(ids), np.concatenate(distances)
+        order = np.argsort(distances, kind="stable")[:k]
+        ids, distances = ids[order], distances[order] * EARTH_RADIUS_M
+        if radius_m is not None:
+            # The nearest k within the radius are the k nearest, cut at the radius
+            ids, distances = ids[distances <= radius_m], distances[distances <= radius_m]
+        return list(zip(ids.tolist(), distances.tolist()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "points": len(self._tree_ids) + self._count,
+                "tree_points": len(self._tree_ids),
+                "buffer_points": self._count,
+                "rebuilds": self._rebuilds,
+                "last_build_seconds": self._build_seconds,
+            }
+
+    def _build(self, points: np.ndarray):
+        return BallTree(points, leaf_size=self.leaf_size, metric="haversine") if len(points) else None
+
+    def _swap(self, tree, tree_ids: np.ndarray, pending):
+        """Publish a new tree and keep the ``pending`` buffer rows (caller holds the lock)."""
+        buffer_ids = self._buffer_ids[:self._count][pending]
+        buffer_points = self._buffer_points[:self._count][pending]
+        # New arrays: readers holding views of the old buffer are unaffected
+        capacity = max(self.buffer_size, len(buffer_ids))
+        self._buffer_ids = np.empty(capacity, dtype=np.int64)
+        self._buffer_points = np.empty((capacity, 2))
+        self._count = len(buffer_ids)
+        self._buffer_ids[:self._count] = buffer_ids
+        self._buffer_points[:self._count] = buffer_points
+        self._tree, self._tree_ids = tree, tree_ids
+        self._rebuilds += 1
+
+    def _start_rebuild(self) -> bool:
+        """Claim the single rebuild slot (caller holds the lock)."""
+        if self._rebuilding:
+            return False
+        self._rebuilding = True
+        return True
+
+    def _merge(self):
+        """Rebuild the tree with the buffered points."""
+        try:
+            start = time.perf_counter()
+            with self._lock:
+                n = self._count
+                tree_ids = np.concatenate([self._tree_ids, self._buffer_ids[:n]])
+                tree_points = self._buffer_points[:n].copy()
+                old_tree = self._tree
+            if old_tree is not None:
+                tree_points = np.concatenate([np.asarray(old_tree.data), tree_points])
+            tree = self._build(tree_points)
+            with self._lock:
+                pending = np.arange(self._count) >= n
+                self._swap(tree, tree_ids, pending)
+                self._build_seconds = time.perf_counter() - start
+        except Exception:
+            logger.exception("Spatial index merge failed")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def _maybe_refresh(self):
+        if not self.refresh_seconds or self._bind is None:
+            return
+        with self._lock:
+            due = time.monotonic() - self._loaded_at >= self.refresh_seconds and self._start_rebuild()
+        if due:
+            threading.Thread(target=self._refresh, name="spatial-index-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.load(self._bind)
+        except Exception:
+            logger.exception("Spatial index reload failed")
+            with self._lock:
+                # Retry at the next interval rather than on every query
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_spatial_index() -> SpatialIndex:
+    """Process-wide index (empty until loaded)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SpatialIndex(
+                    buffer_size=config.SPATIAL_INDEX_BUFFER_SIZE,
+                    refresh_seconds=config.SPATIAL_INDEX_REFRESH_SECONDS,
+                )
+    return _index
+
+
+def record_datasets(ids, latitudes, longitudes):
+    """Add committed rows to the index, if this process has one."""
+    if _index is not None and _index.active and len(ids):
+        _index.add(ids, latitudes, longitudes)
+
+
+def shutdown_spatial_index():
+    """Drop the index (it is rebuilt from the database on next use)."""
+    global _index
+    with _index_lock:
+        _index = None
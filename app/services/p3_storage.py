@@ -0,0 +1,92 @@
+"""Persistence of prediction inputs and outputs."""
+
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core import config
+from app.core.metrics import stage
+from app.models import EnergyDataset, EnergyPrediction
+from app.services.p3_datasets import dataset_view, insert_datasets
+from app.services.p3_rollups import DIMENSIONS, update_rollups
+from app.services.p3_spatial import record_datasets
+
+
+def dataset_values(payload) -> dict:
+    """Map an EnergyRequest payload to EnergyDataset column values."""
+    return dict(
+        building_type=payload.BuildingType,
+        primary_property_type=payload.PrimaryPropertyType,
+        zip_code=payload.ZipCode,
+        council_district_code=payload.CouncilDistrictCode,
+        neighborhood=payload.Neighborhood,
+        latitude=payload.Latitude,
+        longitude=payload.Longitude,
+        year_built=payload.YearBuilt,
+        number_of_buildings=payload.NumberofBuildings,
+        number_of_floors=payload.NumberofFloors,
+        property_gfa_total=payload.PropertyGFATotal,
+        property_gfa_parking=payload.PropertyGFAParking,
+        property_gfa_buildings=payload.PropertyGFABuildings,
+        list_of_all_property_use_types=payload.ListOfAllPropertyUseTypes,
+        largest_property_use_type=payload.LargestPropertyUseType,
+        largest_property_use_type_gfa=payload.LargestPropertyUseTypeGFA,
+        second_largest_property_use_type=payload.SecondLargestPropertyUseType,
+        second_largest_property_use_type_gfa=payload.SecondLargestPropertyUseTypeGFA,
+        third_largest_property_use_type=payload.ThirdLargestPropertyUseType,
+        third_largest_property_use_type_gfa=payload.ThirdLargestPropertyUseTypeGFA,
+        years_energystar_certified=payload.YearsENERGYSTARCertified,
+        outlier=payload.Outlier,
+        building_age=payload.BuildingAge,
+        # Missing for buildings without floors; stored as 0 like create_db.py
+        surface_per_floor=payload.SurfacePerFloor if payload.SurfacePerFloor is not None else 0.0,
+        is_multi_use=int(payload.IsMultiUse),
+        lat_zone=payload.LatZone,
+        lon_zone=payload.LonZone,
+    )
+
+
+def dataset_record(payload) -> EnergyDataset:
+    """Map an EnergyRequest payload to an EnergyDataset row."""
+    return EnergyDataset(**dataset_values(payload))
+
+
+def save_predictions(db: Session, payloads, predictions, model_version: Optional[str] = None) -> list[int]:
+    """Persist inputs and predictions in bulk and return the dataset ids.
+
+    Rows are inserted together so SQLAlchemy emits multi-row INSERTs instead
+    of one round-trip per building.
+    """
+    datasets = [dataset_values(payload) for payload in payloads]
+    with stage("db_flush"):
+        # Get the IDs without committing
+        dataset_ids = insert_datasets(db, datasets)
+
+    db.add_all([
+        EnergyPrediction(dataset_id=dataset_id, prediction=float(y), model_version=model_version)
+        for dataset_id, y in zip(dataset_ids, predictions)
+    ])
+    if config.ROLLUPS_ENABLED:
+        with stage("db_rollup"):
+            update_rollups(db, datasets, predictions)
+    with stage("db_commit"):
+        db.commit()
+    record_datasets(dataset_ids, [p.Latitude for p in payloads], [p.Longitude for p in payloads])
+    return dataset_ids
+
+
+def save_prediction_for_dataset(
+    db: Session, dataset_id: int, prediction: float, model_version: Optional[str] = None
+) -> bool:
+    """Record a prediction against an existing dataset row.
+
+    Returns False, without writing anything, if the row does not exist.
+    """
+    view = dataset_view()
+    dataset = db.execute(select(*(view.c[d] for d in DIMENSIONS)).where(view.c.id == dataset_id)).mappings().first()
+    if dataset is None:
+        return False
+    db.add(EnergyPrediction(dataset_id=dataset_id, prediction=float(prediction), model_version=model_version))
+    if config.ROLLUPS_ENABLED:
+        update_rollups(db, [dict(dataset)], [prediction])
+    db.commit()
+    return True
@@ -0,0 +1,241 @@
+"""Write-behind persistence of predictions."""
+
+import logging
+import queue
+import threading
+from typing import Optional
+
+from sqlalchemy import func, insert, select, text, update
+
+from app.core import config
+from app.core.database import SessionLocal
+from app.core.metrics import stage
+from app.models import EnergyPrediction, IdReservation
+from app.services.p3_datasets import dataset_table, insert_datasets
+from app.services.p3_rollups import update_rollups
+from app.services.p3_spatial import record_datasets
+from app.services.p3_storage import dataset_values
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriterQueueFull(Exception):
+    """Raised when the write-behind queue stays full past the put timeout."""
+
+
+class IdAllocator:
+    """Hand out primary keys before the rows are inserted.
+
+    Ids are reserved in blocks that no other worker process can get: from the
+    table sequence on PostgreSQL, and on SQLite from the ``id_reservations``
+    table, advanced under ``BEGIN IMMEDIATE`` and never behind ``max(id)``.
+    An in-memory SQLite database belongs to one process and uses a counter.
+    """
+
+    def __init__(self, session_factory, table, block_size: int = 100):
+        self.session_factory = session_factory
+        self.table = table
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._ids = []
+        self._next = None
+
+    def allocate(self, n: int) -> list[int]:
+        with self._lock:
+            with self.session_factory() as db:
+                bind = db.get_bind()
+                if bind.dialect.name == "sqlite" and bind.url.database in (None, "", ":memory:"):
+                    if self._next is None:
+                        self._next = (db.execute(select(func.max(self.table.c.id))).scalar() or 0) + 1
+                    ids = list(range(self._next, self._next + n))
+                    self._next += n
+                    return ids
+                while len(self._ids) < n:
+                    self._ids.extend(self._reserve(db, max(n, self.block_size)))
+            ids, self._ids = self._ids[:n], self._ids[n:]
+            return ids
+
+    def _reserve(self, db, n: int) -> list[int]:
+        if db.get_bind().dialect.name == "postgresql":
+            sequence = f"{self.table.name}_id_seq"
+            rows = db.execute(
+                text("SELECT nextval(:seq) FROM generate_series(1, :n)"),
+                {"seq": sequence, "n": n},
+            )
+            return [row[0] for row in rows]
+
+        reservations = IdReservation.__table__
+        reservations.create(db.connection(), checkfirst=True)
+        db.commit()
+        # Take the write lock before reading, so two processes cannot read the same next_id
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            reserved = db.execute(
+                select(reservations.c.next_id).where(reservations.c.table_name == self.table.name)
+            ).scalar()
+            # Rows inserted without a reserved id (autoincrement) push the start forward
+            start = max(reserved or 1, (db.execute(select(func.max(self.table.c.id))).scalar() or 0) + 1)
+            if reserved is None:
+                db.execute(insert(reservations).values(table_name=self.table.name, next_id=start + n))
+            else:
+                db.execute(
+                    update(reservations)
+                    .where(reservations.c.table_name == self.table.name)
+                    .values(next_id=start + n)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return list(range(start, start + n))
+
+
+class PredictionWriter:
+    """Drain a bounded queue of predictions into the database in the background.
+
+    ``submit`` allocates the ids, enqueues the rows and returns immediately;
+    a worker thread groups queued submissions into multi-row INSERTs. When the
+    queue is full callers wait up to ``put_timeout`` seconds, then get
+    ``WriterQueueFull`` so the API can shed load instead of growing memory.
+    A failed group is retried row by row; rows that still fail are logged
+    and counted in ``rows_failed``.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        put_timeout: float = 1.0,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dataset_ids = IdAllocator(session_factory, dataset_table())
+        self._prediction_ids = IdAllocator(session_factory, EnergyPrediction.__table__)
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._failed = 0
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, payloads, predictions, model_version: Optional[str] = None, block: bool = True) -> list[int]:
+        """Queue the rows for insertion and return the pre-allocated dataset ids."""
+        dataset_ids = self._dataset_ids.allocate(len(payloads))
+        prediction_ids = self._prediction_ids.allocate(len(payloads))
+        datasets = [
+            {"id": dataset_id, **dataset_values(payload)}
+            for dataset_id, payload in zip(dataset_ids, payloads)
+        ]
+        predictions = [
+            {"id": prediction_id, "dataset_id": dataset_id, "prediction": float(y), "model_version": model_version}
+            for prediction_id, dataset_id, y in zip(prediction_ids, dataset_ids, predictions)
+        ]
+        try:
+            self._queue.put((datasets, predictions), block=block, timeout=self.put_timeout)
+        except queue.Full:
+            raise WriterQueueFull("Write-behind queue is full")
+        return dataset_ids
+
+    def flush(self):
+        """Block until everything queued so far is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write out the remaining queue and stop the worker."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "rows_written": self._written,
+                "rows_failed": self._failed,
+            }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entries = [self._queue.get()]
+            while len(entries) < self.batch_size:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in entries:
+                stopping = True
+            batch = [entry for entry in entries if entry is not _STOP]
+            if batch:
+                self._write(batch)
+            for _ in entries:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        datasets = [row for rows, _ in batch for row in rows]
+        predictions = [row for _, rows in batch for row in rows]
+        try:
+            self._insert(datasets, predictions)
+        except Exception:
+            if len(predictions) == 1:
+                self._drop(datasets[0], predictions[0])
+                return
+            logger.warning(
+                "Write-behind insert of %d predictions failed, retrying row by row", len(predictions), exc_info=True
+            )
+            for dataset, prediction in zip(datasets, predictions):
+                try:
+                    self._insert([dataset], [prediction])
+                except Exception:
+                    self._drop(dataset, prediction)
+
+    def _insert(self, datasets, predictions):
+        with self.session_factory() as db, stage("db_write_behind"):
+            insert_datasets(db, datasets)
+            db.execute(insert(EnergyPrediction.__table__), predictions)
+            if config.ROLLUPS_ENABLED:
+                update_rollups(db, datasets, [row["prediction"] for row in predictions])
+            db.commit()
+        record_datasets(
+            [row["id"] for row in datasets],
+            [row["latitude"] for row in datasets],
+            [row["longitude"] for row in datasets],
+        )
+        with self._stats_lock:
+            self._written += len(predictions)
+
+    def _drop(self, dataset, prediction):
+        logger.exception("Write-behind dropped prediction %d (dataset %d)", prediction["id"], dataset["id"])
+        with self._stats_lock:
+            self._failed += 1
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> PredictionWriter:
+    """Return the process-wide writer, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = PredictionWriter(
+                    max_queue=config.WRITE_BEHIND_QUEUE_SIZE,
+                    batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+                    put_timeout=config.WRITE_BEHIND_PUT_TIMEOUT,
+                )
+    return _writer
+
+
+def shutdown_writer():
+    """Flush pending predictions to the database before exiting."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
@@ -0,0 +1,55 @@
+"""End-to-end /api/p3/predict throughput and latency by concurrency level."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.services.p3_model import EnergyModel
+from benchmarks.common import InProcessApp, api_payloads, latency_summary
+
+CONCURRENCY = [1, 4, 16]
+
+
+def _load(post, payloads, concurrency: int) -> dict:
+    def call(payload):
+        start = time.perf_counter()
+        response = post(payload)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(call, payloads))
+    elapsed = time.perf_counter() - start
+
+    summary = latency_summary(samples)
+    summary["requests_per_second"] = len(samples) / elapsed
+    return summary
+
+
+def run(
+    requests: int = 200, concurrency=CONCURRENCY, url: str = None, database_url: str = None, allow_drop: bool = False
+) -> dict:
+    """Benchmark a live server at ``url``, or the app in-process.
+
+    In-process runs use ``database_url`` (a temporary SQLite file by
+    default), e.g. a local PostgreSQL to compare backends.
+    """
+    payloads = api_payloads(requests)
+    results = {}
+
+    if url:
+        with httpx.Client(base_url=url, timeout=30) as client:
+            for level in concurrency:
+                results[str(level)] = _load(lambda p: client.post("/api/p3/predict", json=p), payloads, level)
+        return {"target": url, "concurrency": results}
+
+    EnergyModel.warm_up()
+    bench = InProcessApp(database_url, allow_drop)
+    try:
+        for level in concurrency:
+            results[str(level)] = _load(lambda p: bench.client.post("/api/p3/predict", json=p), payloads, level)
+    finally:
+        bench.close()
+    return {"target": bench.engine.dialect.name, "concurrency": results}
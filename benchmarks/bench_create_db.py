@@ -0,0 +1,34 @@
+"""create_db.py bulk import rate."""
+
+import tempfile
+import time
+from pathlib import Path
+
+import create_db
+from app.core.database import Base
+from benchmarks.common import benchmark_engine, load_rows
+
+
+def run(rows: int = 100_000, chunksize: int = 50_000, url: str = None, allow_drop: bool = False) -> dict:
+    csv_path = Path(tempfile.mkdtemp()) / "registry.csv"
+    load_rows(rows).to_csv(csv_path, index=False)
+
+    engine = benchmark_engine(url, allow_drop)
+    original, create_db.engine = create_db.engine, engine
+    try:
+        start = time.perf_counter()
+        inserted = create_db.import_dataset(csv_path, chunksize=chunksize)
+        elapsed = time.perf_counter() - start
+    finally:
+        create_db.engine = original
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        csv_path.unlink()
+
+    return {
+        "backend": engine.dialect.name,
+        "rows": inserted,
+        "chunksize": chunksize,
+        "seconds": elapsed,
+        "rows_per_second": inserted / elapsed,
+    }
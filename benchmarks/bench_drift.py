@@ -0,0 +1,32 @@
+"""Drift monitor cost: recording on the request path, folding and checking."""
+
+import time
+
+import numpy as np
+
+from app.core import config
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_drift import MAX_PENDING, DriftMonitor
+from app.services.p3_features import derive_payloads
+from benchmarks.common import api_payloads, latency_summary, timed
+
+
+def run(repeat: int = 20) -> dict:
+    monitor = DriftMonitor.from_file(config.DRIFT_REFERENCE_PATH, half_life=3600)
+    payloads = derive_payloads([EnergyRequest(**row) for row in api_payloads(MAX_PENDING - 1)])
+    predictions = np.random.default_rng(0).lognormal(15, 1, len(payloads))
+
+    # One record per /api/p3/predict call, below the inline fold threshold
+    start = time.perf_counter()
+    for payload, y in zip(payloads, predictions.tolist()):
+        monitor.record([payload], [y], monitor.reference["model_version"])
+    record_us = (time.perf_counter() - start) / len(payloads) * 1e6
+
+    start = time.perf_counter()
+    monitor.fold()
+    fold_us = (time.perf_counter() - start) / len(payloads) * 1e6
+    return {
+        "record_per_request_us": record_us,
+        "fold_per_row_us": fold_us,
+        "check": latency_summary(timed(monitor.check, repeat)),
+    }
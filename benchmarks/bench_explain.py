@@ -0,0 +1,35 @@
+"""?explain=true overhead: explanations vs the prediction itself, by batch size."""
+
+import time
+
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_explain import explain, get_explainer, get_explanation_cache
+from app.services.p3_model import EnergyModel
+from benchmarks.common import api_payloads, latency_summary, timed
+
+BATCH_SIZES = [1, 100, 1000]
+
+
+def run(batch_sizes=BATCH_SIZES, repeat: int = 20) -> dict:
+    EnergyModel.warm_up()
+    loaded = EnergyModel.current()
+    start = time.perf_counter()
+    explainer = get_explainer(loaded)
+    build_seconds = time.perf_counter() - start
+    cache = get_explanation_cache()
+
+    def cold(payloads):
+        cache.clear()
+        explain(loaded, payloads)
+
+    results = {}
+    for size in batch_sizes:
+        payloads = [EnergyRequest(**row) for row in api_payloads(size)]
+        results[str(size)] = {
+            "predict": latency_summary(timed(lambda: loaded.predict_payloads(payloads), repeat)),
+            "explain_cold": latency_summary(timed(lambda: cold(payloads), repeat)),
+            # Every row cached, as for repeated inputs
+            "explain_cached": latency_summary(timed(lambda: explain(loaded, payloads), repeat)),
+        }
+    cache.clear()
+    return {"method": explainer.method, "build_seconds": build_seconds, "batch_sizes": results}
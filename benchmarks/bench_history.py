@@ -0,0 +1,46 @@
+"""/api/p3/history latency as energy_predictions grows."""
+
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models import EnergyDataset, EnergyPrediction
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_storage import dataset_values
+from benchmarks.common import InProcessApp, api_payloads, latency_summary, timed
+
+TABLE_SIZES = [1_000, 10_000, 100_000]
+
+
+def _grow(bench: InProcessApp, current: int, target: int):
+    values = dataset_values(EnergyRequest(**api_payloads(1)[0]))
+    now = datetime.utcnow()
+    with bench.engine.begin() as conn:
+        for start in range(current, target, 10_000):
+            ids = range(start + 1, min(start + 10_000, target) + 1)
+            conn.execute(insert(EnergyDataset.__table__), [{**values, "id": i, "created_at": now} for i in ids])
+            conn.execute(
+                insert(EnergyPrediction.__table__),
+                [{"id": i, "dataset_id": i, "prediction": float(i), "created_at": now} for i in ids],
+            )
+
+
+def run(table_sizes=TABLE_SIZES, repeat: int = 30, database_url: str = None, allow_drop: bool = False) -> dict:
+    bench = InProcessApp(database_url, allow_drop)
+    results = {}
+    current = 0
+    try:
+        for size in table_sizes:
+            _grow(bench, current, size)
+            current = size
+            deep = max(0, size - 100)
+            get = bench.client.get
+            results[str(size)] = {
+                "first_page": latency_summary(timed(lambda: get("/api/p3/history"), repeat)),
+                "deep_cursor": latency_summary(timed(lambda: get("/api/p3/history", params={"cursor": deep}), repeat)),
+                "deep_offset": latency_summary(timed(lambda: get("/api/p3/history", params={"skip": deep}), repeat)),
+                "filtered": latency_summary(timed(lambda: get("/api/p3/history", params={"dataset_id": deep}), repeat)),
+            }
+    finally:
+        bench.close()
+    return {"backend": bench.engine.dialect.name, "table_sizes": results}
@@ -0,0 +1,44 @@
+"""EnergyModel.predict latency by batch size."""
+
+import time
+
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_model import EnergyModel, build_features
+from benchmarks.common import api_payloads, latency_summary, load_rows
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+
+def _measure(fn, size: int, repeat: int) -> dict:
+    runs = max(3, repeat // max(1, size // 100))
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    summary = latency_summary(samples)
+    summary["rows_per_second"] = size / (summary["mean_ms"] / 1000.0)
+    return summary
+
+
+def run(batch_sizes=BATCH_SIZES, repeat: int = 20) -> dict:
+    EnergyModel.warm_up()
+    results = {}
+    for size in batch_sizes:
+        df = load_rows(size)
+        results[str(size)] = _measure(lambda: EnergyModel.predict_batch(df), size, repeat)
+
+    # From validated payloads: pandas + ColumnTransformer vs the compiled path
+    compiled = EnergyModel.status()["compiled"]
+    payload_results = {}
+    for size in batch_sizes:
+        payloads = [EnergyRequest(**row) for row in api_payloads(size)]
+        payload_results[str(size)] = {
+            "pandas": _measure(lambda: EnergyModel.predict_batch(build_features(payloads)), size, repeat),
+        }
+        if compiled:
+            payload_results[str(size)]["compiled"] = _measure(
+                lambda: EnergyModel.predict_payloads(payloads), size, repeat
+            )
+    results["payloads"] = payload_results
+    return results
@@ -0,0 +1,80 @@
+"""/api/p3/aggregates: rollup reads vs GROUP BY scans, and the cost of rollups on writes."""
+
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+import create_db
+from app.core import config
+from app.core.database import Base
+from app.models import EnergyDataset, EnergyPrediction
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_rollups import aggregates, rebuild_rollups
+from app.services.p3_storage import save_predictions
+from benchmarks.common import benchmark_engine, latency_summary, load_rows, timed
+
+GROUPS = ["all", "zip_code", "neighborhood", "primary_property_type"]
+
+
+def _load(engine, rows: int):
+    df = create_db.clean_chunk(load_rows(rows))
+    df.insert(0, "id", range(1, rows + 1))
+    rng = np.random.default_rng(0)
+    with engine.begin() as conn:
+        create_db._insert_chunk(conn, df)
+        conn.execute(
+            insert(EnergyPrediction.__table__),
+            [{"id": i, "dataset_id": i, "prediction": float(y), "created_at": datetime(2026, 1, 1)}
+             for i, y in enumerate(rng.lognormal(13, 1.5, rows), start=1)],
+        )
+
+
+def _scan(group_by: str):
+    """The same statistics computed from the raw tables (no quantiles)."""
+    predictions, datasets = EnergyPrediction.__table__, EnergyDataset.__table__
+    y = predictions.c.prediction
+    columns = [func.count(), func.sum(y), func.min(y), func.max(y)]
+    query = select(*columns).select_from(predictions.join(datasets, datasets.c.id == predictions.c.dataset_id))
+    if group_by != "all":
+        query = query.add_columns(datasets.c[group_by]).group_by(datasets.c[group_by])
+    return query
+
+
+def run(rows: int = 100_000, repeat: int = 20, url: str = None, allow_drop: bool = False) -> dict:
+    engine = benchmark_engine(url, allow_drop)
+    sessions = sessionmaker(bind=engine)
+    layout = config.DATASET_SCHEMA
+    enabled = config.ROLLUPS_ENABLED
+    results = {"reads": {}, "writes": {}}
+    try:
+        config.DATASET_SCHEMA = "wide"
+        _load(engine, rows)
+        start = time.perf_counter()
+        rebuild_rollups(sessions)
+        results["rebuild_rows_per_s"] = rows / (time.perf_counter() - start)
+
+        with sessions() as db:
+            for group_by in GROUPS:
+                results["reads"][group_by] = {
+                    "scan_no_quantiles": latency_summary(timed(lambda: db.execute(_scan(group_by)).all(), repeat)),
+                    "rollups": latency_summary(timed(lambda: aggregates(db, group_by), repeat)),
+                }
+
+        payload = EnergyRequest.example()
+        for batch in (1, 100):
+            payloads = [payload] * batch
+            for label, on in (("without_rollups", False), ("with_rollups", True)):
+                config.ROLLUPS_ENABLED = on
+                with sessions() as db:
+                    samples = timed(lambda: save_predictions(db, payloads, [1e6] * batch), repeat)
+                results["writes"].setdefault(str(batch), {})[label] = latency_summary(samples)
+    finally:
+        config.DATASET_SCHEMA = layout
+        config.ROLLUPS_ENABLED = enabled
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+    return {"backend": engine.dialect.name, "rows": rows, **results}
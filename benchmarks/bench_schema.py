@@ -0,0 +1,82 @@
+"""energy_dataset size and query latency: original, indexed and compact layouts."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+import create_db
+from app.core import config
+from app.core.database import Base
+from app.models import EnergyDataset, EnergyPrediction
+from app.services.p3_datasets import CODES, dataset_table, dataset_view
+from app.services.p3_export import export_query
+from benchmarks.common import benchmark_engine, latency_summary, load_rows, timed
+
+NEW_INDEXES = ("zip_code", "created_at")
+
+
+def _load(engine, rows: int):
+    df = create_db.clean_chunk(load_rows(rows))
+    start = datetime(2026, 1, 1)
+    df["created_at"] = [start + timedelta(seconds=i) for i in range(rows)]
+    df.insert(0, "id", range(1, rows + 1))
+    with engine.begin() as conn:
+        create_db._insert_chunk(conn, df)
+        conn.execute(
+            insert(EnergyPrediction.__table__),
+            [{"id": i, "dataset_id": i, "prediction": float(i), "created_at": start} for i in range(1, rows + 1)],
+        )
+    return start
+
+
+def _measure(engine, rows: int, start: datetime, repeat: int) -> dict:
+    view, table = dataset_view(), dataset_table()
+    middle = rows // 2
+    queries = {
+        "dataset_by_id": select(view).where(view.c.id == middle),
+        # Filters on non-categorical columns need no dictionary join
+        "by_zip_code": select(func.count()).select_from(table).where(table.c.zip_code == 98101),
+        "created_since": select(func.count()).select_from(table).where(
+            table.c.created_at >= start + timedelta(seconds=rows - 1000)
+        ),
+        "export_page": export_query(since_id=middle).limit(1000),
+    }
+    create_db._reclaim_space()
+    results = {"size_bytes": create_db.database_size()}
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            results[name] = latency_summary(timed(lambda: conn.execute(query).all(), repeat))
+    return results
+
+
+def run(rows: int = 100_000, repeat: int = 20, url: str = None, allow_drop: bool = False) -> dict:
+    engine = benchmark_engine(url, allow_drop)
+    original, create_db.engine = create_db.engine, engine
+    layout = config.DATASET_SCHEMA
+    results = {}
+    try:
+        config.DATASET_SCHEMA = "wide"
+        new_indexes = [
+            index for index in EnergyDataset.__table__.indexes
+            if [column.name for column in index.columns] in ([name] for name in NEW_INDEXES)
+        ]
+        for index in new_indexes:
+            index.drop(bind=engine)
+        start = _load(engine, rows)
+        results["wide"] = _measure(engine, rows, start, repeat)
+
+        for index in new_indexes:
+            index.create(bind=engine)
+        results["wide_indexed"] = _measure(engine, rows, start, repeat)
+
+        create_db.compact_dataset(chunksize=50_000, reclaim=False)
+        config.DATASET_SCHEMA = "compact"
+        results["compact"] = _measure(engine, rows, start, repeat)
+    finally:
+        config.DATASET_SCHEMA = layout
+        create_db.engine = original
+        CODES.clear()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+    return {"backend": engine.dialect.name, "rows": rows, "layouts": results}
@@ -0,0 +1,69 @@
+"""/api/p3/history response path: ORM entities + response_model vs column tuples + orjson."""
+
+from datetime import datetime
+
+from fastapi import Depends, FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.core.responses import ORJSONResponse
+from app.models import EnergyPrediction
+from app.schemas.p3_request import PredictionHistoryResponse
+from benchmarks.common import InProcessApp, latency_summary, timed
+
+PAGE_SIZES = [10, 100, 1000]
+
+
+def _legacy_app(sessions) -> FastAPI:
+    """The history endpoint as it was: ORM entities validated through the response model."""
+    legacy = FastAPI()
+
+    def db_session():
+        with sessions() as db:
+            yield db
+
+    @legacy.get("/api/p3/history", response_model=PredictionHistoryResponse)
+    def history(limit: int = 100, db: Session = Depends(db_session)):
+        predictions = list(db.scalars(select(EnergyPrediction).order_by(EnergyPrediction.id).limit(limit)))
+        return {"total": len(predictions), "predictions": predictions, "next_cursor": None}
+
+    return legacy
+
+
+def run(page_sizes=PAGE_SIZES, repeat: int = 50, database_url: str = None, allow_drop: bool = False) -> dict:
+    bench = InProcessApp(database_url, allow_drop)
+    rows = max(page_sizes)
+    now = datetime.utcnow()
+    with bench.engine.begin() as conn:
+        conn.execute(
+            insert(EnergyPrediction.__table__),
+            [{"id": i, "dataset_id": i, "prediction": i * 1.5, "model_version": "v1", "created_at": now}
+             for i in range(1, rows + 1)],
+        )
+    legacy = TestClient(_legacy_app(bench.sessions))
+
+    results = {}
+    try:
+        for size in page_sizes:
+            params = {"limit": size}
+            payload = bench.client.get("/api/p3/history", params=params).json()
+            assert len(payload["predictions"]) == size
+            results[str(size)] = {
+                "orm_response_model": latency_summary(
+                    timed(lambda: legacy.get("/api/p3/history", params=params), repeat)
+                ),
+                "columns_orjson": latency_summary(
+                    timed(lambda: bench.client.get("/api/p3/history", params=params), repeat)
+                ),
+                # Rendering alone, on the same page of dicts
+                "render_json": latency_summary(
+                    timed(lambda: JSONResponse(jsonable_encoder(payload)), repeat)
+                ),
+                "render_orjson": latency_summary(timed(lambda: ORJSONResponse(payload), repeat)),
+            }
+    finally:
+        bench.close()
+    return {"backend": bench.engine.dialect.name, "page_sizes": results}
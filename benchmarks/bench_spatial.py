@@ -0,0 +1,50 @@
+"""/api/p3/dataset/nearby index: build time and query latency against a full scan."""
+
+import time
+
+import numpy as np
+
+from app.services.p3_spatial import EARTH_RADIUS_M, SpatialIndex, _haversine
+from benchmarks.common import latency_summary, timed
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _scan(points: np.ndarray, point: np.ndarray, k: int):
+    """What the ops notebook does: every distance, then sort."""
+    distances = _haversine(point, points)
+    return np.argsort(distances)[:k]
+
+
+def run(sizes=SIZES, repeat: int = 200, k: int = 10, radius_m: float = 500.0) -> dict:
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in sizes:
+        # Seattle bounding box, like energy_dataset
+        latitudes = rng.uniform(47.49, 47.74, size)
+        longitudes = rng.uniform(-122.42, -122.22, size)
+        queries = np.column_stack([rng.uniform(47.49, 47.74, repeat), rng.uniform(-122.42, -122.22, repeat)])
+
+        index = SpatialIndex()
+        start = time.perf_counter()
+        index.load_points(np.arange(1, size + 1), latitudes, longitudes)
+        build_seconds = time.perf_counter() - start
+
+        # Half a buffer of recent inserts, as between two merges
+        index.buffer_size = size
+        recent = np.column_stack([rng.uniform(47.49, 47.74, 2048), rng.uniform(-122.42, -122.22, 2048)])
+        index.add(np.arange(size + 1, size + 2049), recent[:, 0], recent[:, 1])
+
+        queries_iter = iter(np.tile(queries, (4, 1)))
+        points = np.radians(np.column_stack([latitudes, longitudes]))
+        results[str(size)] = {
+            "build_seconds": build_seconds,
+            "knn": latency_summary(timed(lambda: index.nearby(*next(queries_iter), k=k), repeat)),
+            "radius": latency_summary(
+                timed(lambda: index.nearby(*next(queries_iter), k=1000, radius_m=radius_m), repeat)
+            ),
+            "full_scan_knn": latency_summary(
+                timed(lambda: _scan(points, np.radians(next(queries_iter)), k), min(repeat, 50))
+            ),
+        }
+    return {"k": k, "radius_m": radius_m, "earth_radius_m": EARTH_RADIUS_M, "sizes": results}
@@ -0,0 +1,129 @@
+"""Helpers shared by the benchmark suites."""
+
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, literal_column, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, get_db
+from app.main import app
+
+X_TEST = Path("data/X_test.csv")
+
+
+def load_rows(n: int) -> pd.DataFrame:
+    """``n`` rows of data/X_test.csv, repeated as needed."""
+    df = pd.read_csv(X_TEST)
+    reps = -(-n // len(df))
+    return pd.concat([df] * reps, ignore_index=True).iloc[:n]
+
+
+def api_payloads(n: int) -> list[dict]:
+    """``n`` /api/p3/predict payloads built from data/X_test.csv."""
+    df = load_rows(n).rename(columns={"PropertyGFABuilding(s)": "PropertyGFABuildings"})
+    df["YearsENERGYSTARCertified"] = 0
+    df["Outlier"] = df["Outlier"].fillna("No")
+    df["SurfacePerFloor"] = df["SurfacePerFloor"].fillna(0.0)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")
+
+
+def latency_summary(samples: list[float]) -> dict:
+    """Summary in milliseconds of a list of durations in seconds."""
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "count": len(samples),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "stdev_ms": float(statistics.pstdev(ms)) if len(ms) > 1 else 0.0,
+    }
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def database_url(url: str = None) -> str:
+    """The given URL, or a fresh SQLite file in a temporary directory."""
+    if url:
+        return url
+    return f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+
+def benchmark_engine(url: str = None, allow_drop: bool = False):
+    """Engine on a database the benchmark may wipe, with fresh empty tables.
+
+    The suites drop every application table before and after they run, so a
+    ``url`` whose tables already hold rows is refused unless ``allow_drop``
+    (``--i-know-this-drops-tables``) is set.
+    """
+    url = database_url(url)
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(url, pool_pre_ping=True)
+    if not allow_drop:
+        existing = set(inspect(engine).get_table_names())
+        with engine.connect() as conn:
+            filled = [
+                table.name for table in Base.metadata.sorted_tables
+                if table.name in existing
+                and conn.execute(select(literal_column("1")).select_from(table).limit(1)).first() is not None
+            ]
+        if filled:
+            engine.dispose()
+            raise SystemExit(
+                f"❌ {make_url(url).render_as_string(hide_password=True)} already holds data ({', '.join(filled)}) "
+                "and the benchmarks drop every table: use a throwaway database, "
+                "or pass --i-know-this-drops-tables"
+            )
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+class InProcessApp:
+    """The FastAPI app bound to a dedicated benchmark database."""
+
+    def __init__(self, url: str = None, allow_drop: bool = False):
+        self.url = database_url(url)
+        self.engine = benchmark_engine(self.url, allow_drop)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        def override_get_db():
+            db = self.sessions()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        self.client = TestClient(app)
+
+    def close(self):
+        app.dependency_overrides.clear()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
@@ -0,0 +1,52 @@
+"""Compare two benchmark result files.
+
+    uv run python -m benchmarks.compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+Prints every latency/throughput figure present in both files with the
+relative change, flagging regressions beyond ``--threshold`` percent.
+"""
+
+import argparse
+import json
+
+# Metrics where a higher value is better; every other *_ms figure is a latency
+HIGHER_IS_BETTER = ("rows_per_second", "requests_per_second")
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key in HIGHER_IS_BETTER):
+            yield path, float(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = dict(_flatten(json.load(f)["suites"]))
+    with open(args.candidate) as f:
+        candidate = dict(_flatten(json.load(f)["suites"]))
+
+    regressions = 0
+    for path in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[path], candidate[path]
+        if not before:
+            continue
+        change = (after - before) / before * 100.0
+        worse = -change if path.endswith(HIGHER_IS_BETTER) else change
+        flag = "⚠️ " if worse > args.threshold else "  "
+        regressions += worse > args.threshold
+        print(f"{flag}{path:70s} {before:12.3f} → {after:12.3f} ({change:+.1f}%)")
+    print(f"\n{regressions} regression(s) above {args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
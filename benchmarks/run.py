@@ -0,0 +1,101 @@
+"""Run the benchmark suites and write the results as JSON.
+
+    uv run python -m benchmarks.run
+    uv run python -m benchmarks.run --suite model --suite api --database-url postgresql+psycopg://.../futurisys_bench
+    uv run python -m benchmarks.run --suite api --url http://localhost:8000
+
+Results go to benchmarks/results/<commit>.json by default; compare two
+runs with ``python -m benchmarks.compare``. The database suites drop and
+recreate every table of ``--database-url``: they refuse a database that
+already holds rows unless ``--i-know-this-drops-tables`` is passed.
+"""
+
+import argparse
+import json
+import platform
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks import (
+    bench_admission,
+    bench_api,
+    bench_create_db,
+    bench_drift,
+    bench_explain,
+    bench_history,
+    bench_model,
+    bench_rollups,
+    bench_schema,
+    bench_serialization,
+    bench_spatial,
+)
+from benchmarks.common import git_commit
+
+SUITES = ["model", "api", "create_db", "history", "schema", "serialization", "spatial", "rollups", "explain", "drift", "admission"]
+
+
+def run_suite(name: str, args) -> dict:
+    if name == "model":
+        return bench_model.run()
+    if name == "api":
+        return bench_api.run(
+            requests=args.requests, url=args.url, database_url=args.database_url, allow_drop=args.allow_drop
+        )
+    if name == "create_db":
+        return bench_create_db.run(rows=args.rows, url=args.database_url, allow_drop=args.allow_drop)
+    if name == "history":
+        return bench_history.run(database_url=args.database_url, allow_drop=args.allow_drop)
+    if name == "serialization":
+        return bench_serialization.run(database_url=args.database_url, allow_drop=args.allow_drop)
+    if name == "rollups":
+        return bench_rollups.run(rows=args.rows, url=args.database_url, allow_drop=args.allow_drop)
+    if name == "admission":
+        return bench_admission.run()
+    if name == "drift":
+        return bench_drift.run()
+    if name == "explain":
+        return bench_explain.run()
+    if name == "spatial":
+        return bench_spatial.run()
+    if name == "schema":
+        return bench_schema.run(rows=args.rows, url=args.database_url, allow_drop=args.allow_drop)
+    raise ValueError(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the performance benchmarks.")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="Suite to run (repeatable, default: all)")
+    parser.add_argument("--database-url", help="Database for the api/create_db/history suites (default: temporary SQLite)")
+    parser.add_argument(
+        "--i-know-this-drops-tables",
+        dest="allow_drop",
+        action="store_true",
+        help="Run on a --database-url that already holds data (its tables are dropped)",
+    )
+    parser.add_argument("--url", help="Benchmark a live server instead of the in-process app (api suite)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level (api suite)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows to import (create_db/schema/rollups suites)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "database": args.database_url or "sqlite (temporary file)",
+        "suites": {},
+    }
+    for name in args.suite or SUITES:
+        print(f"⏱️  {name}...")
+        report["suites"][name] = run_suite(name, args)
+
+    output = Path(args.output or f"benchmarks/results/{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,171 @@
 """Database initialization script to create tables and seed initial data."""
 
-import sys
+import argparse
+import time
 import pandas as pd
+from datetime import datetime
 from pathlib import Path
-from sqlalchemy import text
+from sqlalchemy import delete, func, inspect, insert, select, text, update
 from sqlalchemy.orm import Session
 from app.core.database import engine, Base
-from app.models import EnergyDataset, EnergyPrediction
+from app.models import (
+    DatasetImport, EnergyDataset, EnergyDatasetCompact, EnergyPrediction, PredictionRollup, PredictionRollupBin,
+)
+from app.services.p3_datasets import dataset_table, encode_frame, encode_rows
+from app.services.p3_features import derive_frame
+from app.services.p3_rollups import rebuild_rollups
+
+
+# CSV column -> energy_dataset column
+COLUMN_MAP = {
+    "BuildingType": "building_type",
+    "PrimaryPropertyType": "primary_property_type",
+    "ZipCode": "zip_code",
+    "CouncilDistrictCode": "council_district_code",
+    "Neighborhood": "neighborhood",
+    "Latitude": "latitude",
+    "Longitude": "longitude",
+    "YearBuilt": "year_built",
+    "NumberofBuildings": "number_of_buildings",
+    "NumberofFloors": "number_of_floors",
+    "PropertyGFATotal": "property_gfa_total",
+    "PropertyGFAParking": "property_gfa_parking",
+    "PropertyGFABuilding(s)": "property_gfa_buildings",
+    "ListOfAllPropertyUseTypes": "list_of_all_property_use_types",
+    "LargestPropertyUseType": "largest_property_use_type",
+    "LargestPropertyUseTypeGFA": "largest_property_use_type_gfa",
+    "SecondLargestPropertyUseType": "second_largest_property_use_type",
+    "SecondLargestPropertyUseTypeGFA": "second_largest_property_use_type_gfa",
+    "ThirdLargestPropertyUseType": "third_largest_property_use_type",
+    "ThirdLargestPropertyUseTypeGFA": "third_largest_property_use_type_gfa",
+    "Outlier": "outlier",
+    "BuildingAge": "building_age",
+    "SurfacePerFloor": "surface_per_floor",
+    "IsMultiUse": "is_multi_use",
+    "LatZone": "lat_zone",
+    "LonZone": "lon_zone",
+}
+
+# Raw columns the derived features (BuildingAge, zones, ...) are computed from
+RAW_FEATURE_COLUMNS = ["YearBuilt", "PropertyGFATotal", "NumberofFloors", "Latitude", "Longitude"]
+
+# Defaults for missing values (None keeps the column NULL)
+STRING_DEFAULTS = {
+    "building_type": "Unknown",
+    "primary_property_type": "Unknown",
+    "neighborhood": "",
+    "list_of_all_property_use_types": "",
+    "largest_property_use_type": "Unknown",
+    "second_largest_property_use_type": None,
+    "third_largest_property_use_type": None,
+    "outlier": "No",
+}
+INT_DEFAULTS = {
+    "zip_code": 0,
+    "council_district_code": 0,
+    "year_built": 0,
+    "number_of_buildings": 1,
+    "number_of_floors": 0,
+    "is_multi_use": 0,
+    "lat_zone": 0,
+    "lon_zone": 0,
+}
+FLOAT_DEFAULTS = {
+    "latitude": 0.0,
+    "longitude": 0.0,
+    "property_gfa_total": 0.0,
+    "property_gfa_parking": 0.0,
+    "property_gfa_buildings": 0.0,
+    "largest_property_use_type_gfa": 0.0,
+    "second_largest_property_use_type_gfa": None,
+    "third_largest_property_use_type_gfa": None,
+    "building_age": 0.0,
+    "surface_per_floor": 0.0,
+}
+
+
+def clean_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Map a CSV chunk to energy_dataset columns with vectorized cleaning."""
+    if all(column in chunk for column in RAW_FEATURE_COLUMNS):
+        chunk = derive_frame(chunk)
+    df = chunk.rename(columns=COLUMN_MAP)
+    out = pd.DataFrame(index=df.index)
+
+    for column, default in STRING_DEFAULTS.items():
+        values = df[column] if column in df else pd.Series(pd.NA, index=df.index)
+        values = values.astype("string")
+        out[column] = values if default is None else values.fillna(default)
+
+    for column, default in INT_DEFAULTS.items():
+        values = df[column] if column in df else pd.Series(default, index=df.index)
+        out[column] = pd.to_numeric(values, errors="coerce").fillna(default).astype("int64")
+
+    for column, default in FLOAT_DEFAULTS.items():
+        values = pd.to_numeric(df[column], errors="coerce") if column in df else pd.Series(float("nan"), index=df.index)
+        out[column] = values if default is None else values.fillna(default)
+
+    # YearsENERGYSTARCertified contains concatenated strings like '201620152012', store as 0
+    out["years_energystar_certified"] = 0
+    out["created_at"] = datetime.utcnow()
+    return out
+
+
+def _insert_chunk(conn, df: pd.DataFrame):
+    table = dataset_table()
+    if table is EnergyDatasetCompact.__table__:
+        df = encode_frame(conn, df)
+    columns = list(df.columns)
+    rows = df.astype(object).where(df.notna(), None)
+
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg":
+        # COPY is several times faster than INSERT on PostgreSQL
+        raw = conn.connection.driver_connection
+        with raw.cursor() as cursor:
+            with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows.itertuples(index=False, name=None):
+                    copy.write_row(row)
+    else:
+        conn.execute(insert(table), rows.to_dict("records"))
+
+
+def import_dataset(path, chunksize: int = 50_000, resume: bool = False) -> int:
+    """Stream a CSV into energy_dataset in chunks and return the rows inserted.
+
+    Progress is recorded in dataset_imports in the same transaction as each
+    chunk, so ``resume=True`` picks up exactly after the last committed chunk.
+    """
+    path = Path(path)
+    source = str(path.resolve())
+    progress = DatasetImport.__table__
+
+    with engine.begin() as conn:
+        done = conn.execute(select(progress.c.rows_done).where(progress.c.source == source)).scalar()
+        if done is None:
+            conn.execute(insert(progress), {"source": source, "rows_done": 0})
+        if not resume or done is None:
+            done = 0
+            conn.execute(update(progress).where(progress.c.source == source).values(rows_done=0))
+
+    if done:
+        print(f"↪️  Resuming {path.name} after {done} rows")
+
+    start = time.perf_counter()
+    inserted = 0
+    reader = pd.read_csv(path, chunksize=chunksize, skiprows=range(1, done + 1))
+    for chunk in reader:
+        df = clean_chunk(chunk)
+        with engine.begin() as conn:
+            _insert_chunk(conn, df)
+            done += len(df)
+            conn.execute(update(progress).where(progress.c.source == source).values(rows_done=done))
+        inserted += len(df)
+        elapsed = time.perf_counter() - start
+        print(f"   {done} rows ({inserted / elapsed:,.0f} rows/s)")
+
+    elapsed = time.perf_counter() - start
+    rate = inserted / elapsed if elapsed else 0.0
+    print(f"✅ Imported {inserted} rows from {path.name} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return inserted
 
 
 def load_test_dataset():
@@ -18,56 +177,159 @@ def load_test_dataset():
         print(f"⚠️  {test_file} not found, skipping dataset load")
         return
     
-    df = pd.read_csv(test_file)
-    
     with Session(engine) as session:
         # Check if already loaded
-        existing = session.query(EnergyDataset).count()
+        table = dataset_table()
+        existing = session.execute(select(func.count()).select_from(table)).scalar()
         if existing > 0:
             print(f"✅ Dataset already loaded ({existing} records)")
             return
-        
-        # Insert all rows
-        for _, row in df.iterrows():
-            dataset_record = EnergyDataset(
-                building_type=str(row.get("BuildingType", "")) if pd.notna(row.get("BuildingType")) else "Unknown",
-                primary_property_type=str(row.get("PrimaryPropertyType", "")) if pd.notna(row.get("PrimaryPropertyType")) else "Unknown",
-                zip_code=int(row.get("ZipCode", 0)),
-                council_district_code=int(row.get("CouncilDistrictCode", 0)),
-                neighborhood=str(row.get("Neighborhood", "")) if pd.notna(row.get("Neighborhood")) else "",
-                latitude=float(row.get("Latitude", 0)),
-                longitude=float(row.get("Longitude", 0)),
-                year_built=int(row.get("YearBuilt", 0)),
-                number_of_buildings=int(row.get("NumberofBuildings", 1)),
-                number_of_floors=int(row.get("NumberofFloors", 0)),
-                property_gfa_total=float(row.get("PropertyGFATotal", 0)),
-                property_gfa_parking=float(row.get("PropertyGFAParking", 0)),
-                property_gfa_buildings=float(row.get("PropertyGFABuilding(s)", 0)),
-                list_of_all_property_use_types=str(row.get("ListOfAllPropertyUseTypes", "")) if pd.notna(row.get("ListOfAllPropertyUseTypes")) else "",
-                largest_property_use_type=str(row.get("LargestPropertyUseType", "")) if pd.notna(row.get("LargestPropertyUseType")) else "Unknown",
-                largest_property_use_type_gfa=float(row.get("LargestPropertyUseTypeGFA", 0)),
-                second_largest_property_use_type=str(row.get("SecondLargestPropertyUseType")) if pd.notna(row.get("SecondLargestPropertyUseType")) else None,
-                second_largest_property_use_type_gfa=float(row.get("SecondLargestPropertyUseTypeGFA")) if pd.notna(row.get("SecondLargestPropertyUseTypeGFA")) else None,
-                third_largest_property_use_type=str(row.get("ThirdLargestPropertyUseType")) if pd.notna(row.get("ThirdLargestPropertyUseType")) else None,
-                third_largest_property_use_type_gfa=float(row.get("ThirdLargestPropertyUseTypeGFA")) if pd.notna(row.get("ThirdLargestPropertyUseTypeGFA")) else None,
-                years_energystar_certified=0,  # YearsENERGYSTARCertified contains concatenated strings like '201620152012', store as 0
-                outlier=str(row.get("Outlier", "")) if pd.notna(row.get("Outlier")) else "No",
-                building_age=float(row.get("BuildingAge", 0)) if pd.notna(row.get("BuildingAge")) else 0.0,
-                surface_per_floor=float(row.get("SurfacePerFloor", 0)) if pd.notna(row.get("SurfacePerFloor")) else 0.0,
-                is_multi_use=int(row.get("IsMultiUse", 0)),
-                lat_zone=int(row.get("LatZone", 0)),
-                lon_zone=int(row.get("LonZone", 0)),
-            )
-            session.add(dataset_record)
-        
-        session.commit()
-        print(f"✅ Loaded {len(df)} records into energy_dataset")
+
+    import_dataset(test_file)
+
+
+def create_indexes():
+    """Add indexes declared on the models to tables created before they existed."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def add_missing_columns():
+    """Add nullable columns declared on the models to existing tables.
+
+    ``create_all`` only creates missing tables; this covers columns added
+    later, such as ``energy_predictions.model_version``.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    print(f"⚠️  Cannot add NOT NULL column {table.name}.{column.name}, skipping")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                print(f"✅ Added column {table.name}.{column.name}")
+
+
+def _drop_prediction_foreign_keys(keep: str = None):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for fk in inspector.get_foreign_keys("energy_predictions"):
+            if fk["constrained_columns"] == ["dataset_id"] and fk["referred_table"] != keep:
+                conn.execute(text(f'ALTER TABLE energy_predictions DROP CONSTRAINT "{fk["name"]}"'))
+                print(f"✅ Dropped foreign key {fk['name']} to {fk['referred_table']}")
+
+
+def retarget_prediction_foreign_key(target: str = None):
+    """Point energy_predictions.dataset_id at the table of the configured layout.
+
+    Only PostgreSQL enforces it; SQLite tables keep their original constraint,
+    which is not checked unless foreign keys are turned on.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    target = target or dataset_table().name
+    _drop_prediction_foreign_keys(keep=target)
+    current = {fk["referred_table"] for fk in inspect(engine).get_foreign_keys("energy_predictions")}
+    if target not in current:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE energy_predictions ADD CONSTRAINT energy_predictions_dataset_id_{target}_fkey "
+                f"FOREIGN KEY (dataset_id) REFERENCES {target} (id)"
+            ))
+        print(f"✅ energy_predictions.dataset_id now references {target}")
+
+
+def database_size() -> int:
+    """Bytes used by the database (the file for SQLite)."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            return conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+        if engine.dialect.name == "sqlite":
+            pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+            return pages * conn.exec_driver_sql("PRAGMA page_size").scalar()
+    return 0
+
+
+def _reclaim_space():
+    # Deleted rows only give their pages back after VACUUM
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM" if engine.dialect.name == "sqlite" else "VACUUM ANALYZE")
+
+
+def compact_dataset(chunksize: int = 50_000, reclaim: bool = True) -> int:
+    """Move energy_dataset rows to the dictionary-encoded energy_dataset_compact.
+
+    Rows keep their ids, so predictions still point at the same inputs. Each
+    chunk is copied and deleted in one transaction: an interrupted run is
+    resumed by running it again. Serve with DATASET_SCHEMA=compact afterwards.
+    """
+    wide, compact = EnergyDataset.__table__, EnergyDatasetCompact.__table__
+    Base.metadata.create_all(bind=engine)
+    before = database_size()
+
+    # Predictions reference their rows on either side while they move
+    if engine.dialect.name == "postgresql":
+        _drop_prediction_foreign_keys()
+
+    start = time.perf_counter()
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select(wide).order_by(wide.c.id).limit(chunksize)).mappings().all()
+            if not rows:
+                break
+            conn.execute(insert(compact), encode_rows(conn, [dict(row) for row in rows]))
+            conn.execute(delete(wide).where(wide.c.id <= rows[-1]["id"]))
+        moved += len(rows)
+        print(f"   {moved} rows moved")
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(
+                "SELECT setval('energy_dataset_compact_id_seq', "
+                "GREATEST((SELECT MAX(id) FROM energy_dataset_compact), 1))"
+            ))
+        retarget_prediction_foreign_key(compact.name)
+    if reclaim:
+        _reclaim_space()
+    after = database_size()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Moved {moved} rows to energy_dataset_compact in {elapsed:.2f}s")
+    if before:
+        print(f"   Database size: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB")
+    return moved
+
+
+def rebuild_rollups_table(chunksize: int = 50_000) -> int:
+    """Recompute the /api/p3/aggregates rollups from the stored predictions."""
+    print("🔄 Rebuilding prediction rollups...")
+    # Rollup tables from before sharding lack the shard key: they only hold
+    # derived data, so recreate them
+    inspector = inspect(engine)
+    for table in (PredictionRollupBin.__table__, PredictionRollup.__table__):
+        if inspector.has_table(table.name) and "shard" not in {c["name"] for c in inspector.get_columns(table.name)}:
+            table.drop(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    done = rebuild_rollups(lambda: Session(engine), chunksize=chunksize)
+    print(f"✅ Rolled up {done} predictions in {time.perf_counter() - start:.2f}s")
+    return done
 
 
 def create_database():
     """Create all database tables."""
     print("🔄 Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    create_indexes()
+    retarget_prediction_foreign_key()
     
     # Reset sequence to start from 1 (for PostgreSQL and SQLite)
     try:
@@ -98,7 +360,31 @@ def drop_database():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "drop":
+    parser = argparse.ArgumentParser(description="Create, drop or bulk-load the database.")
+    parser.add_argument("command", nargs="?", default="create", choices=["create", "drop", "import", "migrate", "compact", "rollups"])
+    parser.add_argument("path", nargs="?", help="CSV file to import (import command)")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk (import/compact/rollups commands)")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted import")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM after compact")
+    args = parser.parse_args()
+
+    if args.command == "drop":
         drop_database()
+    elif args.command == "migrate":
+        Base.metadata.create_all(bind=engine)
+        add_missing_columns()
+        create_indexes()
+        retarget_prediction_foreign_key()
+        print("✅ Database schema up to date")
+    elif args.command == "compact":
+        compact_dataset(chunksize=args.chunksize, reclaim=not args.no_vacuum)
+        print("➡️  Serve with DATASET_SCHEMA=compact")
+    elif args.command == "rollups":
+        rebuild_rollups_table(chunksize=args.chunksize)
+    elif args.command == "import":
+        if not args.path:
+            parser.error("import requires a CSV path")
+        Base.metadata.create_all(bind=engine)
+        import_dataset(args.path, chunksize=args.chunksize, resume=args.resume)
     else:
         create_database()
@@ -0,0 +1,26 @@
+"""Gunicorn settings for multi-worker deployments.
+
+    uv run gunicorn -c gunicorn.conf.py app.main:app
+
+The model is loaded once in the master before the workers are forked, so
+its memory is shared copy-on-write instead of duplicated per worker.
+Combine with MODEL_MMAP=1 to also share the pages across restarts and
+separate process groups through the page cache.
+"""
+
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:7860")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    from app.services.p3_model import EnergyModel
+
+    EnergyModel.load()
+    # Keep the loaded objects out of future GC passes, which would otherwise
+    # touch (and un-share) their pages in every worker.
+    gc.freeze()
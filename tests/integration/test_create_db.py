@@ -0,0 +1,100 @@
+"""Integration tests for the bulk CSV import of create_db.py."""
+
+import pytest
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import create_db
+from app.core.database import Base
+from app.models import EnergyDataset
+
+
+@pytest.fixture
+def import_engine(tmp_path, monkeypatch):
+    if not Path("data/X_test.csv").exists():
+        pytest.skip("Test data not found at data/X_test.csv")
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(create_db, "engine", engine)
+    return engine
+
+
+def test_import_dataset_in_chunks(import_engine):
+    inserted = create_db.import_dataset("data/X_test.csv", chunksize=100)
+    assert inserted == 292
+
+    with Session(import_engine) as session:
+        assert session.query(EnergyDataset).count() == 292
+        first = session.get(EnergyDataset, 1)
+        assert first.zip_code == 98119
+        assert first.property_gfa_buildings == 37600
+        assert first.outlier == "No"
+        assert first.is_multi_use == 1
+        assert first.years_energystar_certified == 0
+        second = session.get(EnergyDataset, 2)
+        assert second.third_largest_property_use_type is None
+        assert second.third_largest_property_use_type_gfa is None
+
+
+def test_import_dataset_resume(import_engine, monkeypatch):
+    calls = []
+    insert_chunk = create_db._insert_chunk
+
+    def failing_insert(conn, df):
+        calls.append(len(df))
+        if len(calls) == 2:
+            raise RuntimeError("interrupted")
+        insert_chunk(conn, df)
+
+    monkeypatch.setattr(create_db, "_insert_chunk", failing_insert)
+    with pytest.raises(RuntimeError):
+        create_db.import_dataset("data/X_test.csv", chunksize=100)
+    monkeypatch.setattr(create_db, "_insert_chunk", insert_chunk)
+
+    assert create_db.import_dataset("data/X_test.csv", chunksize=100, resume=True) == 192
+    with Session(import_engine) as session:
+        assert session.query(EnergyDataset).count() == 292
+
+
+def test_add_missing_columns(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE energy_predictions (id INTEGER PRIMARY KEY, dataset_id INTEGER NOT NULL, "
+            "prediction FLOAT NOT NULL, created_at DATETIME NOT NULL)"
+        )
+    monkeypatch.setattr(create_db, "engine", engine)
+
+    create_db.add_missing_columns()
+
+    from sqlalchemy import inspect
+    columns = {column["name"] for column in inspect(engine).get_columns("energy_predictions")}
+    assert "model_version" in columns
+
+
+def test_compact_dataset_keeps_ids_and_values(import_engine, monkeypatch):
+    from sqlalchemy import func, insert, select
+
+    from app.core import config
+    from app.models import CategoryDictionary, EnergyDatasetCompact, EnergyPrediction
+    from app.services.p3_datasets import dataset_view
+
+    create_db.import_dataset("data/X_test.csv", chunksize=100)
+    with import_engine.begin() as conn:
+        conn.execute(insert(EnergyPrediction.__table__), [{"dataset_id": 2, "prediction": 1.0}])
+        wide = [dict(row) for row in conn.execute(select(dataset_view()).order_by("id")).mappings()]
+
+    assert create_db.compact_dataset(chunksize=100) == 292
+
+    monkeypatch.setattr(config, "DATASET_SCHEMA", "compact")
+    with import_engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(EnergyDataset.__table__)).scalar() == 0
+        assert conn.execute(select(func.count()).select_from(EnergyDatasetCompact.__table__)).scalar() == 292
+        compact = [dict(row) for row in conn.execute(select(dataset_view()).order_by("id")).mappings()]
+        # Each distinct value is stored once
+        outliers = conn.execute(
+            select(func.count()).select_from(CategoryDictionary.__table__).where(CategoryDictionary.field == "outlier")
+        ).scalar()
+    assert compact == wide
+    assert outliers == len({row["outlier"] for row in wide})
@@ -120,3 +120,505 @@ def test_get_prediction_history(client):
     assert "predictions" in data
     assert isinstance(data["predictions"], list)
 
+
+BATCH_PAYLOAD = {
+    "BuildingType": "NonResidential",
+    "PrimaryPropertyType": "Warehouse",
+    "ZipCode": 98108,
+    "CouncilDistrictCode": 2,
+    "Neighborhood": "GREATER DUWAMISH",
+    "Latitude": 47.56056,
+    "Longitude": -122.32593,
+    "YearBuilt": 1975,
+    "NumberofBuildings": 1,
+    "NumberofFloors": 1,
+    "PropertyGFATotal": 28126,
+    "PropertyGFAParking": 0,
+    "PropertyGFABuildings": 28126,
+    "ListOfAllPropertyUseTypes": "Non-Refrigerated Warehouse, Office",
+    "LargestPropertyUseType": "Non-Refrigerated Warehouse",
+    "LargestPropertyUseTypeGFA": 21780,
+    "SecondLargestPropertyUseType": "Office",
+    "SecondLargestPropertyUseTypeGFA": 6346,
+    "ThirdLargestPropertyUseType": None,
+    "ThirdLargestPropertyUseTypeGFA": None,
+    "YearsENERGYSTARCertified": 0,
+    "Outlier": "No",
+    "BuildingAge": 41,
+    "SurfacePerFloor": 28126,
+    "IsMultiUse": True,
+    "LatZone": 1,
+    "LonZone": 2
+}
+
+
+def test_p3_predict_batch(client, test_db):
+    """Batch predictions match single predictions and are all persisted."""
+    other = {**BATCH_PAYLOAD, "PrimaryPropertyType": "Office", "NumberofFloors": 4, "SurfacePerFloor": 7031.5}
+    response = client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD, other, BATCH_PAYLOAD])
+    assert response.status_code == 200
+
+    data = response.json()
+    assert len(data["predictions"]) == 3
+    assert len(set(data["dataset_ids"])) == 3
+    assert data["predictions"][0] == data["predictions"][2]
+
+    single = client.post("/api/p3/predict", json=other).json()
+    assert abs(single["prediction"] - data["predictions"][1]) < 1e-6
+
+    db = test_db()
+    assert db.query(EnergyDataset).count() == 4
+    assert db.query(EnergyPrediction).count() == 4
+    db.close()
+
+
+def test_p3_predict_batch_too_large(client, monkeypatch):
+    from app.core import config
+
+    monkeypatch.setattr(config, "PREDICT_BATCH_MAX_SIZE", 2)
+    response = client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 3)
+    assert response.status_code == 413
+
+    # Counted before validation: invalid items do not turn it into a 422
+    response = client.post("/api/p3/predict/batch", json=[{}] * 3)
+    assert response.status_code == 413
+    response = client.post("/api/p3/predict/batch", json=[{}] * 2)
+    assert response.status_code == 422
+
+
+def test_p3_predict_micro_batching(client, monkeypatch):
+    from app.core import config
+    from app.services.p3_batching import shutdown_batcher
+
+    direct = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+
+    monkeypatch.setattr(config, "PREDICT_MICROBATCH_ENABLED", True)
+    try:
+        batched = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+        stats = client.get("/api/p3/batching/stats").json()
+    finally:
+        shutdown_batcher()
+
+    assert abs(batched["prediction"] - direct["prediction"]) < 1e-6
+    assert stats["enabled"] is True
+    assert stats["items"] == 1
+
+
+def test_p3_predict_async(tmp_path):
+    """The async path predicts like the sync one and persists through the async engine."""
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.core.database import Base, get_async_db
+    from app.services.p3_executor import shutdown_executor
+    from app.services.p3_model import EnergyModel, build_features
+    from app.schemas.p3_request import EnergyRequest
+
+    db_file = tmp_path / "async.db"
+    sync_engine = create_engine(f"sqlite:///{db_file}")
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_file}", poolclass=NullPool)
+    sessions = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        response = TestClient(app).post("/api/p3/predict/async", json=BATCH_PAYLOAD)
+    finally:
+        app.dependency_overrides.clear()
+        shutdown_executor()
+
+    assert response.status_code == 200
+    data = response.json()
+    expected = EnergyModel.predict(build_features([EnergyRequest(**BATCH_PAYLOAD)]))
+    assert abs(data["prediction"] - expected) < 1e-6
+
+    with sync_engine.connect() as conn:
+        rows = conn.execute(select(EnergyPrediction.dataset_id)).all()
+    assert rows == [(data["dataset_id"],)]
+
+
+def test_p3_predict_write_behind(client, test_db, monkeypatch):
+    from app.core import config
+    from app.services import p3_writer
+
+    monkeypatch.setattr(config, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(p3_writer, "_writer", p3_writer.PredictionWriter(test_db))
+
+    single = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+    batch = client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 2).json()
+    p3_writer.shutdown_writer()
+
+    assert [single["dataset_id"], *batch["dataset_ids"]] == [1, 2, 3]
+    db = test_db()
+    assert db.query(EnergyPrediction).count() == 3
+    db.close()
+
+
+def test_p3_predict_cache_reuses_dataset(client, test_db, monkeypatch):
+    from app.core import config
+    from app.services import p3_cache
+
+    monkeypatch.setattr(config, "PREDICT_CACHE_ENABLED", True)
+    monkeypatch.setattr(p3_cache, "_cache", p3_cache.PredictionCache())
+
+    first = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+    second = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+    stats = client.get("/api/p3/cache/stats").json()
+
+    assert second == first
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    db = test_db()
+    assert db.query(EnergyDataset).count() == 1
+    assert db.query(EnergyPrediction).count() == 2
+    db.close()
+
+
+def test_p3_predict_derives_features(client):
+    derived_fields = ("BuildingAge", "SurfacePerFloor", "IsMultiUse", "LatZone", "LonZone")
+    raw = {k: v for k, v in BATCH_PAYLOAD.items() if k not in derived_fields}
+    derived = client.post("/api/p3/predict", json=raw).json()
+    sent = client.post("/api/p3/predict", json={**BATCH_PAYLOAD, "LatZone": 4, "BuildingAge": 0}).json()
+    assert derived["prediction"] == sent["prediction"]
+
+    dataset = client.get(f"/api/p3/dataset/{derived['dataset_id']}").json()
+    assert (dataset["building_age"], dataset["surface_per_floor"], dataset["is_multi_use"]) == (41, 28126, True)
+    assert (dataset["lat_zone"], dataset["lon_zone"]) == (1, 2)
+
+
+def test_compact_dataset_schema(client, test_db, monkeypatch):
+    import json
+
+    from app.core import config
+    from app.models import CategoryDictionary, EnergyDatasetCompact
+
+    wide = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+    expected = client.get(f"/api/p3/dataset/{wide['dataset_id']}").json()
+
+    monkeypatch.setattr(config, "DATASET_SCHEMA", "compact")
+    other = {**BATCH_PAYLOAD, "Neighborhood": "DOWNTOWN"}
+    ids = client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD, other, BATCH_PAYLOAD]).json()["dataset_ids"]
+    assert ids == [1, 2, 3]
+
+    dataset = client.get("/api/p3/dataset/1").json()
+    assert {k: v for k, v in dataset.items() if k != "created_at"} == {
+        k: v for k, v in expected.items() if k != "created_at"
+    }
+    assert client.get("/api/p3/dataset/2").json()["neighborhood"] == "DOWNTOWN"
+    assert client.get("/api/p3/dataset/99").status_code == 404
+
+    rows = [json.loads(line) for line in client.get("/api/p3/export", params={"since_id": 1}).text.splitlines()]
+    assert [row["neighborhood"] for row in rows] == ["GREATER DUWAMISH", "DOWNTOWN", "GREATER DUWAMISH"]
+
+    db = test_db()
+    assert db.query(EnergyDatasetCompact).count() == 3
+    assert db.query(CategoryDictionary).filter_by(field="neighborhood").count() == 2
+    db.close()
+
+
+def test_get_prediction_history_keyset(client):
+    dataset_ids = client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 5).json()["dataset_ids"]
+
+    first = client.get("/api/p3/history", params={"limit": 2}).json()
+    assert first["total"] == 5
+    assert [p["id"] for p in first["predictions"]] == [1, 2]
+    assert first["next_cursor"] == 2
+
+    second = client.get("/api/p3/history", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [p["id"] for p in second["predictions"]] == [3, 4]
+    last = client.get("/api/p3/history", params={"limit": 2, "cursor": second["next_cursor"]}).json()
+    assert [p["id"] for p in last["predictions"]] == [5]
+    assert last["next_cursor"] is None
+
+    # Legacy offset paging still works
+    legacy = client.get("/api/p3/history", params={"skip": 3, "limit": 10}).json()
+    assert [p["id"] for p in legacy["predictions"]] == [4, 5]
+
+    filtered = client.get("/api/p3/history", params={"dataset_id": dataset_ids[2]}).json()
+    assert filtered["total"] == 1
+    assert filtered["predictions"][0]["dataset_id"] == dataset_ids[2]
+
+    future = client.get("/api/p3/history", params={"start": "2999-01-01T00:00:00"}).json()
+    assert future["total"] == 0
+    assert future["predictions"] == []
+
+    assert client.get("/api/p3/history", params={"limit": 0}).status_code == 422
+
+
+def test_export_predictions(client):
+    import csv
+    import io
+    import json
+    from datetime import datetime
+
+    client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 3)
+
+    response = client.get("/api/p3/export", params={"chunk_size": 2})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2, 3]
+    assert rows[0]["neighborhood"] == "GREATER DUWAMISH"
+    assert rows[0]["dataset_id"] == 1
+    assert datetime.fromisoformat(rows[0]["created_at"])
+
+    incremental = client.get("/api/p3/export", params={"format": "csv", "since_id": 1})
+    records = list(csv.DictReader(io.StringIO(incremental.text)))
+    assert [r["id"] for r in records] == ["2", "3"]
+    assert records[0]["zip_code"] == "98108"
+
+    assert client.get("/api/p3/export", params={"format": "xml"}).status_code == 400
+    assert client.get("/api/p3/export", params={"chunk_size": 0}).status_code == 422
+    assert client.get("/api/p3/export", params={"chunk_size": 10**9}).status_code == 422
+
+
+def test_export_predictions_parquet(client):
+    pytest.importorskip("pyarrow")
+    import io
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 3)
+
+    parquet = client.get("/api/p3/export", params={"format": "parquet", "chunk_size": 2})
+    table = pyarrow.parquet.read_table(io.BytesIO(parquet.content))
+    assert table.column("id").to_pylist() == [1, 2, 3]
+
+    arrow = client.get("/api/p3/export", params={"format": "arrow"})
+    table = pyarrow.ipc.open_stream(arrow.content).read_all()
+    assert table.column("lat_zone").to_pylist() == [1, 1, 1]
+
+
+def test_prediction_stage_metrics(client):
+    from app.core.metrics import PREDICTIONS, STAGE_SECONDS
+
+    served = PREDICTIONS.value(endpoint="predict_batch")
+    inference = STAGE_SECONDS.count(stage="inference")
+
+    assert client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 2).status_code == 200
+
+    assert PREDICTIONS.value(endpoint="predict_batch") == served + 2
+    assert STAGE_SECONDS.count(stage="inference") == inference + 1
+    text = client.get("/metrics").text
+    for name in ("request_parse", "inference", "db_flush", "db_commit"):
+        assert f'prediction_stage_duration_seconds_count{{stage="{name}"}}' in text
+
+
+def test_admin_model_swap_records_version(client, tmp_path, monkeypatch):
+    from app.core import config
+    from app.services.p3_model import MODEL_PATH, EnergyModel
+    from app.services.p3_registry import ModelRegistry
+
+    monkeypatch.setattr(EnergyModel, "_active", EnergyModel.current())
+    monkeypatch.setattr(EnergyModel, "_reload", EnergyModel.reload_status())
+    monkeypatch.setattr(config, "MODEL_REGISTRY_DIR", str(tmp_path / "registry"))
+    ModelRegistry().register(MODEL_PATH, version="v3")
+
+    assert client.get("/api/p3/admin/models").status_code == 403
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/p3/admin/models", headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+    headers = {"X-Admin-Token": "secret"}
+    assert client.post("/api/p3/admin/models/unknown/activate", headers=headers).status_code == 404
+    response = client.post("/api/p3/admin/models/v3/activate", headers=headers)
+    assert response.status_code == 202
+
+    # The test client runs background tasks before returning
+    models = client.get("/api/p3/admin/models", headers=headers).json()
+    assert models["serving"] == "v3"
+    assert models["active"] == "v3"
+    assert models["reload"]["state"] == "done"
+
+    data = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+    assert data["model_version"] == "v3"
+    history = client.get("/api/p3/history").json()
+    assert history["predictions"][0]["model_version"] == "v3"
+
+
+def test_shadow_and_ab_split(client, test_db, tmp_path, monkeypatch):
+    from app.core import config
+    from app.models import ShadowPrediction
+    from app.services import p3_experiments
+    from app.services.p3_model import MODEL_PATH, EnergyModel
+    from app.services.p3_registry import ModelRegistry
+
+    monkeypatch.setattr(EnergyModel, "_versions", {})
+    monkeypatch.setattr(config, "MODEL_REGISTRY_DIR", str(tmp_path / "registry"))
+    ModelRegistry().register(MODEL_PATH, version="candidate")
+
+    monkeypatch.setattr(config, "SHADOW_MODEL_VERSIONS", ["candidate"])
+    monkeypatch.setattr(p3_experiments, "_shadow", p3_experiments.ShadowScorer(["candidate"], session_factory=test_db))
+    single = client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+    client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 2)
+    assert client.get("/api/p3/experiments/stats").json()["shadow"]["enabled"] is True
+    p3_experiments.shutdown_shadow()
+
+    db = test_db()
+    rows = db.query(ShadowPrediction).order_by(ShadowPrediction.dataset_id).all()
+    assert [r.dataset_id for r in rows] == [1, 2, 3]
+    assert rows[0].model_version == "candidate"
+    assert rows[0].primary_version == single["model_version"]
+    assert rows[0].prediction == pytest.approx(single["prediction"])
+    db.close()
+
+    monkeypatch.setattr(config, "SHADOW_MODEL_VERSIONS", [])
+    monkeypatch.setattr(config, "AB_SPLIT", "candidate:100")
+    data = client.post("/api/p3/predict", json=BATCH_PAYLOAD, headers={"X-Client-Id": "42"}).json()
+    assert data["model_version"] == "candidate"
+    assert client.get("/api/p3/experiments/stats").json()["ab_split"] == {"candidate": 1.0}
+
+
+def test_nearby_datasets(client, test_db, monkeypatch):
+    from app.services import p3_spatial
+
+    monkeypatch.setattr(p3_spatial, "_index", None)
+    far = {**BATCH_PAYLOAD, "Latitude": 47.70, "Longitude": -122.30}
+    near = {**BATCH_PAYLOAD, "Latitude": 47.6101, "Longitude": -122.3301}
+    first = client.post("/api/p3/predict/batch", json=[far, near]).json()
+
+    # First query loads the index from the database
+    response = client.get("/api/p3/dataset/nearby", params={"lat": 47.61, "lon": -122.33, "k": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert [r["id"] for r in data["results"]] == first["dataset_ids"][::-1]
+    assert data["results"][0]["distance_m"] < 20
+    assert data["results"][0]["prediction"] == first["predictions"][1]
+
+    # Only the latest prediction of a building is returned
+    db = test_db()
+    db.add(EnergyPrediction(dataset_id=first["dataset_ids"][1], prediction=1.0, model_version="v2"))
+    db.commit()
+    db.close()
+    data = client.get("/api/p3/dataset/nearby", params={"lat": 47.61, "lon": -122.33, "k": 5}).json()
+    assert (data["results"][0]["prediction"], data["results"][0]["model_version"]) == (1.0, "v2")
+
+    # Later inserts are added incrementally
+    closest = client.post("/api/p3/predict", json={**BATCH_PAYLOAD, "Latitude": 47.61, "Longitude": -122.33}).json()
+    data = client.get("/api/p3/dataset/nearby", params={"lat": 47.61, "lon": -122.33, "radius": 1000}).json()
+    assert [r["id"] for r in data["results"]] == [closest["dataset_id"], first["dataset_ids"][1]]
+    assert data["results"][0]["distance_m"] == 0
+
+    assert client.get("/api/p3/dataset/nearby", params={"lat": 91, "lon": 0}).status_code == 422
+    assert client.get("/api/p3/dataset/nearby", params={"lat": 0, "lon": 0, "k": 10**6}).status_code == 400
+
+
+def test_aggregates_updated_on_write(client, test_db, monkeypatch):
+    from app.core import config
+    from app.services import p3_writer
+
+    other = {**BATCH_PAYLOAD, "ZipCode": 98104}
+    y = client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD, other, BATCH_PAYLOAD]).json()["predictions"]
+    monkeypatch.setattr(config, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(p3_writer, "_writer", p3_writer.PredictionWriter(test_db))
+    y.append(client.post("/api/p3/predict", json=other).json()["prediction"])
+    p3_writer.shutdown_writer()
+
+    response = client.get("/api/p3/aggregates", params={"group_by": "zip_code", "quantiles": "0.5"})
+    assert response.status_code == 200
+    groups = {g["key"]: g for g in response.json()["groups"]}
+    assert groups["98104"]["count"] == 2
+    assert groups["98104"]["sum"] == pytest.approx(y[1] + y[3])
+    assert groups[str(BATCH_PAYLOAD["ZipCode"])]["quantiles"]["p50"] == pytest.approx(y[0], rel=0.02)
+
+    (day,) = client.get("/api/p3/aggregates", params={"group_by": "day"}).json()["groups"]
+    assert day["count"] == 4
+    assert client.get("/api/p3/aggregates", params={"group_by": "year_built"}).status_code == 400
+    assert client.get("/api/p3/aggregates", params={"quantiles": "1.5"}).status_code == 400
+
+
+def test_predict_explain(client):
+    assert "explanation" not in client.post("/api/p3/predict", json=BATCH_PAYLOAD).json()
+
+    data = client.post("/api/p3/predict", params={"explain": "true"}, json=BATCH_PAYLOAD).json()
+    explanation = data["explanation"]
+    assert explanation["bias"] + sum(explanation["contributions"].values()) == pytest.approx(data["prediction"])
+
+    other = {**BATCH_PAYLOAD, "PropertyGFATotal": 250000}
+    data = client.post("/api/p3/predict/batch?explain=true", json=[BATCH_PAYLOAD, other]).json()
+    assert data["explanations"][0] == explanation
+    assert len(data["explanations"]) == 2
+    for y, e in zip(data["predictions"], data["explanations"]):
+        assert e["bias"] + sum(e["contributions"].values()) == pytest.approx(y)
+
+
+def test_predict_explain_unsupported_model_stores_nothing(client, test_db, monkeypatch):
+    from app import main
+    from app.services.p3_compiled import UnsupportedModel
+
+    def unsupported(loaded):
+        raise UnsupportedModel("no explainer")
+
+    monkeypatch.setattr(main, "get_explainer", unsupported)
+    assert client.post("/api/p3/predict?explain=true", json=BATCH_PAYLOAD).status_code == 501
+    assert client.post("/api/p3/predict/batch?explain=true", json=[BATCH_PAYLOAD]).status_code == 501
+    db = test_db()
+    assert db.query(EnergyPrediction).count() == 0
+    db.close()
+
+
+def test_drift_endpoint(client, monkeypatch):
+    from app.core import config
+    from app.services import p3_drift
+
+    monkeypatch.setattr(config, "DRIFT_CHECK_SECONDS", 0)
+    p3_drift.shutdown_drift_monitor()
+    try:
+        before = client.get("/api/p3/drift").json()
+        assert before["enabled"] and before["rows_seen"] == 0
+        assert before["features"]["Neighborhood"]["psi"] is None
+
+        client.post("/api/p3/predict/batch", json=[BATCH_PAYLOAD] * 3)
+        client.post("/api/p3/predict", json={**BATCH_PAYLOAD, "Neighborhood": "UNKNOWN"})
+        data = client.get("/api/p3/drift").json()
+        assert data["rows_seen"] == 4
+        assert data["features"]["Neighborhood"]["top_unseen"] == [{"value": "UNKNOWN", "count": 1.0}]
+        assert "Neighborhood" in data["drifted"]
+        assert 'drift_psi{feature="prediction"}' in client.get("/metrics").text
+
+        p3_drift.shutdown_drift_monitor()
+        monkeypatch.setattr(config, "DRIFT_REFERENCE_PATH", "missing.json")
+        data = client.get("/api/p3/drift").json()
+        assert not data["enabled"] and "missing.json" in data["error"]
+    finally:
+        p3_drift.shutdown_drift_monitor()
+
+
+def test_admission_control(client, monkeypatch):
+    from app.core import admission, config
+    from app.core.metrics import ADMISSION_SHED
+
+    monkeypatch.setattr(config, "RATE_LIMIT_PER_SECOND", 0.01)
+    monkeypatch.setattr(config, "RATE_LIMIT_BURST", 2)
+    monkeypatch.setattr(config, "ADMISSION_MAX_QUEUE", 0)
+    admission.shutdown_admission()
+    try:
+        # Keyed on the client address: rotating X-Client-Id does not help
+        statuses = [
+            client.get("/api/p3/history", headers={"X-Client-Id": str(i)}).status_code for i in range(3)
+        ]
+        assert statuses == [200, 200, 429]
+
+        monkeypatch.setattr(config, "RATE_LIMIT_TRUST_CLIENT_ID", True)
+        headers = {"X-Client-Id": "client-a"}
+        statuses = [client.post("/api/p3/predict", json=BATCH_PAYLOAD, headers=headers).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = client.get("/api/p3/history", headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+        assert client.get("/api/p3/history", headers={"X-Client-Id": "client-b"}).status_code == 200
+
+        # Every slot taken: shed at once, while health and metrics still answer
+        limiter = admission.get_admission().limiter
+        limiter.in_flight = limiter.limit
+        shed = ADMISSION_SHED.value(reason="queue_full")
+        response = client.post("/api/p3/predict", json=BATCH_PAYLOAD, headers={"X-Client-Id": "client-c"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert ADMISSION_SHED.value(reason="queue_full") == shed + 1
+        assert client.get("/health/live").status_code == 200
+        assert 'admission_shed_total{reason="rate_limited"}' in client.get("/metrics").text
+    finally:
+        admission.shutdown_admission()
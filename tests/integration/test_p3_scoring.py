@@ -0,0 +1,70 @@
+"""Integration tests for the offline bulk scorer."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+from app.services.p3_model import EnergyModel
+from app.services.p3_scoring import score_file
+
+
+@pytest.fixture
+def x_test():
+    if not Path("data/X_test.csv").exists():
+        pytest.skip("Test data not found at data/X_test.csv")
+    return pd.read_csv("data/X_test.csv")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_score_file_csv(x_test, tmp_path, workers):
+    output = tmp_path / "scored.csv"
+    result = score_file("data/X_test.csv", output, chunksize=50, workers=workers)
+
+    assert result["rows"] == len(x_test)
+    scored = pd.read_csv(output)
+    assert list(scored.columns) == [*x_test.columns, "prediction"]
+    np.testing.assert_allclose(scored["prediction"], EnergyModel.predict_batch(x_test))
+
+
+def test_score_file_parquet(x_test, tmp_path):
+    pytest.importorskip("pyarrow")
+    output = tmp_path / "scored.parquet"
+    score_file("data/X_test.csv", output, chunksize=100)
+
+    scored = pd.read_parquet(output)
+    assert len(scored) == len(x_test)
+    # Integer fields of the request schema keep their type, the others are float64
+    assert (scored[["YearBuilt", "NumberofFloors", "LatZone"]].dtypes == "int64").all()
+    assert scored["PropertyGFATotal"].dtype == "float64"
+    np.testing.assert_allclose(scored["prediction"], EnergyModel.predict_batch(x_test))
+
+
+def test_score_file_parquet_schema_across_chunks(x_test, tmp_path):
+    pytest.importorskip("pyarrow")
+    df = x_test.head(6).copy()
+    # Whole numbers then a fraction, and a field only filled after the first chunk
+    df["PropertyGFATotal"] = df["PropertyGFATotal"].astype(object)
+    df.loc[4, "PropertyGFATotal"] = 37600.5
+    df["ThirdLargestPropertyUseTypeGFA"] = [None, None, None, 100.0, None, 250.0]
+    df["ThirdLargestPropertyUseType"] = [None, None, None, "Office", None, "Retail"]
+    source = tmp_path / "buildings.csv"
+    df.to_csv(source, index=False)
+
+    output = tmp_path / "scored.parquet"
+    score_file(source, output, chunksize=3)
+    scored = pd.read_parquet(output)
+    assert scored["PropertyGFATotal"].tolist()[4] == 37600.5
+    assert scored["ThirdLargestPropertyUseTypeGFA"].dtype == "float64"
+    assert scored["ThirdLargestPropertyUseTypeGFA"].tolist()[3] == 100.0
+    assert scored["ThirdLargestPropertyUseType"].tolist()[5] == "Retail"
+    assert scored["YearBuilt"].dtype == "int64"
+
+    # A fraction in an integer field fails the run without leaving a partial file
+    df["YearBuilt"] = df["YearBuilt"].astype(object)
+    df.loc[4, "YearBuilt"] = 1961.5
+    df.to_csv(source, index=False)
+    output = tmp_path / "invalid.parquet"
+    with pytest.raises(ValueError, match="YearBuilt"):
+        score_file(source, output, chunksize=3)
+    assert list(tmp_path.glob("invalid.parquet*")) == []
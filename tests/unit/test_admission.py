@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.core import config
+from app.core.admission import ConcurrencyLimiter, Shed, TokenBuckets, _client
+
+
+def test_token_buckets():
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("a", now=0.0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a", now=0.0) == pytest.approx(0.5)
+    # Other clients have their own bucket
+    assert buckets.take("b", now=0.0) == 0
+    # Refilled at 2 tokens per second
+    assert buckets.take("a", now=0.5) == 0
+    assert buckets.take("a", now=0.5) == pytest.approx(0.5)
+
+    small = TokenBuckets(rate=1, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        small.take(client, now=0.0)
+    assert list(small._buckets) == ["b", "c"]
+
+
+def test_concurrency_limiter():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=1, max_queue=1)
+        assert await limiter.acquire(timeout=1) == 0
+        with pytest.raises(Shed) as shed:
+            await limiter.acquire(timeout=0.01)
+        assert (shed.value.status, shed.value.reason) == (503, "queue_timeout")
+
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0.02)
+        assert limiter.queued == 1
+        with pytest.raises(Shed) as shed:
+            await limiter.acquire(timeout=1)
+        assert shed.value.reason == "queue_full"
+
+        # The slot is handed over to the waiter
+        limiter.release()
+        assert await waiting >= 0.02
+        assert (limiter.in_flight, limiter.queued) == (1, 0)
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_client_key(monkeypatch):
+    scope = {"headers": [(b"x-client-id", b"abc")], "client": ("10.0.0.1", 5000)}
+    assert _client(scope) == "10.0.0.1"
+    monkeypatch.setattr(config, "RATE_LIMIT_TRUST_CLIENT_ID", True)
+    assert _client(scope) == "abc"
+    assert _client({"headers": [], "client": None}) == "unknown"
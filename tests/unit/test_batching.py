@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.p3_batching import _STOP, MicroBatcher
+
+
+def test_micro_batcher_merges_concurrent_requests():
+    calls = []
+
+    def predict_fn(items):
+        calls.append(len(items))
+        return np.asarray(items, dtype=float) * 2
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=16, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.predict([i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = batcher.stats()
+    batcher.close()
+
+    assert {i: float(r[0]) for i, r in results.items()} == {i: 2.0 * i for i in range(12)}
+    assert sum(calls) == 12
+    assert len(calls) < 12
+    assert stats["items"] == 12
+    assert stats["batches"] == len(calls)
+    assert stats["largest_batch_size"] <= 16
+    assert stats["queue_depth"] == 0
+
+
+def test_micro_batcher_propagates_errors():
+    def predict_fn(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(predict_fn, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.predict([1])
+    batcher.close()
+
+
+def test_micro_batcher_close_fails_requests_queued_behind_stop():
+    started, release = threading.Event(), threading.Event()
+
+    def predict_fn(items):
+        started.set()
+        release.wait(5)
+        return np.asarray(items, dtype=float)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=1, max_wait_ms=1)
+    first = batcher.submit([1])
+    assert started.wait(5)
+    # A stop marker ahead of live requests, as when it is dequeued mid-gather
+    batcher._queue.put(_STOP)
+    stranded = [batcher.submit([i]) for i in range(2, 5)]
+    release.set()
+    batcher.close()
+
+    assert float(first.result(1)[0]) == 1.0
+    for future in stranded:
+        with pytest.raises(RuntimeError):
+            future.result(1)
+    with pytest.raises(RuntimeError):
+        batcher.predict([5], timeout=1)
+
+
+def test_micro_batcher_predict_times_out():
+    release = threading.Event()
+
+    def predict_fn(items):
+        release.wait(5)
+        return np.asarray(items, dtype=float)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=1, max_wait_ms=1, timeout=0.05)
+    blocking = batcher.submit([1])
+    with pytest.raises(TimeoutError):
+        batcher.predict([2])
+    release.set()
+    assert float(blocking.result(5)[0]) == 1.0
+    batcher.close()
+    assert batcher.stats()["items"] == 1
@@ -0,0 +1,43 @@
+import time
+
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_cache import PredictionCache, SQLiteCacheBackend, cache_key
+
+PAYLOAD = EnergyRequest.example().model_dump()
+
+
+def test_cache_key_is_canonical():
+    a = EnergyRequest(**PAYLOAD)
+    b = EnergyRequest(**{**PAYLOAD, "Neighborhood": " MAGNOLIA / QUEEN ANNE ", "ZipCode": "98119"})
+    c = EnergyRequest(**{**PAYLOAD, "NumberofFloors": 3})
+
+    # The payload itself is normalized, so the model scores what the key hashes
+    assert b.Neighborhood == a.Neighborhood
+    assert cache_key(a, "v1") == cache_key(b, "v1")
+    assert cache_key(a, "v1") != cache_key(c, "v1")
+    assert cache_key(a, "v1") != cache_key(a, "v2")
+
+
+def test_cache_lru_and_ttl():
+    cache = PredictionCache(max_entries=2, ttl=0.05)
+    cache.set("a", 1.0, 10)
+    cache.set("b", 2.0)
+    assert cache.get("a") == (1.0, 10)
+    cache.set("c", 3.0)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("c").prediction == 3.0
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1)
+
+
+def test_cache_shared_backend(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = PredictionCache(shared=SQLiteCacheBackend(path, 100, 60))
+    reader = PredictionCache(shared=SQLiteCacheBackend(path, 100, 60))
+
+    writer.set("k", 42.0, 7)
+    assert reader.get("k") == (42.0, 7)
+    assert reader.stats()["size"] == 1
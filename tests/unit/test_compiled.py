@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer, TransformedTargetRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, PolynomialFeatures, StandardScaler
+
+from app.services.p3_compiled import CompiledModel, UnsupportedModel, verify
+from app.services.p3_model import EnergyModel, build_features, verification_payloads
+
+ROWS = [
+    {"kind": "office", "floors": 3.0, "area": 1000.0},
+    {"kind": "school", "floors": None, "area": 2500.0},
+    {"kind": None, "floors": 10.0, "area": 800.0},
+    {"kind": "office", "floors": 1.0, "area": None},
+]
+
+
+def _fit(numeric, wrap_target=False):
+    df = pd.DataFrame(ROWS)
+    preprocessor = ColumnTransformer([
+        ("cat", Pipeline([
+            ("imp", SimpleImputer(strategy="constant", fill_value="missing")),
+            ("oh", OneHotEncoder(handle_unknown="ignore")),
+        ]), ["kind"]),
+        ("num", numeric, ["floors", "area"]),
+    ])
+    model = Pipeline([("preprocessor", preprocessor), ("model", LinearRegression())])
+    if wrap_target:
+        model = TransformedTargetRegressor(regressor=model, func=np.log1p, inverse_func=np.expm1)
+    return model.fit(df, np.array([10.0, 20.0, 15.0, 5.0]))
+
+
+def _payloads(rows):
+    return [SimpleNamespace(**row) for row in rows]
+
+
+@pytest.mark.parametrize("wrap_target", [False, True])
+def test_compiled_matches_pipeline(wrap_target):
+    numeric = Pipeline([("imp", SimpleImputer(strategy="median")), ("sc", StandardScaler())])
+    model = _fit(numeric, wrap_target)
+    rows = ROWS + [{"kind": "unseen", "floors": 4.0, "area": 1200.0}]
+
+    compiled = CompiledModel.compile(model)
+
+    expected = model.predict(pd.DataFrame(rows))
+    np.testing.assert_allclose(compiled.predict(_payloads(rows)), expected, rtol=1e-9)
+
+
+def test_compiled_min_max_scaler():
+    model = _fit(Pipeline([("imp", SimpleImputer(strategy="mean")), ("sc", MinMaxScaler())]))
+    compiled = CompiledModel.compile(model)
+    np.testing.assert_allclose(compiled.predict(_payloads(ROWS)), model.predict(pd.DataFrame(ROWS)), rtol=1e-9)
+
+
+def test_unsupported_step_raises():
+    model = _fit(Pipeline([("imp", SimpleImputer()), ("poly", PolynomialFeatures())]))
+    with pytest.raises(UnsupportedModel):
+        CompiledModel.compile(model)
+
+
+def test_verify_rejects_mismatch():
+    model = _fit(SimpleImputer())
+    compiled = CompiledModel.compile(model)
+    with pytest.raises(UnsupportedModel):
+        verify(compiled, lambda payloads: np.zeros(len(payloads)) + 1e6, _payloads(ROWS))
+
+
+def test_energy_model_compiled_path():
+    EnergyModel.load()
+    assert EnergyModel.status()["compiled"] is True
+    payloads = verification_payloads()
+    expected = EnergyModel.predict_batch(build_features(payloads))
+    np.testing.assert_allclose(EnergyModel.predict_payloads(payloads), expected, rtol=1e-6)
@@ -0,0 +1,59 @@
+import threading
+
+from sqlalchemy import text
+
+from app.core import config
+from app.core.database import build_engine, engine_options, pool_stats
+
+
+def test_sqlite_file_uses_wal_and_a_connection_per_thread(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == int(config.SQLITE_BUSY_TIMEOUT * 1000)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    def write(i):
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (:x)"), {"x": i})
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 8
+
+    stats = pool_stats(engine)
+    assert stats["pool"] == "QueuePool"
+    assert stats["checked_out"] == 0
+    assert stats["connects"] >= 1
+    assert stats["checkouts"] >= 10
+    engine.dispose()
+
+
+def test_memory_sqlite_keeps_a_single_connection():
+    stats = pool_stats(build_engine("sqlite:///:memory:"))
+    assert stats["pool"] == "StaticPool"
+    assert stats["size"] is None
+
+
+def test_postgres_pool_options(monkeypatch):
+    monkeypatch.setattr(config, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(config, "DB_POOL_RECYCLE", 600)
+    monkeypatch.setattr(config, "DB_PREPARE_THRESHOLD", "none")
+    options = engine_options("postgresql+psycopg://u:p@db/app")
+    assert options["pool_size"] == 20
+    assert options["pool_recycle"] == 600
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"prepare_threshold": None}
+
+    monkeypatch.setattr(config, "DB_PREPARE_THRESHOLD", "0")
+    assert engine_options("postgresql+psycopg://u:p@db/app")["connect_args"] == {"prepare_threshold": 0}
+
+    monkeypatch.setattr(config, "DB_PREPARE_THRESHOLD", "")
+    assert "connect_args" not in engine_options("postgresql+psycopg://u:p@db/app")
@@ -0,0 +1,109 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import config
+from app.services.p3_drift import (
+    CATEGORICAL,
+    MAX_PENDING,
+    NUMERIC,
+    DriftChecker,
+    DriftMonitor,
+    TopK,
+    build_reference,
+    psi,
+)
+from app.services.p3_features import derive_frame
+from app.services.p3_model import EnergyModel
+
+X_TEST = "data/X_test.csv"
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return build_reference(X_TEST, bins=10)
+
+
+def _payloads():
+    df = derive_frame(pd.read_csv(X_TEST)).rename(columns={"PropertyGFABuilding(s)": "PropertyGFABuildings"})
+    df = df.astype(object).where(df.notna(), None)
+    return [SimpleNamespace(**row) for row in df[NUMERIC + CATEGORICAL].to_dict("records")]
+
+
+def test_reference_traffic_does_not_drift(reference):
+    assert reference["rows"] == 292
+    assert set(reference["numeric"]) == {*NUMERIC, "prediction"}
+    monitor = DriftMonitor(reference)
+    payloads = _payloads()
+    predictions = EnergyModel.predict_batch(derive_frame(pd.read_csv(X_TEST)))
+    for i in range(0, len(payloads), 50):
+        monitor.record(payloads[i:i + 50], predictions[i:i + 50], reference["model_version"])
+
+    report = monitor.check()
+    assert report["rows_seen"] == report["effective_rows"] == 292
+    assert report["drifted"] == []
+    assert all(f["psi"] < 0.01 for f in report["features"].values())
+    assert report["features"]["prediction"]["ks"] < 0.02
+
+
+def test_shifted_traffic_drifts(reference, monkeypatch):
+    monkeypatch.setattr(config, "DRIFT_PSI_THRESHOLD", 0.2)
+    monitor = DriftMonitor(reference, half_life=60)
+    payloads = _payloads()
+    for p in payloads:
+        p.PropertyGFATotal *= 4
+        p.Neighborhood = "NEW AREA" if p.Neighborhood == "DOWNTOWN" else p.Neighborhood
+    monitor.record(payloads, np.full(len(payloads), 1e5), reference["model_version"])
+
+    report = monitor.check()
+    assert {"PropertyGFATotal", "prediction"} <= set(report["drifted"])
+    assert "Latitude" not in report["drifted"]
+    assert report["features"]["PropertyGFATotal"]["ks"] > 0.5
+    neighborhood = report["features"]["Neighborhood"]
+    assert neighborhood["top_unseen"][0]["value"] == "NEW AREA"
+    assert neighborhood["unseen_share"] == pytest.approx(neighborhood["top_unseen"][0]["count"] / len(payloads))
+
+    # One half-life later the counts are halved
+    monitor._folded_at -= 60
+    assert monitor.check()["effective_rows"] == pytest.approx(len(payloads) / 2, rel=1e-3)
+
+
+def test_predictions_of_other_versions_not_compared(reference):
+    monitor = DriftMonitor(reference)
+    payloads = _payloads()
+    monitor.record(payloads, np.full(len(payloads), 1e5), "other-version")
+
+    report = monitor.check()
+    assert report["effective_rows"] == len(payloads)
+    assert report["features"]["prediction"]["psi"] is None
+    assert report["features"]["PropertyGFATotal"]["psi"] < 0.01
+    assert "prediction" not in report["drifted"]
+
+
+def test_full_queue_folded_in_background(reference):
+    monitor = DriftMonitor(reference)
+    checker = DriftChecker(monitor, interval=3600)
+    payloads = _payloads()
+    try:
+        while monitor.rows_seen == 0 and monitor._pending_rows < MAX_PENDING:
+            monitor.record(payloads, np.ones(len(payloads)), reference["model_version"])
+        deadline = time.monotonic() + 5
+        while monitor.rows_seen == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert monitor.rows_seen >= MAX_PENDING
+    finally:
+        checker.close()
+    assert not monitor.background
+
+
+def test_top_k_and_psi():
+    sketch = TopK(k=2)
+    for value in ["a", "a", "a", "b", "c", "a"]:
+        sketch.add(value)
+    assert sketch.top()[0] == ("a", 4.0)
+    assert len(sketch.top()) == 2
+    assert psi([0.5, 0.5], [0.5, 0.5]) == 0
+    assert psi([0.5, 0.5], [0.9, 0.1]) == pytest.approx(0.4 * np.log(1.8) - 0.4 * np.log(0.2))
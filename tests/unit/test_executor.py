@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from app.core.database import to_async_url
+from app.services.p3_executor import InferenceExecutor
+
+
+def test_to_async_url():
+    assert to_async_url("sqlite:////tmp/predictions.db") == "sqlite+aiosqlite:////tmp/predictions.db"
+    assert to_async_url("postgresql://u:p@localhost:5432/db") == "postgresql+psycopg://u:p@localhost:5432/db"
+
+
+def test_inference_executor_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        InferenceExecutor("gpu", 1)
+
+
+def test_process_executor_follows_hot_swap(tmp_path, monkeypatch):
+    from app.core import config
+    from app.schemas.p3_request import EnergyRequest
+    from app.services.p3_model import MODEL_PATH, EnergyModel
+    from app.services.p3_registry import ModelRegistry
+
+    monkeypatch.setattr(config, "MODEL_REGISTRY_DIR", str(tmp_path / "registry"))
+    monkeypatch.setattr(EnergyModel, "_active", EnergyModel.current())
+    monkeypatch.setattr(EnergyModel, "_reload", EnergyModel.reload_status())
+    registry = ModelRegistry()
+    registry.register(MODEL_PATH, version="v8")
+    registry.register(MODEL_PATH, version="v9")
+    EnergyModel.activate("v8")
+
+    executor = InferenceExecutor("process", 1)
+    payloads = [EnergyRequest.example()]
+    try:
+        assert asyncio.run(executor.predict(payloads)).model_version == "v8"
+        EnergyModel.activate("v9")
+        assert asyncio.run(executor.predict(payloads)).model_version == "v9"
+    finally:
+        executor.shutdown()
@@ -0,0 +1,89 @@
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.models import ShadowPrediction
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_experiments import ShadowScorer, TrafficSplit, parse_split, report
+from app.services.p3_storage import save_predictions
+
+PAYLOAD = EnergyRequest.example()
+
+
+def _constant_model(value):
+    return SimpleNamespace(predict_payloads=lambda payloads: np.full(len(payloads), value))
+
+
+def test_parse_split():
+    assert parse_split("v1:90, v2:10") == {"v1": 0.9, "v2": 0.1}
+    with pytest.raises(ValueError):
+        parse_split("v1")
+    with pytest.raises(ValueError):
+        parse_split("v1:0")
+
+
+def test_traffic_split_is_weighted_and_sticky():
+    split = TrafficSplit({"a": 0.8, "b": 0.2})
+    counts = Counter(split.choose() for _ in range(5000))
+    assert 0.75 < counts["a"] / 5000 < 0.85
+    assert len({split.choose("client-42") for _ in range(20)}) == 1
+
+
+def test_shadow_scorer_stores_candidate_outputs(test_db):
+    models = {"cand-1": _constant_model(10.0), "cand-2": _constant_model(20.0)}
+    scorer = ShadowScorer(["cand-1", "cand-2"], session_factory=test_db, model_loader=models.__getitem__)
+
+    assert scorer.submit([PAYLOAD, PAYLOAD], [1, 2], [5.0, 6.0], primary_version="cand-2")
+    scorer.close()
+
+    db = test_db()
+    rows = db.query(ShadowPrediction).order_by(ShadowPrediction.dataset_id).all()
+    # The candidate equal to the serving version is not scored twice
+    assert [(r.dataset_id, r.model_version, r.prediction, r.primary_prediction) for r in rows] == [
+        (1, "cand-1", 10.0, 5.0), (2, "cand-1", 10.0, 6.0)
+    ]
+    db.close()
+    assert scorer.stats()["rows_scored"] == 2
+
+
+def test_shadow_scorer_drops_when_full(test_db):
+    release = threading.Event()
+
+    def slow_loader(version):
+        release.wait()
+        return _constant_model(1.0)
+
+    scorer = ShadowScorer(["cand"], max_queue=1, session_factory=test_db, model_loader=slow_loader)
+    scorer.submit([PAYLOAD], [1], [1.0], None)  # picked up by the (blocked) worker
+    for _ in range(50):
+        if scorer.stats()["queue_depth"] == 0:
+            break
+        threading.Event().wait(0.01)
+    assert scorer.submit([PAYLOAD], [2], [1.0], None)  # fills the queue
+    assert not scorer.submit([PAYLOAD], [3], [1.0], None)
+    release.set()
+    scorer.close()
+    assert scorer.stats()["rows_dropped"] == 1
+
+
+def test_report_against_ground_truth(test_db, tmp_path):
+    db = test_db()
+    save_predictions(db, [PAYLOAD, PAYLOAD], [90.0, 210.0], model_version="v1")
+    db.add_all([
+        ShadowPrediction(dataset_id=1, model_version="v2", prediction=100.0),
+        ShadowPrediction(dataset_id=2, model_version="v2", prediction=200.0),
+    ])
+    db.commit()
+    db.close()
+    truth = tmp_path / "y.csv"
+    truth.write_text("SiteEnergyUse(kBtu)\n100\n200\n")
+
+    rows = {row["model_version"]: row for row in report(truth, session_factory=test_db)}
+
+    assert rows["v2"]["source"] == "shadow"
+    assert rows["v2"]["mae"] == 0.0
+    assert rows["v1"]["mae"] == 10.0
+    assert rows["v1"]["n"] == 2
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer, TransformedTargetRegressor
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from app.services.p3_compiled import UnsupportedModel
+from app.services.p3_explain import ExplanationCache, Explainer, explain, get_explanation_cache
+from app.services.p3_model import EnergyModel, verification_payloads
+
+
+def _fit(estimator, n=200):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "kind": rng.choice(["office", "school", None], n),
+        "floors": rng.integers(1, 20, n).astype(float),
+        "area": rng.uniform(500, 5000, n),
+    })
+    y = df["area"] * 2 + df["floors"] * 100 + (df["kind"] == "office") * 1000
+    preprocessor = ColumnTransformer([
+        ("cat", Pipeline([
+            ("imp", SimpleImputer(strategy="constant", fill_value="missing")),
+            ("oh", OneHotEncoder(handle_unknown="ignore")),
+        ]), ["kind"]),
+        ("num", StandardScaler(), ["floors", "area"]),
+    ])
+    return Pipeline([("preprocessor", preprocessor), ("model", estimator)]).fit(df, y), df
+
+
+@pytest.mark.parametrize("estimator", [RandomForestRegressor(n_estimators=5, random_state=0), Ridge()])
+def test_contributions_add_up_to_prediction(estimator):
+    model, df = _fit(estimator)
+    explainer = Explainer.build(model)
+    assert explainer.fields == ["kind", "floors", "area"]
+
+    explanations = explainer.explanations(model.steps[0][1].transform(df))
+    totals = [e["bias"] + sum(e["contributions"].values()) for e in explanations]
+    np.testing.assert_allclose(totals, model.predict(df), rtol=1e-9)
+    # area drives the target far more than floors
+    mean_abs = {f: np.mean([abs(e["contributions"][f]) for e in explanations]) for f in explainer.fields}
+    assert mean_abs["area"] > mean_abs["floors"]
+
+
+def test_unsupported_models():
+    with pytest.raises(UnsupportedModel):
+        Explainer.build(_fit(GradientBoostingRegressor(n_estimators=5))[0])
+    model, _ = _fit(Ridge())
+    with pytest.raises(UnsupportedModel):
+        Explainer.build(TransformedTargetRegressor(regressor=model))
+
+
+def test_explain_bundled_model_is_cached(monkeypatch):
+    from app.services import p3_explain
+
+    monkeypatch.setattr(p3_explain, "_cache", ExplanationCache(100))
+    loaded = EnergyModel.current()
+    payloads = verification_payloads()
+    explanations = explain(loaded, payloads)
+    for explanation, y in zip(explanations, loaded.predict_payloads(payloads)):
+        assert explanation["bias"] + sum(explanation["contributions"].values()) == pytest.approx(y)
+        assert "PropertyGFABuildings" in explanation["contributions"]
+
+    assert explain(loaded, payloads[:1]) == explanations[:1]
+    stats = get_explanation_cache().stats()
+    assert stats["hits"] == 1 and stats["misses"] == len(payloads)
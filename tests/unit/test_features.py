@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_features import DERIVED, ZONE_EDGES, derive_frame, derive_payloads, infer_zone_edges
+
+
+@pytest.fixture
+def x_test():
+    if not Path("data/X_test.csv").exists():
+        pytest.skip("Test data not found at data/X_test.csv")
+    return pd.read_csv("data/X_test.csv")
+
+
+def test_derived_features_match_training_data(x_test):
+    derived = derive_frame(x_test.drop(columns=DERIVED))
+    for column in DERIVED:
+        np.testing.assert_allclose(derived[column].astype(float), x_test[column].astype(float), err_msg=column)
+    np.testing.assert_allclose(infer_zone_edges(x_test["Latitude"], x_test["LatZone"]), ZONE_EDGES["LatZone"])
+
+
+def test_derive_payloads_overrides_client_values():
+    base = EnergyRequest.example().model_dump()
+    sent = EnergyRequest(**{**base, "BuildingAge": 1.0, "LatZone": 47, "IsMultiUse": None})
+    no_floors = EnergyRequest(**{**base, "NumberofFloors": 0, "SecondLargestPropertyUseType": None})
+
+    derive_payloads([sent, no_floors])
+
+    assert (sent.BuildingAge, sent.SurfacePerFloor, sent.IsMultiUse, sent.LatZone, sent.LonZone) == (
+        2016 - base["YearBuilt"], base["PropertyGFATotal"] / base["NumberofFloors"], True, 3, 1
+    )
+    assert no_floors.SurfacePerFloor is None
+    assert no_floors.IsMultiUse is False
@@ -1,13 +1,48 @@
 from fastapi.testclient import TestClient
 from app.main import app
 
-client = TestClient(app)
-
 
 def test_health_check():
-    r = client.get("/health")
+    # Entering the client runs the lifespan, which loads and warms up the model
+    with TestClient(app) as client:
+        r = client.get("/health")
     assert r.status_code == 200
     data = r.json()
     assert data["status"] == "ok"
     assert "model_loaded" in data
     assert data["model_loaded"] is True
+
+
+def test_liveness_and_readiness():
+    with TestClient(app) as client:
+        live = client.get("/health/live")
+        ready = client.get("/health/ready")
+    assert live.status_code == 200
+    assert ready.status_code == 200
+    data = ready.json()
+    assert data["warmed_up"] is True
+    assert data["load_seconds"] is not None
+    assert data["size_bytes"] > 0
+
+
+def test_readiness_does_not_load_model(monkeypatch):
+    from app.services.p3_model import EnergyModel
+
+    monkeypatch.setattr(EnergyModel, "_active", None)
+    monkeypatch.setattr(EnergyModel, "current", classmethod(lambda cls: (_ for _ in ()).throw(AssertionError("loaded"))))
+    r = TestClient(app).get("/health/ready")
+    assert r.status_code == 503
+    assert r.json()["model_loaded"] is False
+
+
+def test_readiness_without_startup_warmup(monkeypatch):
+    from app.core import config
+    from app.services.p3_model import EnergyModel
+
+    monkeypatch.setattr(config, "MODEL_WARMUP_ON_STARTUP", False)
+    monkeypatch.setattr(EnergyModel, "_active", None)
+    monkeypatch.setattr(EnergyModel, "_warmup_seconds", None)
+    assert TestClient(app).get("/health/ready").status_code == 200
+
+    monkeypatch.setattr(EnergyModel, "_load_error", "download failed")
+    assert TestClient(app).get("/health/ready").status_code == 503
@@ -0,0 +1,18 @@
+from app.services import p3_history
+
+
+def test_filtered_counts_are_bounded(test_db, monkeypatch):
+    monkeypatch.setattr(p3_history, "_counts", p3_history.OrderedDict())
+    monkeypatch.setattr(p3_history, "_COUNTS_MAX_ENTRIES", 2)
+    db = test_db()
+    for dataset_id in range(5):
+        assert p3_history.count_predictions(db, dataset_id=dataset_id) == 0
+    assert [key[1] for key in p3_history._counts] == [3, 4]
+
+    # Expired totals are dropped on the next insert
+    monkeypatch.setattr(p3_history.config, "HISTORY_COUNT_TTL", 0)
+    p3_history._counts.clear()
+    for dataset_id in range(3):
+        p3_history.count_predictions(db, dataset_id=dataset_id)
+    assert len(p3_history._counts) == 0
+    db.close()
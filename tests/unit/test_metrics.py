@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+from app.core.metrics import PREDICTION_ERRORS, Counter, Registry
+from app.main import app
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_model import EnergyModel
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    latency.observe(0.05, stage="inference")
+    latency.observe(0.5, stage="inference")
+    latency.observe(5, stage="inference")
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{stage="inference",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="inference",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="inference",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="inference"} 3' in text
+
+
+def test_counter_and_collector():
+    registry = Registry()
+    counter = registry.register(Counter("hits_total", "Hits.", ("result",)))
+    counter.inc(result="hit")
+    counter.inc(2, result="hit")
+    registry.collector(lambda: [("queue_depth", "Depth.", [({}, 4)]), ("missing", "Skipped.", [({}, None)])])
+
+    text = registry.render()
+    assert 'hits_total{result="hit"} 3' in text
+    assert "queue_depth 4" in text
+    assert "missing" not in text
+
+
+def test_metrics_endpoint():
+    with TestClient(app) as client:
+        client.get("/health/live")
+        r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/health/live",status="200"}' in r.text
+    assert "model_load_seconds" in r.text
+    assert 'db_pool_checkouts{engine="sync"}' in r.text
+
+
+def test_prediction_errors_use_the_endpoint_label(monkeypatch):
+    def fail(payloads):
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(EnergyModel, "score", fail)
+    before = PREDICTION_ERRORS.value(endpoint="predict_batch")
+    client = TestClient(app, raise_server_exceptions=False)
+    payload = EnergyRequest.example().model_dump()
+    assert client.post("/api/p3/predict/batch", json=[payload]).status_code == 500
+    assert PREDICTION_ERRORS.value(endpoint="predict_batch") == before + 1
@@ -0,0 +1,22 @@
+from app.core import config
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_model import EnergyModel, build_features, process_memory
+
+
+def test_model_mmap_load(tmp_path, monkeypatch):
+    df = build_features([EnergyRequest.example()])
+    expected = EnergyModel.predict(df)
+
+    mmap_path = tmp_path / "model.uncompressed.joblib"
+    monkeypatch.setattr(config, "MODEL_MMAP", True)
+    monkeypatch.setattr(config, "MODEL_MMAP_PATH", str(mmap_path))
+    monkeypatch.setattr(EnergyModel, "_active", None)
+
+    assert EnergyModel.predict(df) == expected
+    assert mmap_path.exists()
+    assert EnergyModel.status()["mmap"] is True
+
+
+def test_process_memory_reports_rss():
+    memory = process_memory()
+    assert memory["rss_bytes"] > 0
@@ -0,0 +1,110 @@
+import pytest
+
+from app.core import config
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_model import MODEL_PATH, EnergyModel
+from app.services.p3_registry import ModelRegistry, RegistryError
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "MODEL_REGISTRY_DIR", str(tmp_path / "registry"))
+    return ModelRegistry()
+
+
+def test_register_and_activate(registry):
+    metadata = registry.register(MODEL_PATH, version="v1", description="baseline")
+    assert metadata["sha256"]
+    assert registry.active() is None
+
+    registry.activate("v1")
+    assert registry.active() == "v1"
+    assert [entry["version"] for entry in registry.versions()] == ["v1"]
+    assert registry.artifact("v1").exists()
+
+    with pytest.raises(RegistryError):
+        registry.register(MODEL_PATH, version="v1")
+    with pytest.raises(RegistryError):
+        registry.activate("missing")
+    with pytest.raises(RegistryError):
+        registry.metadata("../outside")
+
+
+def test_checksum_mismatch(registry):
+    registry.register(MODEL_PATH, version="v1")
+    with open(registry.artifact("v1"), "ab") as f:
+        f.write(b"corrupted")
+    with pytest.raises(RegistryError):
+        registry.artifact("v1")
+
+
+def test_swap_keeps_in_flight_model(registry, monkeypatch):
+    previous = EnergyModel.current()
+    monkeypatch.setattr(EnergyModel, "_active", previous)
+    monkeypatch.setattr(EnergyModel, "_reload", EnergyModel.reload_status())
+    registry.register(MODEL_PATH, version="v2")
+
+    loaded = EnergyModel.swap("v2")
+
+    assert EnergyModel.version() == "v2"
+    assert previous.version != "v2"
+    # A request that grabbed the previous model before the swap still scores with it
+    assert loaded.model is not previous.model
+    assert len(previous.predict_payloads([EnergyRequest.example()])) == 1
+    assert EnergyModel.reload_status()["state"] == "done"
+
+    with pytest.raises(RegistryError):
+        EnergyModel.swap("missing")
+    assert EnergyModel.version() == "v2"
+    assert EnergyModel.reload_status()["state"] == "failed"
+
+
+def test_watcher_follows_active_pointer(registry, monkeypatch):
+    from app.services.p3_model import RegistryWatcher
+
+    monkeypatch.setattr(EnergyModel, "_active", EnergyModel.current())
+    monkeypatch.setattr(EnergyModel, "_reload", EnergyModel.reload_status())
+    registry.register(MODEL_PATH, version="v4")
+    registry.activate("v4")
+
+    watcher = RegistryWatcher(interval=3600)
+    try:
+        watcher.check()
+    finally:
+        watcher.close()
+    assert EnergyModel.version() == "v4"
+
+
+def test_activate_writes_pointer_before_swapping(registry, monkeypatch):
+    from app.services.p3_model import RegistryWatcher
+
+    monkeypatch.setattr(EnergyModel, "_active", EnergyModel.current())
+    monkeypatch.setattr(EnergyModel, "_reload", EnergyModel.reload_status())
+    registry.register(MODEL_PATH, version="v6")
+    registry.register(MODEL_PATH, version="v7")
+    registry.activate("v6")
+
+    # A watcher poll during the swap sees the new pointer and leaves the model alone
+    swap = EnergyModel.swap
+    watcher = RegistryWatcher(interval=3600)
+
+    def swap_with_poll(version):
+        assert registry.active() == version
+        loaded = swap(version)
+        watcher.check()
+        return loaded
+
+    monkeypatch.setattr(EnergyModel, "swap", swap_with_poll)
+    try:
+        EnergyModel.activate("v7")
+    finally:
+        watcher.close()
+    assert EnergyModel.version() == "v7"
+
+    # A version that fails to load leaves the pointer where it was
+    with open(registry.artifact("v6"), "ab") as f:
+        f.write(b"corrupted")
+    with pytest.raises(RegistryError):
+        EnergyModel.activate("v6")
+    assert registry.active() == "v7"
+    assert EnergyModel.version() == "v7"
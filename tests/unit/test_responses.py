@@ -0,0 +1,17 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from app.core.responses import ORJSONResponse
+
+
+def test_orjson_response_renders_datetimes_and_numpy():
+    created = datetime(2026, 10, 18, 12, 30, 45, 123456)
+    response = ORJSONResponse({"created_at": created, "predictions": np.array([1.5, 2.0]), "n": np.int64(2)})
+    assert response.headers["content-type"] == "application/json"
+    assert json.loads(response.body) == {
+        "created_at": "2026-10-18T12:30:45.123456",
+        "predictions": [1.5, 2.0],
+        "n": 2,
+    }
@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import insert
+
+from app.models import EnergyDataset, EnergyPrediction
+from app.schemas.p3_request import EnergyRequest
+from app.services import p3_rollups
+from app.services.p3_rollups import RELATIVE_ACCURACY, aggregates, quantiles_from_bins, rebuild_rollups, update_rollups
+from app.services.p3_storage import dataset_values
+
+ROW = dataset_values(EnergyRequest.example())
+DAY = date(2026, 10, 1)
+
+
+def _rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    zips = rng.choice([98101, 98104, 98109], n)
+    datasets = [{**ROW, "zip_code": int(z), "neighborhood": None if z == 98109 else "DOWNTOWN"} for z in zips]
+    return datasets, rng.lognormal(13, 1.5, n)
+
+
+def test_rollups_match_exact_statistics(test_db):
+    datasets, predictions = _rows(3000)
+    db = test_db()
+    for i in range(0, 3000, 500):
+        update_rollups(db, datasets[i:i + 500], predictions[i:i + 500], DAY)
+    db.commit()
+
+    (overall,) = aggregates(db, quantiles=(0.5, 0.9, 0.99))
+    assert overall["count"] == 3000
+    assert overall["sum"] == pytest.approx(predictions.sum())
+    assert (overall["min"], overall["max"]) == (predictions.min(), predictions.max())
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        assert overall["quantiles"][name] == pytest.approx(np.quantile(predictions, q), rel=2 * RELATIVE_ACCURACY)
+
+    by_zip = {group["key"]: group for group in aggregates(db, "zip_code", quantiles=())}
+    zips = np.array([row["zip_code"] for row in datasets])
+    assert sorted(by_zip) == ["98101", "98104", "98109"]
+    assert by_zip["98104"]["mean"] == pytest.approx(predictions[zips == 98104].mean())
+    assert "quantiles" not in by_zip["98104"]
+    # Missing neighborhoods are grouped under a null key
+    assert {g["key"]: g["count"] for g in aggregates(db, "neighborhood")}[None] == (zips == 98109).sum()
+
+    assert aggregates(db, "day", start=date(2026, 10, 2)) == []
+    assert aggregates(db, "day", end=DAY) == []
+    (day,) = aggregates(db, "day", end=DAY + timedelta(days=1))
+    assert (day["day"], day["count"]) == (DAY, 3000)
+    db.close()
+
+
+def test_rebuild_rollups_from_predictions(test_db):
+    datasets, predictions = _rows(200, seed=1)
+    created = datetime(2026, 10, 1, 12)
+    db = test_db()
+    db.execute(insert(EnergyDataset.__table__), [{**row, "id": i + 1} for i, row in enumerate(datasets)])
+    db.execute(insert(EnergyPrediction.__table__), [
+        {"dataset_id": i + 1, "prediction": float(y), "created_at": created} for i, y in enumerate(predictions)
+    ])
+    update_rollups(db, datasets[:10], predictions[:10], DAY)  # stale, replaced by the rebuild
+    db.commit()
+
+    assert rebuild_rollups(test_db, chunksize=64) == 200
+    zips = np.array([row["zip_code"] for row in datasets])
+    for group in aggregates(db, "zip_code", by_day=True):
+        values = predictions[zips == int(group["key"])]
+        assert group["day"] == DAY
+        assert (group["count"], group["min"], group["max"]) == (len(values), values.min(), values.max())
+        assert group["sum"] == pytest.approx(values.sum())
+    db.close()
+
+
+
+def test_rebuild_keeps_serving_and_counts_concurrent_writes(test_db, monkeypatch):
+    datasets, predictions = _rows(100, seed=2)
+    created = datetime(2026, 10, 1, 12)
+    db = test_db()
+    db.execute(insert(EnergyDataset.__table__), [{**row, "id": i + 1} for i, row in enumerate(datasets)])
+    db.execute(insert(EnergyPrediction.__table__), [
+        {"dataset_id": i + 1, "prediction": float(y), "created_at": created} for i, y in enumerate(predictions)
+    ])
+    update_rollups(db, datasets[:10], predictions[:10], DAY)  # stale, replaced by the rebuild
+    db.commit()
+
+    roll_up = p3_rollups._roll_up
+    seen = []
+
+    def concurrent(*args, **kwargs):
+        for rows in roll_up(*args, **kwargs):
+            yield rows
+            if not seen:
+                # Chunk committed to staging: readers still see the old rollups, and a writer goes through
+                (overall,) = aggregates(db)
+                seen.append(overall["count"])
+                db.execute(insert(EnergyPrediction.__table__), {
+                    "dataset_id": 1, "prediction": 5.0, "created_at": created,
+                })
+                update_rollups(db, datasets[:1], [5.0], DAY)
+                db.commit()
+
+    monkeypatch.setattr(p3_rollups, "_roll_up", concurrent)
+    assert rebuild_rollups(test_db, chunksize=32) == 101
+    (overall,) = aggregates(db)
+    assert seen == [10]
+    assert overall["count"] == 101
+    assert overall["sum"] == pytest.approx(predictions.sum() + 5.0)
+    db.close()
+
+
+def test_quantiles_without_bins():
+    assert quantiles_from_bins([], (0.5,), 0.0, 0.0) == {}
@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.models import EnergyDataset
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_spatial import EARTH_RADIUS_M, SpatialIndex, _haversine
+from app.services.p3_storage import dataset_values
+
+ROW = dataset_values(EnergyRequest.example())
+
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(47.5, 47.75, n), rng.uniform(-122.42, -122.25, n)
+
+
+def _brute_force(ids, latitudes, longitudes, lat, lon, k, radius_m=None):
+    distances = _haversine(np.radians([lat, lon]), np.radians(np.column_stack([latitudes, longitudes])))
+    distances = distances * EARTH_RADIUS_M
+    order = [i for i in np.argsort(distances) if radius_m is None or distances[i] <= radius_m][:k]
+    return [ids[i] for i in order]
+
+
+def test_index_loads_rows_and_matches_brute_force(test_db):
+    latitudes, longitudes = _points(500)
+    db = test_db()
+    db.execute(insert(EnergyDataset.__table__), [
+        {**ROW, "id": i + 1, "latitude": lat, "longitude": lon}
+        for i, (lat, lon) in enumerate(zip(latitudes, longitudes))
+    ])
+    db.commit()
+
+    index = SpatialIndex()
+    index.load(db.get_bind())
+    db.close()
+    assert index.stats()["tree_points"] == 500
+
+    ids = list(range(1, 501))
+    nearest = index.nearby(47.61, -122.33, k=10)
+    assert [i for i, _ in nearest] == _brute_force(ids, latitudes, longitudes, 47.61, -122.33, 10)
+    assert [d for _, d in nearest] == sorted(d for _, d in nearest)
+
+    within = index.nearby(47.61, -122.33, k=1000, radius_m=1500)
+    assert [i for i, _ in within] == _brute_force(ids, latitudes, longitudes, 47.61, -122.33, 1000, 1500)
+    assert all(d <= 1500 for _, d in within)
+
+
+def test_index_buffers_inserts_and_merges_them(test_db):
+    index = SpatialIndex(buffer_size=100)
+    index.load(test_db().get_bind())
+    latitudes, longitudes = _points(250, seed=1)
+    ids = list(range(1, 251))
+
+    index.add(ids[:50], latitudes[:50], longitudes[:50])
+    assert index.stats()["buffer_points"] == 50
+    assert index.nearby(latitudes[7], longitudes[7], k=1)[0][0] == 8
+
+    index.add(ids[50:], latitudes[50:], longitudes[50:])
+    deadline = time.monotonic() + 5
+    while index._rebuilding and time.monotonic() < deadline:  # background merge
+        time.sleep(0.001)
+    stats = index.stats()
+    assert stats["points"] == 250
+    assert stats["tree_points"] == 250 and stats["buffer_points"] == 0
+    assert [i for i, _ in index.nearby(47.6, -122.3, k=20)] == _brute_force(
+        ids, latitudes, longitudes, 47.6, -122.3, 20
+    )
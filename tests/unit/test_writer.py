@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import EnergyDataset, EnergyPrediction
+from app.schemas.p3_request import EnergyRequest
+from app.services.p3_datasets import insert_datasets
+from app.services.p3_storage import dataset_values
+from app.services.p3_writer import IdAllocator, PredictionWriter, WriterQueueFull
+
+PAYLOAD = EnergyRequest.example()
+
+
+def test_writer_returns_ids_before_commit_and_flushes(test_db):
+    writer = PredictionWriter(test_db, max_queue=100, batch_size=10)
+
+    first = writer.submit([PAYLOAD, PAYLOAD], [1.0, 2.0])
+    second = writer.submit([PAYLOAD], [3.0])
+    assert first == [1, 2]
+    assert second == [3]
+
+    writer.close()
+    db = test_db()
+    assert db.query(EnergyDataset).count() == 3
+    assert sorted((p.dataset_id, p.prediction) for p in db.query(EnergyPrediction)) == [
+        (1, 1.0), (2, 2.0), (3, 3.0)
+    ]
+    db.close()
+    assert writer.stats()["rows_written"] == 3
+
+
+def test_writer_applies_backpressure(test_db):
+    writer = PredictionWriter(test_db, max_queue=1, put_timeout=0.01)
+    gate = threading.Event()
+    write = writer._write
+    writer._write = lambda batch: (gate.wait(), write(batch))
+
+    writer.submit([PAYLOAD], [1.0])  # picked up by the (blocked) worker
+    while writer.stats()["queue_depth"]:
+        time.sleep(0.001)
+    writer.submit([PAYLOAD], [2.0])  # fills the queue
+    with pytest.raises(WriterQueueFull):
+        writer.submit([PAYLOAD], [3.0])
+
+    gate.set()
+    writer.close()
+
+
+def test_writer_retries_failed_batch_row_by_row(test_db):
+    writer = PredictionWriter(test_db, max_queue=10)
+    gate = threading.Event()
+    write = writer._write
+    writer._write = lambda batch: (gate.wait(), write(batch))
+
+    assert writer.submit([PAYLOAD, PAYLOAD, PAYLOAD], [1.0, 2.0, 3.0]) == [1, 2, 3]
+    db = test_db()
+    insert_datasets(db, [{"id": 2, **dataset_values(PAYLOAD)}])  # dataset id 2 now clashes
+    db.commit()
+    gate.set()
+    writer.close()
+
+    assert sorted(p.prediction for p in db.query(EnergyPrediction)) == [1.0, 3.0]
+    db.close()
+    assert (writer.stats()["rows_written"], writer.stats()["rows_failed"]) == (2, 1)
+
+
+def test_sqlite_ids_are_unique_across_processes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'ids.db'}"
+    engines = [create_engine(url, connect_args={"timeout": 5}) for _ in range(2)]
+    Base.metadata.create_all(engines[0])
+    # One allocator per engine, like one per worker process
+    allocators = [
+        IdAllocator(sessionmaker(bind=engine), EnergyDataset.__table__, block_size=3) for engine in engines
+    ]
+    allocated = [[] for _ in allocators]
+
+    def worker(i):
+        for _ in range(20):
+            allocated[i].extend(allocators[i].allocate(2))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ids = allocated[0] + allocated[1]
+    assert len(ids) == len(set(ids)) == 80
+    for engine in engines:
+        engine.dispose()
+
+
+def test_sqlite_ids_skip_rows_inserted_without_reservation(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ids.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    assert IdAllocator(session_factory, EnergyDataset.__table__, block_size=1).allocate(2) == [1, 2]
+
+    with session_factory() as db:
+        insert_datasets(db, [{"id": 7, **dataset_values(PAYLOAD)}])
+        db.commit()
+    assert IdAllocator(session_factory, EnergyDataset.__table__, block_size=1).allocate(1) == [8]
+    engine.dispose()